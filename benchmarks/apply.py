@@ -0,0 +1,85 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Data.process_delta throughput on a reference replay
+
+    python3 -m benchmarks.apply [--frames N] [--recording FILE]
+        [--store tree|flat] [--min-rate DELTAS_PER_SECOND]
+
+The reference replay is `ais_frames(100000)`: three quarters AIS targets
+(four values, one of them an object) and one quarter self data (three
+values), decoded before timing so only the apply path is measured. With
+--min-rate the benchmark fails when the best run is slower.
+"""
+
+import argparse
+import sys
+import time
+from benchmarks.traffic import ais_frames, empty_tree, load_frames
+from signalk_client.data import Data
+from signalk_client.decoder import get_decoder
+from signalk_client.store import STORES, TREE
+
+def bench(deltas, repeat, store=TREE):
+    """return the best deltas/second out of repeat runs on a fresh store"""
+    best = None
+    for i in range(repeat):
+        data = Data(empty_tree(), store=store)
+        start = time.perf_counter()
+        for delta in deltas:
+            data.process_delta(delta)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(deltas) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=100000,
+        help="number of synthetic frames (default 100000)")
+    parser.add_argument('--recording',
+        help="a recording, or a file with one json frame per line, "
+            "instead of synthetic frames")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--store', choices=STORES, default=TREE,
+        help="data store backend (default tree)")
+    parser.add_argument('--min-rate', type=float,
+        help="fail below this many deltas/s")
+    args = parser.parse_args()
+
+    if args.recording:
+        frames = load_frames(args.recording)
+    else:
+        frames = ais_frames(args.frames)
+    decode = get_decoder()
+    deltas = [decode(frame) for frame in frames]
+    values = sum(
+        len(update['values'])
+        for delta in deltas for update in delta.get('updates', ())
+        )
+
+    rate = bench(deltas, args.repeat, args.store)
+    print("{} deltas: {:.0f} deltas/s, {:.0f} values/s".format(
+        len(deltas), rate, rate * values / len(deltas)
+        ))
+    if args.min_rate is not None and rate < args.min_rate:
+        print("below the target of {:.0f} deltas/s".format(args.min_rate))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
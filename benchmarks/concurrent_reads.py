@@ -0,0 +1,143 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""one delta writer against many concurrent readers
+
+    python3 -m benchmarks.concurrent_reads [--readers N] [--seconds S]
+        [--store tree|flat]
+
+The writer applies the reference replay in a loop, with every self update
+setting speedOverGround and speedThroughWater to the same number. Each
+reader repeatedly lists every record and reads that pair, counting pairs
+that disagree (torn reads) and exceptions, in three modes:
+
+    none      no locking, reads race the writer
+    lock      Data(locking=True), each read holding `reading()`
+    snapshot  Data(locking=True), each read on a `snapshot()`
+"""
+
+import argparse
+import threading
+import time
+from benchmarks.traffic import SELF, ais_frames, empty_tree
+from signalk_client.data import Data
+from signalk_client.decoder import get_decoder
+from signalk_client.store import STORES, TREE
+
+MODES = ('none', 'lock', 'snapshot')
+
+def paired_deltas(frames):
+    """return decoded frames, with self updates carrying a matching
+    speedOverGround and speedThroughWater"""
+    decode = get_decoder()
+    deltas = []
+    for count, frame in enumerate(frames):
+        delta = decode(frame)
+        if delta.get('context') == SELF:
+            delta['updates'][0]['values'] = [
+                {'path': 'navigation.speedOverGround', 'value': count},
+                {'path': 'navigation.speedThroughWater', 'value': count},
+                ]
+        deltas.append(delta)
+    return deltas
+
+def read_once(data):
+    """list every record and return the speed pair of the self vessel"""
+    records = sum(1 for record in data.records())
+    try:
+        sog = data.get_by_path('navigation.speedOverGround', SELF)['value']
+        stw = data.get_by_path('navigation.speedThroughWater', SELF)['value']
+    except KeyError:
+        return records, None, None
+    return records, sog, stw
+
+def reader(data, mode, stop, results):
+    reads = torn = errors = 0
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            if mode == 'snapshot':
+                records, sog, stw = read_once(data.snapshot())
+            else:
+                with data.reading():
+                    records, sog, stw = read_once(data)
+        except Exception:
+            errors += 1
+            continue
+        worst = max(worst, time.perf_counter() - start)
+        reads += 1
+        if sog != stw:
+            torn += 1
+    results.append((reads, torn, errors, worst))
+
+def bench(deltas, mode, readers, seconds, store):
+    """return (deltas/s, reads/s, torn reads, errors, worst read seconds)"""
+    data = Data(empty_tree(), store=store, locking=mode != 'none')
+    for delta in deltas[:1000]:
+        data.process_delta(delta)
+    stop = threading.Event()
+    results = []
+    threads = [
+        threading.Thread(target=reader, args=(data, mode, stop, results))
+        for i in range(readers)
+        ]
+    for thread in threads:
+        thread.start()
+    applied = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for delta in deltas[1000:]:
+            data.process_delta(delta)
+            applied += 1
+            if applied % 1000 == 0 \
+                    and time.perf_counter() - start >= seconds:
+                break
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return (applied / elapsed,
+        sum(result[0] for result in results) / elapsed,
+        sum(result[1] for result in results),
+        sum(result[2] for result in results),
+        max(result[3] for result in results))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=100000,
+        help="number of synthetic frames (default 100000)")
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=3.0,
+        help="duration of each mode (default 3)")
+    parser.add_argument('--store', choices=STORES, default=TREE,
+        help="data store backend (default tree)")
+    args = parser.parse_args()
+
+    deltas = paired_deltas(ais_frames(args.frames))
+    print("{} readers, {} store".format(args.readers, args.store))
+    for mode in MODES:
+        rate, reads, torn, errors, worst = bench(deltas, mode, args.readers,
+            args.seconds, args.store)
+        print("{:>8s} {:8.0f} deltas/s {:8.0f} reads/s  torn {:5d}  "
+            "errors {:5d}  slowest read {:6.1f}ms".format(
+                mode, rate, reads, torn, errors, worst * 1000
+                ))
+
+if __name__ == '__main__':
+    main()
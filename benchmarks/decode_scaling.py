@@ -0,0 +1,86 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""delta throughput with 1 to N decode worker processes
+
+    python3 -m benchmarks.decode_scaling [--frames N] [--workers N]
+
+0 workers is the default client path: decode and process_delta on the
+stream thread.
+"""
+
+import argparse
+import multiprocessing
+import time
+from benchmarks.traffic import ais_frames, empty_tree, load_frames
+from signalk_client.data import Data
+from signalk_client.decode_pool import DecodePool
+from signalk_client.decoder import get_decoder
+
+def bench_inline(frames, decoder):
+    """return frames/second decoding and applying on one thread"""
+    decode = get_decoder(decoder)
+    data = Data(empty_tree())
+    start = time.perf_counter()
+    for frame in frames:
+        data.process_delta(decode(frame))
+    return len(frames) / (time.perf_counter() - start)
+
+def bench_pool(frames, decoder, workers, batch_size):
+    """return (frames/second, writer busy fraction) through a DecodePool"""
+    data = Data(empty_tree())
+    pool = DecodePool(data.process_values, workers, decoder, batch_size)
+    pool.start()
+    start = time.perf_counter()
+    for frame in frames:
+        pool.put(frame)
+    pool.stop()
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, pool.apply_time / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=100000,
+        help="number of synthetic frames (default 100000)")
+    parser.add_argument('--recording',
+        help="a recording, or a file with one json frame per line, "
+            "instead of synthetic frames")
+    parser.add_argument('--workers', type=int,
+        default=multiprocessing.cpu_count(),
+        help="most worker processes to try (default: cpu count)")
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--decoder', default=None)
+    args = parser.parse_args()
+
+    if args.recording:
+        frames = load_frames(args.recording)
+    else:
+        frames = ais_frames(args.frames)
+    print("{} frames, {} cpus".format(len(frames), multiprocessing.cpu_count()))
+
+    baseline = bench_inline(frames, args.decoder)
+    print("{:>7s} {:10.0f} frames/s".format('inline', baseline))
+    for workers in range(1, args.workers + 1):
+        rate, busy = bench_pool(frames, args.decoder, workers,
+            args.batch_size)
+        print("{:7d} {:10.0f} frames/s  {:5.2f}x  writer busy {:3.0f}%".format(
+            workers, rate, rate / baseline, busy * 100
+            ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""compare json decoders on delta traffic
+
+    python3 -m benchmarks.decoder [--frames N] [--recording FILE]
+"""
+
+import argparse
+import time
+from benchmarks.traffic import ais_frames, load_frames
+from signalk_client.decoder import available_decoders, get_decoder
+
+def bench(decode, frames, repeat):
+    """return the best frames/second out of repeat runs"""
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for frame in frames:
+            decode(frame)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(frames) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=50000,
+        help="number of synthetic frames (default 50000)")
+    parser.add_argument('--recording',
+        help="a recording, or a file with one json frame per line, "
+            "instead of synthetic frames")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.recording:
+        frames = load_frames(args.recording)
+    else:
+        frames = ais_frames(args.frames)
+    size = sum(len(frame) for frame in frames)
+    print("{} frames, {:.1f} MiB".format(len(frames), size / 2.0**20))
+
+    rates = [
+        (name, bench(get_decoder(name), frames, args.repeat))
+        for name in available_decoders()
+        ]
+    baseline = dict(rates)['json']
+    for name, rate in rates:
+        print("{:8s} {:10.0f} frames/s  {:5.2f}x stdlib json".format(
+            name, rate, rate / baseline
+            ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""end to end throughput and latency through Client and a stand-in server
+
+    python3 -m benchmarks.end_to_end [--rate N] [--sensors N] [--vessels M]
+
+latency is measured from the delta's server timestamp to the moment
+Data.process_delta returns for it.
+"""
+
+import argparse
+import calendar
+import time
+from signalk_client.client import Client
+from signalk_client.standin import StandInServer
+
+def parse_timestamp(timestamp):
+    """return the unix time of a stand-in server timestamp"""
+    base, _, fraction = timestamp.rstrip('Z').partition('.')
+    return calendar.timegm(time.strptime(base, '%Y-%m-%dT%H:%M:%S')) \
+        + float('0.' + (fraction or '0'))
+
+def percentile(values, fraction):
+    """return the value at fraction (0..1) of the sorted values"""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=int, default=2000,
+        help="deltas per second offered by the server (default 2000)")
+    parser.add_argument('--sensors', type=int, default=20)
+    parser.add_argument('--vessels', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--queue-size', type=int, default=None,
+        help="use a receive queue of this size")
+    args = parser.parse_args()
+
+    server = StandInServer(rate=args.rate, sensors=args.sensors,
+        vessels=args.vessels)
+    server.start()
+
+    applied = []
+    client = Client(server.address, autoconnect=False,
+        queue_size=args.queue_size)
+    process_delta = client.data.process_delta
+
+    def measure(delta):
+        process_delta(delta)
+        if 'updates' in delta:
+            applied.append((delta['updates'][0]['timestamp'], time.time()))
+
+    if client.receive_queue is not None:
+        client.receive_queue.apply = measure
+    else:
+        client.data.process_delta = measure
+
+    client.connect(timeout=10)
+    time.sleep(1.0)
+    del applied[:]
+    sent = server.sent
+    time.sleep(args.duration)
+    count = len(applied)
+    sent = server.sent - sent
+    client.close()
+    server.stop()
+
+    latencies = sorted(
+        done - parse_timestamp(stamp) for stamp, done in applied[:count]
+        )
+    print("offered {:.0f} deltas/s, applied {:.0f} deltas/s".format(
+        sent / args.duration, count / args.duration
+        ))
+    if latencies:
+        print("latency ms: p50 {:.2f}  p90 {:.2f}  p99 {:.2f}  max {:.2f}"\
+            .format(*[1000*percentile(latencies, f)
+                for f in (0.5, 0.9, 0.99, 1.0)]))
+    if client.receive_queue is not None:
+        print("receive queue: {}".format(client.receive_queue.stats()))
+
+if __name__ == '__main__':
+    main()
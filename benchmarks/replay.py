@@ -0,0 +1,69 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""replay a recording into Data and report the apply rate
+
+    python3 -m benchmarks.replay [--recording PATH] [--speed N]
+
+without --recording, synthetic AIS traffic is recorded to a temporary
+directory first.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from benchmarks.traffic import ais_frames, empty_tree
+from signalk_client.data import Data
+from signalk_client.recording import Recorder, Replayer
+
+def synthetic_recording(directory, count, rate=1000.0, compress=False):
+    """record count synthetic frames, rate frames per second apart"""
+    path = os.path.join(directory, 'synthetic')
+    with Recorder(path, compress=compress, segment_size=4*2**20) as recorder:
+        start = time.time()
+        for i, frame in enumerate(ais_frames(count)):
+            recorder.record(frame, start + i/rate)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recording', help="recording path")
+    parser.add_argument('--frames', type=int, default=50000,
+        help="number of synthetic frames (default 50000)")
+    parser.add_argument('--compress', action='store_true',
+        help="gzip the synthetic recording")
+    parser.add_argument('--speed', type=float, default=None,
+        help="replay speed factor (default: as fast as possible)")
+    parser.add_argument('--decoder', default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.recording
+        if path is None:
+            path = synthetic_recording(directory, args.frames,
+                compress=args.compress)
+        replayer = Replayer(path, decoder=args.decoder)
+        count, elapsed = replayer.replay(Data(empty_tree()),
+            speed=args.speed)
+    print("{} frames in {:.2f}s: {:.0f} frames/s".format(
+        count, elapsed, count / elapsed
+        ))
+
+if __name__ == '__main__':
+    main()
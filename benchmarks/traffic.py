@@ -0,0 +1,88 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""delta traffic for benchmarks"""
+
+import json
+import random
+from signalk_client.recording import read_recording, segment_paths
+
+SELF = 'vessels.urn:mrn:imo:mmsi:123456789'
+
+def empty_tree():
+    """return a data tree with no vessels yet, to seed Data with"""
+    return {'version': '1.0.0', 'self': SELF, 'vessels': {}}
+
+def ais_frames(count, vessels=200, seed=0):
+    """return count raw delta frames mixing AIS targets and self data
+
+    roughly what a busy harbour server streams with subscribe=all.
+    """
+    rand = random.Random(seed)
+    frames = [json.dumps({
+        'self': SELF, 'version': '1.0.0',
+        'timestamp': '2018-01-01T00:00:00.000Z',
+        })]
+    for i in range(count - 1):
+        timestamp = '2018-01-01T{:02d}:{:02d}:{:02d}.{:03d}Z'.format(
+            i//3600000 % 24, i//60000 % 60, i//1000 % 60, i % 1000
+            )
+        if i % 4 == 0:
+            frames.append(json.dumps({'context': SELF, 'updates': [{
+                'source': {'label': 'n2k', 'type': 'NMEA2000', 'src': '3'},
+                '$source': 'n2k.3',
+                'timestamp': timestamp,
+                'values': [
+                    {'path': 'navigation.speedOverGround',
+                        'value': rand.uniform(0, 10)},
+                    {'path': 'navigation.courseOverGroundTrue',
+                        'value': rand.uniform(0, 6.28)},
+                    {'path': 'environment.wind.speedApparent',
+                        'value': rand.uniform(0, 20)},
+                    ],
+                }]}))
+            continue
+        mmsi = 200000000 + rand.randrange(vessels)
+        frames.append(json.dumps({
+            'context': 'vessels.urn:mrn:imo:mmsi:{}'.format(mmsi),
+            'updates': [{
+                'source': {'label': 'ais', 'type': 'NMEA0183',
+                    'sentence': 'VDM', 'talker': 'AI'},
+                '$source': 'ais.AI',
+                'timestamp': timestamp,
+                'values': [
+                    {'path': 'navigation.position', 'value': {
+                        'longitude': rand.uniform(-180, 180),
+                        'latitude': rand.uniform(-90, 90)}},
+                    {'path': 'navigation.speedOverGround',
+                        'value': rand.uniform(0, 15)},
+                    {'path': 'navigation.courseOverGroundTrue',
+                        'value': rand.uniform(0, 6.28)},
+                    {'path': 'mmsi', 'value': str(mmsi)},
+                    ],
+                }],
+            }))
+    return frames
+
+def load_frames(path):
+    """return raw frames from a recording, or from a file with one json
+    frame per line"""
+    if segment_paths(path):
+        return [frame for received, frame in read_recording(path)]
+    with open(path) as frames:
+        return [line.rstrip('\n') for line in frames if line.strip()]
@@ -5,7 +5,7 @@ setup(
     name = "signalk_client",
     version = "0.2.3",
     test_suite="tests",
-    packages = find_packages(),
+    packages = find_packages(exclude=['benchmarks']),
     install_requires = [
         "requests",
         "websocket_client",
@@ -14,6 +14,14 @@ setup(
         'netifaces',
         'six',
         ],
+    extras_require = {
+        # for AsyncClient
+        'async': ['aiohttp'],
+        # faster json decoding, ujson works too
+        'fast': ['orjson'],
+        # value history
+        'history': ['numpy'],
+        },
     package_data={'signalk_client': ['include/*']},
     author = "Philip J Freeman",
     author_email = "elektron@halo.nu",
@@ -0,0 +1,263 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""windowed statistics of signalk paths, updated as values arrive
+
+Every added or expired sample updates running sums, so reading the
+statistics of a window never rescans its samples: count, mean and variance
+are kept with Welford's method, min and max with monotonic queues.
+Angles (paths in "rad") get circular statistics from the sums of their
+sines and cosines instead.
+"""
+
+import collections
+import math
+import threading
+import time
+from signalk_client.history import UpdateTimes, is_number
+
+# window kinds
+SLIDING = 'sliding'
+TUMBLING = 'tumbling'
+WINDOWS = (SLIDING, TUMBLING)
+
+TWO_PI = 2 * math.pi
+
+class RunningStats(object):
+    """count, mean and variance of samples that come and go"""
+
+    __slots__ = ('angular', 'count', 'mean', 'm2', 'sin', 'cos')
+
+    def __init__(self, angular=False):
+        self.angular = angular
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sin = 0.0
+        self.cos = 0.0
+
+    def add(self, value):
+        self.count += 1
+        if self.angular:
+            self.sin += math.sin(value)
+            self.cos += math.cos(value)
+            return
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value):
+        self.count -= 1
+        if self.angular:
+            self.sin -= math.sin(value)
+            self.cos -= math.cos(value)
+            return
+        if not self.count:
+            self.mean = self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (value - self.mean)
+
+    def stats(self):
+        """return a dict of count, mean, variance and stddev
+
+        for angles the mean is the circular mean in [0, 2pi), the variance
+        the circular variance (0 to 1) and stddev the circular standard
+        deviation in radians.
+        """
+        count = self.count
+        if not count:
+            return {'count': 0, 'mean': None, 'variance': None,
+                'stddev': None}
+        if self.angular:
+            length = min(math.hypot(self.sin, self.cos) / count, 1.0)
+            return {
+                'count': count,
+                'mean': math.atan2(self.sin, self.cos) % TWO_PI,
+                'variance': 1.0 - length,
+                'stddev': math.sqrt(-2.0 * math.log(length))
+                    if length > 0 else math.inf,
+                }
+        variance = max(self.m2, 0.0) / count
+        return {'count': count, 'mean': self.mean, 'variance': variance,
+            'stddev': math.sqrt(variance)}
+
+class Aggregate(object):
+    """statistics of the samples of one path in a time window
+
+    Keyword arguments:
+    window -- window length in seconds
+    kind -- "sliding", the samples of the last `window` seconds up to the
+        newest one, or "tumbling", consecutive windows starting at
+        multiples of `window` (default "sliding")
+    angular -- circular statistics for angles in radians (default False)
+
+    `stats()` returns the window at a given time, so a path that stopped
+    updating ages out of it; for tumbling windows `previous` holds the
+    stats of the last complete one (empty if no sample arrived in it).
+    min and max are None for angles.
+    """
+
+    def __init__(self, window, kind=SLIDING, angular=False):
+        if kind not in WINDOWS:
+            raise ValueError("unknown window kind: {}".format(kind))
+        self.window = window
+        self.kind = kind
+        self.angular = angular
+        self.previous = None
+        self.__running = RunningStats(angular)
+        self.__samples = collections.deque()
+        self.__mins = collections.deque()
+        self.__maxes = collections.deque()
+        self.__added = 0
+        self.__expired = 0
+        self.__start = None
+        self.__last = None
+        self.__lock = threading.Lock()
+
+    def add(self, timestamp, value):
+        """add a sample taken at timestamp (unix seconds)"""
+        with self.__lock:
+            self.__add(timestamp, value)
+
+    def __add(self, timestamp, value):
+        if self.__last is not None and timestamp < self.__last:
+            # out of order: count it as taken with the newest sample
+            timestamp = self.__last
+        self.__last = timestamp
+        if self.kind == TUMBLING:
+            self.__roll(timestamp - timestamp % self.window)
+        else:
+            self.__expire(timestamp - self.window)
+
+        index = self.__added
+        self.__added += 1
+        self.__samples.append((timestamp, value))
+        self.__running.add(value)
+        if self.angular:
+            return
+        mins = self.__mins
+        while mins and mins[-1][1] >= value:
+            mins.pop()
+        mins.append((index, value))
+        maxes = self.__maxes
+        while maxes and maxes[-1][1] <= value:
+            maxes.pop()
+        maxes.append((index, value))
+
+    def __expire(self, oldest):
+        """drop the samples taken at or before oldest"""
+        samples = self.__samples
+        while samples and samples[0][0] <= oldest:
+            timestamp, value = samples.popleft()
+            self.__running.remove(value)
+            self.__expired += 1
+        expired = self.__expired
+        while self.__mins and self.__mins[0][0] < expired:
+            self.__mins.popleft()
+        while self.__maxes and self.__maxes[0][0] < expired:
+            self.__maxes.popleft()
+
+    def __roll(self, start):
+        """make start the beginning of the tumbling window; a late sample
+        of an earlier window counts in the current one"""
+        if self.__start is not None:
+            if start <= self.__start:
+                return
+            if start - self.__start > 1.5 * self.window:
+                # whole windows passed without samples
+                self.__clear()
+                self.previous = self.__stats()
+            else:
+                self.previous = self.__stats()
+                self.__clear()
+        self.__start = start
+
+    def __clear(self):
+        self.__running = RunningStats(self.angular)
+        self.__samples.clear()
+        self.__mins.clear()
+        self.__maxes.clear()
+        self.__expired = self.__added
+
+    def stats(self, now=None):
+        """return a dict of count, mean, variance, stddev, min and max of
+        the window at now (unix seconds, default the current time)
+
+        samples that left the window since the last one arrived are
+        dropped first. pass now when the samples are not timed by this
+        clock, eg. a replayed recording.
+        """
+        if now is None:
+            now = time.time()
+        with self.__lock:
+            if self.kind == TUMBLING:
+                start = now - now % self.window
+                if self.__start is not None:
+                    self.__roll(start)
+            else:
+                self.__expire(now - self.window)
+            return self.__stats()
+
+    def __stats(self):
+        stats = self.__running.stats()
+        stats['min'] = self.__mins[0][1] if self.__mins else None
+        stats['max'] = self.__maxes[0][1] if self.__maxes else None
+        return stats
+
+class Aggregates(object):
+    """windowed statistics of the numeric values stored at matching paths
+
+    a `signalk_client.data.Data.on_change()` callback, registered by
+    `Data.aggregate()`. paths get their own Aggregate on their first
+    numeric value, circular if `units` says the path is in "rad"; other
+    values are ignored. samples are timed by their update's timestamp.
+    """
+
+    def __init__(self, pattern, window=60.0, kind=SLIDING, units=None):
+        if kind not in WINDOWS:
+            raise ValueError("unknown window kind: {}".format(kind))
+        self.pattern = pattern
+        self.window = window
+        self.kind = kind
+        self.units = units
+        self.aggregates = {}
+        self.__paths = {}
+        self.__times = UpdateTimes()
+
+    def __call__(self, context, path, value, properties):
+        if not is_number(value):
+            return
+        key = (context, path)
+        aggregate = self.aggregates.get(key)
+        if aggregate is None:
+            angular = self.units is not None and self.units(path) == 'rad'
+            aggregate = self.aggregates[key] = Aggregate(self.window,
+                self.kind, angular)
+            self.__paths.setdefault(context, []).append(path)
+        aggregate.add(self.__times(properties), value)
+
+    def get(self, context, path):
+        """return the Aggregate of path in context, or None"""
+        return self.aggregates.get((context, path))
+
+    def forget(self, context):
+        """drop the aggregates of an evicted context"""
+        for path in self.__paths.pop(context, ()):
+            del self.aggregates[(context, path)]
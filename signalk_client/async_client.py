@@ -0,0 +1,449 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""asyncio signalk client connection"""
+
+import asyncio
+import json
+import logging
+import time
+import aiohttp
+from signalk_client.backoff import Backoff
+from signalk_client.client import (
+    CLOSED, CONNECTED, CONNECTING, DISCONNECTED, HOUSEKEEPING_INTERVAL,
+    make_subscriptions, parse_endpoints, stream_url, subtree_url,
+    zeroconf_server)
+from signalk_client.data import Data
+from signalk_client.decoder import get_decoder
+from signalk_client.ratelimit import RateLimiter
+from signalk_client.sources import SourceSelector
+from signalk_client.store import STORES, TREE
+from signalk_client.subscription import Subscriptions, unsubscribe_message
+
+class AsyncClient(object):
+    """asyncio Client connection object
+
+    Keyword arguments:
+    server -- server host (default None)
+    session -- an aiohttp.ClientSession to share (default None)
+    subscriptions -- list of paths or Subscription objects (default None)
+    reconnect -- reconnect when the stream drops (default True)
+    backoff -- Backoff used between reconnect attempts (default None)
+    decoder -- json decoder name or function (default None, the fastest
+        installed; see `signalk_client.decoder`)
+    recorder -- a `signalk_client.recording.Recorder` that every received
+        frame is appended to (default None)
+    compression -- negotiate permessage-deflate on the stream: True, or a
+        `signalk_client.websocket_stream.PerMessageDeflate` whose window
+        bits are requested (aiohttp always allows context takeover and does
+        not count bytes) (default None, uncompressed)
+    rate_limits -- `signalk_client.ratelimit.RateLimit` objects that
+        decimate fast paths before they are stored (default None)
+    store -- `data` store backend, "tree" or "flat" (default "tree")
+    source_priorities -- `signalk_client.sources.SourcePriority` objects
+        choosing which source of a path is stored (default None)
+    ttls -- `signalk_client.expiry.TTL` objects expiring values and
+        vessels that stop being updated (default None)
+
+    Works like `Client`, but everything runs as coroutines on the calling
+    event loop instead of a websocket thread:
+
+        client = AsyncClient("localhost:3000")
+        await client.connect()
+        async for delta in client.deltas():
+            ...
+        await client.close()
+
+    The data store is only updated while `deltas()` (or `run()`) is being
+    iterated; reconnection also happens inside that iteration, the same way
+    as for `Client`. `received` counts stream messages and `last_received`
+    holds the time of the last one.
+    """
+
+    def __init__(self, server=None, session=None, subscriptions=None,
+            reconnect=True, backoff=None, decoder=None,
+            recorder=None, compression=None, rate_limits=None, store=TREE,
+            source_priorities=None, ttls=None):
+        if store not in STORES:
+            raise ValueError("unknown store: {}".format(store))
+        self.server = server
+        self.api_endpoint = None
+        self.stream_endpoint = None
+        self.data = None
+        self.subscriptions = None
+        if subscriptions is not None:
+            self.subscriptions = Subscriptions(
+                make_subscriptions(subscriptions, 'vessels.self',
+                    None, None, None)
+                )
+
+        self.reconnect = reconnect
+        self.backoff = backoff if backoff is not None else Backoff()
+        self.state = DISCONNECTED
+        self.reconnects = 0
+        self.disconnects = 0
+        self.received = 0
+        self.last_received = None
+
+        self._session = session
+        self._own_session = session is None
+        self._ws = None
+        self.__etags = {}
+        self.decoder = get_decoder(decoder)
+        self.recorder = recorder
+        self.compression = compression
+        self.rate_limits = rate_limits
+        self.store = store
+        self.source_priorities = source_priorities
+        self.ttls = ttls
+        self.__discover = server is None
+        self.__closing = False
+        # unsubscribes made on a "subscribe=all" stream, replayed with it
+        self.__unsubscribed = []
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def __config(self):
+        """discover endpoints from server
+        """
+
+        # Set from arg or discover via zeroconf, server address and port
+        if self.server == None:
+            loop = asyncio.get_running_loop()
+            self.server = await loop.run_in_executor(None, zeroconf_server)
+        logging.info("Attempting Connection to {}...".format(self.server))
+
+        # Discover API and Stream endpoints
+        endpoints = parse_endpoints(
+            await self.__get_json("http://%s/signalk"%(self.server))
+            )
+
+        self.api_endpoint = endpoints['signalk-http']
+        self.stream_endpoint = endpoints['signalk-ws']
+
+        logging.info("Got endpoints: api_endpoint={} stream_endpoint={}".format(
+            self.api_endpoint,
+            self.stream_endpoint,
+            ))
+
+    async def __get_json(self, url):
+        """GET a url and decode the json body"""
+        async with self._session.get(url) as response:
+            response.raise_for_status()
+            return self.decoder(await response.read())
+
+    async def fetch(self, path, compress=True):
+        """GET a subtree of the REST API and merge it into data
+
+        see `Client.fetch`.
+        """
+        url = subtree_url(self.api_endpoint, path)
+        headers = {'Accept-Encoding': 'gzip' if compress else 'identity'}
+        etag = self.__etags.get(url)
+        if etag is not None:
+            headers['If-None-Match'] = etag
+
+        async with self._session.get(url, headers=headers) as response:
+            if response.status == 304:
+                return None
+            response.raise_for_status()
+            if 'ETag' in response.headers:
+                self.__etags[url] = response.headers['ETag']
+            subtree = self.decoder(await response.read())
+
+        self.data.merge(path, subtree)
+        return subtree
+
+    async def fetch_many(self, paths, compress=True):
+        """fetch several subtrees concurrently
+
+        returns a dict of path to subtree (or None when not modified).
+        """
+        paths = list(paths)
+        subtrees = await asyncio.gather(
+            *[self.fetch(path, compress) for path in paths]
+            )
+        return dict(zip(paths, subtrees))
+
+    async def connect(self, wait=True, timeout=None):
+        """connect to the server and wait for the hello message
+
+        Keyword arguments:
+        wait -- wait for the hello message (default True); otherwise it is
+            applied (and yielded) by `deltas()`, unless it arrived while
+            the snapshot downloaded
+        timeout -- seconds to wait for the hello message (default None)
+
+        raises asyncio.TimeoutError if the hello does not arrive in time.
+        whatever fails, the client is closed again before the error is
+        raised.
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        self.__closing = False
+        self.state = CONNECTING
+        try:
+            await self.__connect(wait, timeout)
+        except BaseException:
+            await self.close()
+            raise
+
+    async def __connect(self, wait, timeout):
+        """handshake of `connect()`"""
+        await self.__config()
+
+        self.data = Data(store=self.store)
+        if self.rate_limits:
+            self.data.rate_limiter = RateLimiter(
+                self.rate_limits, self.data.get_prop_units
+                )
+        if self.source_priorities:
+            self.data.source_selector = SourceSelector(self.source_priorities)
+        for ttl in self.ttls or ():
+            self.data.add_ttl(ttl)
+        self.data.begin_buffering()
+        try:
+            snapshot = await self.__download()
+        except BaseException:
+            self.data.end_buffering(replay=False)
+            raise
+        self.data.resync(snapshot)
+
+        if wait:
+            await asyncio.wait_for(self.__wait_hello(), timeout)
+
+    async def __wait_hello(self):
+        """wait for hello message over websocket"""
+        while self.data.initialized == False:
+            delta = await self.__receive()
+            if delta is None:
+                raise ConnectionError(
+                    "websocket closed before hello message"
+                    )
+            self.data.process_delta(delta)
+
+    async def __download(self):
+        """open the stream while the snapshot downloads, return the snapshot
+
+        deltas arriving first go to `data`, which buffers them until the
+        snapshot is loaded with `Data.resync()`. the download is cancelled
+        if the stream fails.
+        """
+        snapshot = asyncio.ensure_future(self.__get_json(self.api_endpoint))
+        received = None
+        try:
+            await self.__open_stream()
+            while not snapshot.done():
+                received = asyncio.ensure_future(self.__receive())
+                await asyncio.wait((snapshot, received),
+                    return_when=asyncio.FIRST_COMPLETED)
+                if not received.done():
+                    # an unread frame stays queued on the websocket, but
+                    # the receive has to end before the next one starts
+                    received.cancel()
+                    await asyncio.wait((received,))
+                    if received.cancelled():
+                        break
+                delta = received.result()
+                if delta is None:
+                    raise ConnectionError(
+                        "websocket closed during the snapshot"
+                        )
+                self.data.process_delta(delta)
+            return await snapshot
+        finally:
+            snapshot.cancel()
+            if received is not None and not received.done():
+                received.cancel()
+                await asyncio.wait((received,))
+
+    async def __open_stream(self):
+        """open the websocket and replay subscriptions"""
+        compress = 0
+        if self.compression:
+            compress = getattr(self.compression, 'window_bits', None) or 15
+        self._ws = await self._session.ws_connect(
+            stream_url(self.stream_endpoint, self.subscriptions),
+            compress=compress
+            )
+        if self.subscriptions is not None:
+            for message in self.subscriptions.messages():
+                await self.__send(message)
+        else:
+            for message in self.__unsubscribed:
+                await self.__send(message)
+        self.state = CONNECTED
+        self.backoff.reset()
+
+    async def __reconnect(self):
+        """reconnect after the stream dropped, returns False when closed"""
+        while not self.__closing:
+            self.state = DISCONNECTED
+            delay = self.backoff.next()
+            logging.warning("websocket lost, reconnecting in {:.1f}s".format(
+                delay
+                ))
+            await asyncio.sleep(delay)
+            if self.__closing:
+                break
+            self.state = CONNECTING
+            try:
+                if self.__discover:
+                    self.server = None
+                await self.__config()
+                self.data.begin_buffering()
+                try:
+                    snapshot = await self.__download()
+                except (aiohttp.ClientError, ValueError) as error:
+                    if self._ws is None or self._ws.closed:
+                        raise
+                    logging.warning(
+                        "snapshot failed, keeping cached values: {}".format(
+                            error
+                            ))
+                    self.data.end_buffering()
+                else:
+                    self.data.resync(snapshot)
+            except (aiohttp.ClientError, OSError, KeyError,
+                    ValueError) as error:
+                self.data.end_buffering(replay=False)
+                logging.error("reconnect failed: {}".format(error))
+                continue
+            self.reconnects += 1
+            return True
+        return False
+
+    async def __send(self, message):
+        """send a message if the websocket is open"""
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.send_str(json.dumps(message))
+
+    async def subscribe(self, paths, context='vessels.self', period=None,
+            min_period=None, policy=None):
+        """subscribe to one or more paths, see `Client.subscribe`
+        """
+        if self.subscriptions is None:
+            self.subscriptions = Subscriptions()
+            self.__unsubscribed = []
+            await self.__send(unsubscribe_message('*', ['*']))
+        for message in self.subscriptions.add(make_subscriptions(
+                paths, context, period, min_period, policy)):
+            await self.__send(message)
+
+    async def unsubscribe(self, paths=None, context='vessels.self'):
+        """unsubscribe from paths in context (default: all of context), see
+        `Client.unsubscribe`
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        if self.subscriptions is None:
+            message = unsubscribe_message(context,
+                ['*'] if paths is None else paths)
+            self.__unsubscribed.append(message)
+            await self.__send(message)
+            return
+        for message in self.subscriptions.remove(paths, context):
+            await self.__send(message)
+
+    async def __receive(self):
+        """return the next decoded delta, or None once the stream ends
+
+        with TTLs or rate limits, a quiet stream still expires values and
+        stores the rate limited values that are due every
+        HOUSEKEEPING_INTERVAL seconds.
+        """
+        timeout = None
+        if self.data is not None and (self.data.expiry is not None
+                or self.data.rate_limiter is not None):
+            timeout = HOUSEKEEPING_INTERVAL
+        while True:
+            try:
+                message = await self._ws.receive(timeout)
+            except asyncio.TimeoutError:
+                self.data.expire()
+                self.data.flush_rate_limits(due_only=True)
+                continue
+            if message.type in (aiohttp.WSMsgType.TEXT,
+                    aiohttp.WSMsgType.BINARY):
+                self.received += 1
+                self.last_received = time.time()
+                if self.recorder is not None:
+                    self.recorder.record(message.data, self.last_received)
+                try:
+                    return self.decoder(message.data)
+                except ValueError as error:
+                    logging.warning("dropping undecodable frame: {}".format(
+                        error
+                        ))
+                    continue
+            elif message.type == aiohttp.WSMsgType.ERROR:
+                logging.error("websocket error: {}".format(
+                    self._ws.exception()
+                    ))
+                return None
+            elif message.type in (
+                    aiohttp.WSMsgType.CLOSE,
+                    aiohttp.WSMsgType.CLOSING,
+                    aiohttp.WSMsgType.CLOSED,
+                    ):
+                logging.warning("websocket closed")
+                return None
+
+    async def deltas(self):
+        """asynchronous iterator of delta messages
+
+        each delta is applied to `data` before it is yielded.
+        """
+        while True:
+            delta = await self.__receive()
+            if delta is None:
+                if self.__closing or not self.reconnect:
+                    self.state = CLOSED
+                    return
+                self.disconnects += 1
+                if not await self.__reconnect():
+                    self.state = CLOSED
+                    return
+                continue
+            self.data.process_delta(delta)
+            yield delta
+
+    async def run(self):
+        """apply deltas to `data` until the connection is closed
+        """
+        async for delta in self.deltas():
+            pass
+
+    async def close(self):
+        """close the signalk client connection
+        """
+        logging.warning("Closing websocket...")
+        self.__closing = True
+        self.state = CLOSED
+        if self.data is not None:
+            self.data.flush_rate_limits()
+        if self._ws is not None:
+            await self._ws.close()
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
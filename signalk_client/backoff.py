@@ -0,0 +1,52 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""reconnect backoff"""
+
+import random
+
+class Backoff(object):
+    """jittered exponential backoff
+
+    Keyword arguments:
+    initial -- first delay in seconds (default 0.5)
+    maximum -- largest delay in seconds (default 30.0)
+    factor -- growth factor per attempt (default 2.0)
+    jitter -- fraction of each delay that is randomized (default 0.5)
+
+    each call to `next()` returns the delay before the next attempt; call
+    `reset()` once a connection succeeds.
+    """
+
+    def __init__(self, initial=0.5, maximum=30.0, factor=2.0, jitter=0.5):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next(self):
+        """return the delay in seconds before the next attempt"""
+        delay = min(self.maximum, self.initial * self.factor**self.attempts)
+        if delay < self.maximum:
+            self.attempts += 1
+        return delay - delay*self.jitter*random.random()
+
+    def reset(self):
+        """start over from the initial delay"""
+        self.attempts = 0
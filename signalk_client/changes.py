@@ -0,0 +1,185 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""change notifications of the data store
+
+Listeners are registered with a dotted pattern of the full key of the
+values they want, context included, eg.
+"vessels.self.navigation.speedOverGround" or "vessels.*.navigation". Each
+key of a pattern may be a glob matching one key of a value's context and
+path, and a pattern also matches everything below it.
+
+Patterns are kept in a trie of their keys, so finding the listeners of a
+value only follows the branches that match it; the result is cached per
+(context, path), so repeated updates of a path cost one dict lookup.
+"""
+
+import fnmatch
+import logging
+import threading
+
+# most (context, path) listener lists kept before the cache is emptied
+MATCH_CACHE_SIZE = 65536
+
+# characters that make a pattern key a glob
+GLOB_CHARS = '*?['
+
+class ChangeListener(object):
+    """a change callback registered with `Data.on_change()`
+
+    the callback is called as callback(context, path, value, properties),
+    context and path being dotted strings (context is None for values
+    outside any context) and properties the dict of the update's
+    timestamp and source, which must not be modified.
+    """
+
+    def __init__(self, pattern, callback, executor=None):
+        self.pattern = pattern
+        self.callback = callback
+        self.executor = executor
+        self.calls = 0
+        self.errors = 0
+
+    def __repr__(self):
+        return "ChangeListener({!r}, {!r})".format(self.pattern, self.callback)
+
+    def deliver(self, context, path, value, properties):
+        """call the callback here, or submit it to the executor"""
+        self.calls += 1
+        if self.executor is not None:
+            self.executor.submit(self.callback, context, path, value,
+                properties)
+            return
+        try:
+            self.callback(context, path, value, properties)
+        except Exception as error:
+            self.errors += 1
+            logging.error("error from change callback {}: {}".format(
+                self.callback, error
+                ))
+
+class TrieNode(object):
+    """a key of the change trie"""
+
+    __slots__ = ('children', 'globs', 'listeners')
+
+    def __init__(self):
+        self.children = {}
+        self.globs = {}
+        self.listeners = []
+
+class ChangeDispatcher(object):
+    """finds and calls the listeners of changed values
+
+    Keyword arguments:
+    self_context -- function returning the self context (eg.
+        "vessels.urn:mrn:imo:mmsi:230099999"), so "vessels.self" patterns
+        match it (default None, "self" is only matched literally)
+    """
+
+    def __init__(self, self_context=None):
+        self.self_context = self_context
+        self.__root = TrieNode()
+        self.__matches = {}
+        self.__lock = threading.Lock()
+        self.listeners = 0
+
+    def add(self, listener):
+        """register a ChangeListener"""
+        with self.__lock:
+            node = self.__root
+            for key in listener.pattern.split('.') if listener.pattern else ():
+                branch = node.globs if any(
+                    char in key for char in GLOB_CHARS
+                    ) else node.children
+                child = branch.get(key)
+                if child is None:
+                    child = branch[key] = TrieNode()
+                node = child
+            node.listeners.append(listener)
+            self.listeners += 1
+            self.__matches = {}
+
+    def remove(self, listener):
+        """unregister a ChangeListener, returns False if it was not
+        registered"""
+        with self.__lock:
+            node = self.__root
+            for key in listener.pattern.split('.') if listener.pattern else ():
+                node = node.globs.get(key) or node.children.get(key)
+                if node is None:
+                    return False
+            if listener not in node.listeners:
+                return False
+            node.listeners.remove(listener)
+            self.listeners -= 1
+            self.__matches = {}
+            return True
+
+    def reset(self):
+        """forget the cached matches, eg. when the self context changed"""
+        with self.__lock:
+            self.__matches = {}
+
+    def match(self, context, path):
+        """return the tuple of listeners of a path (a compiled
+        `signalk_client.paths.Path`) in a dotted context"""
+        matches = self.__matches
+        listeners = matches.get((context, path.dotted))
+        if listeners is not None:
+            return listeners
+        with self.__lock:
+            listeners = self.__match(context, path)
+            if len(self.__matches) >= MATCH_CACHE_SIZE:
+                self.__matches = {}
+            self.__matches[(context, path.dotted)] = listeners
+        return listeners
+
+    def __match(self, context, path):
+        """walk the trie for the keys of a value"""
+        context_keys = tuple(context.split('.')) if context else ()
+        keys = [context_keys + path.keys]
+        self_context = self.self_context() \
+            if self.self_context is not None else None
+        if context and context == self_context:
+            keys.append(('vessels', 'self') + path.keys)
+        found = []
+        for value_keys in keys:
+            for listener in self.__walk(self.__root, value_keys, 0):
+                if listener not in found:
+                    found.append(listener)
+        return tuple(found)
+
+    def __walk(self, node, keys, depth):
+        """generate the listeners of node and of its children matching
+        keys from depth on"""
+        yield from node.listeners
+        if depth == len(keys):
+            return
+        key = keys[depth]
+        child = node.children.get(key)
+        if child is not None:
+            yield from self.__walk(child, keys, depth + 1)
+        for pattern, child in node.globs.items():
+            if fnmatch.fnmatchcase(key, pattern):
+                yield from self.__walk(child, keys, depth + 1)
+
+    def dispatch(self, context, path, value, properties):
+        """deliver a stored value to the listeners matching it"""
+        for listener in self.match(context, path):
+            listener.deliver(context, path.dotted, value, properties)
@@ -21,124 +21,625 @@
 import json
 import logging
 import requests
+import requests.adapters
 import threading
 import time
-import websocket
-from signalk_client.data import Data
+from concurrent.futures import ThreadPoolExecutor
+from signalk_client.backoff import Backoff
+from signalk_client.data import Data, load_cache
+from signalk_client.decode_pool import DecodePool
+from signalk_client.decoder import get_decoder
+from signalk_client.ratelimit import RateLimiter
+from signalk_client.sources import SourceSelector
+from signalk_client.store import TREE
+from signalk_client.receive_queue import BLOCK, ReceiveQueue
+from signalk_client.subscription import (
+    Subscription, Subscriptions, subscribe_message, unsubscribe_message)
+from signalk_client.transport import (
+    TCP, TRANSPORTS, WEBSOCKET, TCPTransport, TransportError,
+    WebSocketTransport)
+from signalk_client.websocket_stream import PerMessageDeflate, WebSocketStream
+
+# connection states
+DISCONNECTED = 'disconnected'
+CONNECTING = 'connecting'
+CONNECTED = 'connected'
+CLOSED = 'closed'
+
+# websocket keepalive, also bounds how long the websocket thread takes to
+# notice a close() made from another thread
+PING_INTERVAL = 20
+PING_TIMEOUT = 10
+
+# keep-alive connections kept per host for REST requests
+HTTP_POOL_SIZE = 4
+
+# seconds between housekeeping runs (expiry, storing rate limited values
+# held back) while the stream is quiet
+HOUSEKEEPING_INTERVAL = 1.0
+
+def zeroconf_server():
+    """discover local signalk server
+    """
+
+    import time
+    from signalk_client.zeroconf import ServiceBrowser, Zeroconf
+
+    class MyListener(object):
+        """zeroconf listener object"""
+        def __init__(self):
+            self.services = {}
+
+        def remove_service(self, zeroconf, service_type, name):
+            """service removal function"""
+            self.services.pop(name)
+            logging.info("zeroconf: service removed: {}".format(name))
+
+        def add_service(self, zeroconf, service_type, name):
+            """service add function"""
+            info = zeroconf.get_service_info(service_type, name)
+            self.services[name] = info
+            logging.info("zeroconf: service found: {} @ {}:{}".format(
+                name,
+                info.server,
+                info.port
+                ))
+
+        def get_services(self):
+            """service getter"""
+            return self.services
+
+    service_type = "_signalk-http._tcp.local."
+    zeroconf = Zeroconf()
+    listener = MyListener()
+    browser = ServiceBrowser(zeroconf, service_type, listener)
+    while True:
+        time.sleep(2)
+        if len(list(listener.get_services().keys())) > 0:
+            break
+        logging.warning("No Services of type:{} found.. waiting..".format(
+            service_type
+            ))
+    zeroconf.close()
+    services = listener.get_services()
+    service_info = services[list(services.keys())[0]]
+    return "%s:%s"%(service_info.server, service_info.port)
+
+def stream_url(stream_endpoint, subscriptions):
+    """return the stream url for a set of subscriptions
+
+    without subscriptions (None) the server is asked to send everything,
+    otherwise the stream starts empty and subscriptions are sent once it
+    is open.
+    """
+    if subscriptions is None:
+        return "%s?subscribe=all"%(stream_endpoint)
+    return "%s?subscribe=none"%(stream_endpoint)
+
+def make_subscriptions(paths, context, period, min_period, policy):
+    """return Subscription objects for paths (or Subscription objects)"""
+    if isinstance(paths, (str, Subscription)):
+        paths = [paths]
+    subscriptions = []
+    for path in paths:
+        if not isinstance(path, Subscription):
+            path = Subscription(
+                path, context=context, period=period,
+                min_period=min_period, policy=policy
+                )
+        subscriptions.append(path)
+    return subscriptions
+
+def subtree_url(api_endpoint, path):
+    """return the REST url for a dotted signalk path"""
+    return "%s/%s"%(api_endpoint.rstrip('/'), path.replace('.', '/'))
+
+def parse_endpoints(discovery):
+    """return the v1 endpoints dict from a /signalk discovery document
+    """
+    endpoints = discovery['endpoints']['v1']
+    logging.info("Connected to SignalK Server({})".format(
+        endpoints['version']
+        ))
+    return endpoints
 
 class Client(object):
     """Client connection object
 
     Keyword arguments:
     server -- server host (default None)
+    subscriptions -- list of paths or Subscription objects (default None)
+    reconnect -- reconnect when the stream drops (default True)
+    backoff -- Backoff used between reconnect attempts (default None)
+    timeout -- seconds to wait for the hello message (default None)
+    autoconnect -- connect when the client is created (default True)
+    session -- a requests.Session to share (default None)
+    decoder -- json decoder name or function (default None, the fastest
+        installed; see `signalk_client.decoder`)
+    queue_size -- apply deltas on a worker behind a receive queue of this
+        size (default None, apply on the websocket thread)
+    overflow -- receive queue overflow policy (default "block", see
+        `signalk_client.receive_queue`)
+    recorder -- a `signalk_client.recording.Recorder` that every received
+        frame is appended to (default None)
+    compression -- negotiate permessage-deflate on the stream: True, or a
+        `signalk_client.websocket_stream.PerMessageDeflate` to tune window
+        bits and context takeover (default None, uncompressed)
+    transport -- "websocket" or "tcp" to force the stream transport
+        (default None, chosen from the advertised endpoints)
+    decode_workers -- decode frames on this many worker processes and
+        apply them on one writer thread (default None, decode on the
+        stream thread); decoder must then be a name or None
+    decode_start_method -- multiprocessing start method of the decode
+        workers (default None, see `signalk_client.decode_pool.DecodePool`)
+    cache -- file to keep a copy of `data` in, for warm starts (default
+        None)
+    cache_interval -- also save the cache every this many seconds
+        (default None, only on close)
+    rate_limits -- `signalk_client.ratelimit.RateLimit` objects that
+        decimate fast paths before they are stored (default None)
+    store -- `data` store backend, "tree" or "flat" (default "tree"; see
+        `signalk_client.data.Data`)
+    locking -- guard `data` with a reader/writer lock, for consistent
+        reads from other threads (default False)
+    source_priorities -- `signalk_client.sources.SourcePriority` objects
+        choosing which source of a path is stored (default None, the
+        latest update of any source)
+    ttls -- `signalk_client.expiry.TTL` objects evicting, or marking
+        stale, values and vessels that stop being updated (default None)
 
     By default, this function uses `zeroconf_server` to automatically locate
     a _signalk-http._tcp.local. service on the local network.
 
     Optionally, you can pass the hostname of the signalk server via the
     keyword `server`. To specify a port use `hostname:port` format.
+
+    Without `subscriptions` the server streams everything it knows about
+    (`subscribe=all`). Pass a list, even an empty one, to only receive the
+    subscribed paths; subscriptions can be changed at any time with
+    `subscribe()` and `unsubscribe()`.
+
+    When the stream drops, the client reconnects with jittered exponential
+    `backoff`, rediscovers the endpoints and refreshes `data` from a new
+    REST snapshot (keeping the cached values if that fails). `state` holds
+    the connection state; `disconnects` and `reconnects` count events. Pass
+    `reconnect=False` to leave the connection closed instead.
+
+    The client connects as soon as it is created and blocks until the
+    server's hello message arrives, or raises TimeoutError after `timeout`
+    seconds. Pass `autoconnect=False` and call `connect(wait=False)` to do
+    the connection work in the background instead.
+
+    REST requests share one keep-alive `session`; use `fetch()` and
+    `fetch_many()` to refresh parts of `data` without downloading the whole
+    tree again.
+
+    With `queue_size`, the websocket thread only decodes frames and hands
+    them to `receive_queue`, so slow delta processing does not hold up
+    socket reads; `receive_queue.stats()` reports its depth and lag.
+
+    The stream is read over the plain `signalk-tcp` endpoint when the
+    server advertises one and compression was not asked for, falling back
+    to the websocket if it cannot be reached; `w_sock` holds the current
+    `signalk_client.transport` transport.
+
+    With `decode_workers`, json decoding leaves the stream thread and the
+    GIL for a `signalk_client.decode_pool.DecodePool` (`decode_pool`),
+    which helps when a busy AIS feed keeps one core saturated; it can not
+    be combined with `queue_size`.
+
+    With a `cache` file, `data` is saved there on close (and every
+    `cache_interval` seconds) and loaded again when the next client is
+    created, so last-known values are readable at once. The client then
+    connects without waiting for the REST snapshot, which revalidates the
+    cached tree in the background. A cache saved for another server is
+    ignored.
+
+    With `compression`, `stream_stats()` reports the bytes read from the
+    wire, the inflated bytes and the time spent inflating them.
     """
 
-    def __init__(self, server=None):
+    def __init__(self, server=None, subscriptions=None, reconnect=True,
+            backoff=None, timeout=None, autoconnect=True, session=None,
+            decoder=None, queue_size=None, overflow=BLOCK,
+            recorder=None, compression=None, transport=None,
+            decode_workers=None, cache=None, cache_interval=None,
+            rate_limits=None, store=TREE, locking=False,
+            source_priorities=None, ttls=None, decode_start_method=None):
+        if transport is not None and transport not in TRANSPORTS:
+            raise ValueError("unknown transport: {}".format(transport))
+        if decode_workers is not None and queue_size is not None:
+            raise ValueError("decode_workers and queue_size are exclusive")
         self.server = server
         self.api_endpoint = None
         self.stream_endpoint = None
+        self.tcp_endpoint = None
+        self.transport = transport
+        self.subscriptions = None
+        if subscriptions is not None:
+            self.subscriptions = Subscriptions(
+                make_subscriptions(subscriptions, 'vessels.self',
+                    None, None, None)
+                )
 
-        self.__config()
+        self.reconnect = reconnect
+        self.backoff = backoff if backoff is not None else Backoff()
+        self.timeout = timeout
+        self.state = DISCONNECTED
+        self.reconnects = 0
+        self.disconnects = 0
+        self.__discover = server is None
+        self.__closing = threading.Event()
+        self.__opened = False
+        # unsubscribes made on a "subscribe=all" stream, replayed with it
+        self.__unsubscribed = []
+        self.__loaded = False
+        self.__aborted = None
+        self.__tcp_failed = False
+        self.__open_transport = None
+
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=HTTP_POOL_SIZE,
+                pool_maxsize=HTTP_POOL_SIZE,
+                )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.__etags = {}
+        self.decoder = get_decoder(decoder)
+        self.recorder = recorder
+        if compression is True:
+            compression = PerMessageDeflate()
+        self.compression = compression
+
+        self.data = Data(store=store, locking=locking)
+        if rate_limits:
+            self.data.rate_limiter = RateLimiter(
+                rate_limits, self.data.get_prop_units
+                )
+        if source_priorities:
+            self.data.source_selector = SourceSelector(source_priorities)
+        for ttl in ttls or ():
+            self.data.add_ttl(ttl)
+        self.receive_queue = None
+        if queue_size is not None:
+            self.receive_queue = ReceiveQueue(
+                self.data.process_delta, queue_size, overflow
+                )
+        self.decode_pool = None
+        if decode_workers is not None:
+            self.decode_pool = DecodePool(
+                self.data.process_values, decode_workers, decoder,
+                start_method=decode_start_method
+                )
+        self.w_sock = None
+        self.websocket_t = None
+
+        self.cache = cache
+        self.cache_interval = cache_interval
+        self.cache_saved = None
+        self.__cache_t = None
+        self.__housekeeping_t = None
+        if cache is not None:
+            self.__load_cache()
+
+        if autoconnect:
+            self.connect()
+
+    def connect(self, wait=True, timeout=None):
+        """connect to the server
+
+        Keyword arguments:
+        wait -- block until the hello message arrives (default True)
+        timeout -- seconds to wait for the hello message (default None,
+            the client's `timeout`, which by default waits forever)
+
+        With wait=True, discovery and snapshot errors are raised here and a
+        TimeoutError is raised (after closing the client) if the hello does
+        not arrive in time. With wait=False all of the connection work is
+        done on the websocket thread; use `wait_ready()` to block later.
+
+        The REST snapshot is downloaded while the websocket handshake is in
+        progress; deltas that arrive first are buffered by `data` and
+        replayed on top of the snapshot.
+        """
+        if self.websocket_t is not None:
+            return
+        self.__closing.clear()
+        self.state = CONNECTING
+
+        if wait:
+            try:
+                self.__open()
+            except (requests.RequestException, KeyError, ValueError):
+                self.close()
+                raise
+
+        # started once the stream exists, so a failed open leaves nothing
+        # running; frames only arrive once the websocket thread runs
+        if self.receive_queue is not None:
+            self.receive_queue.start()
+        if self.decode_pool is not None:
+            self.decode_pool.start()
+
+        self.websocket_t = threading.Thread(target=self.__run)
+        self.websocket_t.daemon = True
+        self.websocket_t.start()
+
+        if self.cache is not None and self.cache_interval:
+            self.__cache_t = threading.Thread(target=self.__save_periodically)
+            self.__cache_t.daemon = True
+            self.__cache_t.start()
+
+        if self.data.expiry is not None \
+                or self.data.rate_limiter is not None:
+            self.__housekeeping_t = threading.Thread(
+                target=self.__housekeeping
+                )
+            self.__housekeeping_t.daemon = True
+            self.__housekeeping_t.start()
 
-        self.data = Data(requests.get(self.api_endpoint).json())
-        self.w_sock = websocket.WebSocketApp(
-            "%s?subscribe=all"%(self.stream_endpoint),
+        if wait and self.__loaded:
+            # warm start: revalidate the cached tree in the background
+            snapshot_t = threading.Thread(
+                target=self.__background_snapshot, args=(self.w_sock,)
+                )
+            snapshot_t.daemon = True
+            snapshot_t.start()
+            self.wait_ready(timeout)
+        elif wait:
+            try:
+                self.__snapshot()
+            except (requests.RequestException, ValueError):
+                self.close()
+                raise
+            self.wait_ready(timeout)
+
+    def wait_ready(self, timeout=None):
+        """wait for the hello message over websocket
+
+        raises TimeoutError, after closing the client, if it does not arrive
+        within timeout seconds (default: the client's `timeout`).
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if not self.data.wait_initialized(timeout):
+            self.close()
+            raise TimeoutError(
+                "no hello message from {} within {}s".format(
+                    self.server, timeout
+                    ))
+
+    def __stream_transport(self):
+        """return the transport name to open the stream with"""
+        if self.transport is not None:
+            return self.transport
+        if self.tcp_endpoint and not self.compression \
+                and not self.__tcp_failed:
+            return TCP
+        return WEBSOCKET
+
+    def __websocket(self):
+        """create the stream transport
+
+        websocket-client has no extension support, so compressed streams
+        use WebSocketStream.
+        """
+        callbacks = dict(
             on_message=self.__ws_on_message,
             on_error=self.__ws_on_error,
             on_close=self.__ws_on_close,
-            on_open=self.__ws_on_open
+            on_open=self.__ws_on_open,
             )
+        if self.__stream_transport() == TCP:
+            if not self.tcp_endpoint:
+                raise ValueError("server does not advertise signalk-tcp")
+            return TCPTransport(self.tcp_endpoint, **callbacks)
+        url = stream_url(self.stream_endpoint, self.subscriptions)
+        if self.compression:
+            return WebSocketStream(url, deflate=self.compression, **callbacks)
+        return WebSocketTransport(url, **callbacks)
 
-        self.websocket_t = threading.Thread(target=self.w_sock.run_forever)
-        self.websocket_t.daemon = True
-        self.websocket_t.start()
+    def __open(self):
+        """discover endpoints and create the websocket
+
+        deltas are buffered from here until the snapshot is loaded.
+        """
+        if self.__discover:
+            self.server = None
+        self.__config()
+        self.data.begin_buffering()
+        self.w_sock = self.__websocket()
 
-        # wait for hello message over websocket
-        while self.data.initialized == False:
-            time.sleep(0.2)
+    def __snapshot(self):
+        """fetch the REST snapshot and load it under the buffered deltas
 
-    def __zeroconf_server(self):
-        """discover local signalk server
+        if a snapshot was loaded before, a failure keeps the cached values
+        instead of raising.
         """
+        try:
+            seed = self.decoder(self.session.get(self.api_endpoint).content)
+        except (requests.RequestException, ValueError) as error:
+            if not self.__loaded:
+                self.data.end_buffering(replay=False)
+                raise
+            logging.warning(
+                "snapshot failed, keeping cached values: {}".format(error)
+                )
+            self.data.end_buffering()
+            return
+        self.data.resync(seed)
+        self.__loaded = True
 
-        import time
-        from signalk_client.zeroconf import ServiceBrowser, Zeroconf
-
-        class MyListener(object):
-            """zeroconf listener object"""
-            def __init__(self):
-                self.services = {}
-
-            def remove_service(self, zeroconf, service_type, name):
-                """service removal function"""
-                self.services.pop(name)
-                logging.info("zeroconf: service removed: {}".format(name))
-
-            def add_service(self, zeroconf, service_type, name):
-                """service add function"""
-                info = zeroconf.get_service_info(service_type, name)
-                self.services[name] = info
-                logging.info("zeroconf: service found: {} @ {}:{}".format(
-                    name,
-                    info.server,
-                    info.port
-                    ))
+    def __background_snapshot(self, w_sock):
+        """snapshot thread, drops the stream if there is nothing to show"""
+        try:
+            self.__snapshot()
+        except (requests.RequestException, ValueError) as error:
+            logging.error("snapshot failed: {}".format(error))
+            self.__abort(w_sock)
 
-            def get_services(self):
-                """service getter"""
-                return self.services
-
-        service_type = "_signalk-http._tcp.local."
-        zeroconf = Zeroconf()
-        listener = MyListener()
-        browser = ServiceBrowser(zeroconf, service_type, listener)
-        while True:
-            time.sleep(2)
-            if len(list(listener.get_services().keys())) > 0:
+    def __run(self):
+        """websocket thread, runs the stream and reconnects when it drops"""
+        need_open = self.w_sock is None
+        while not self.__closing.is_set():
+            if need_open:
+                self.state = CONNECTING
+                try:
+                    self.__open()
+                    need_open = False
+                except (requests.RequestException, KeyError, ValueError) as error:
+                    logging.error("connect failed: {}".format(error))
+                else:
+                    snapshot_t = threading.Thread(
+                        target=self.__background_snapshot,
+                        args=(self.w_sock,)
+                        )
+                    snapshot_t.daemon = True
+                    snapshot_t.start()
+            if not need_open and not self.__closing.is_set():
+                w_sock = self.w_sock
+                w_sock.run_forever(
+                    ping_interval=PING_INTERVAL,
+                    ping_timeout=PING_TIMEOUT,
+                    )
+                need_open = True
+                if w_sock.name == TCP and self.transport is None \
+                        and w_sock is not self.__open_transport:
+                    logging.warning("signalk-tcp unreachable, using websocket")
+                    self.__tcp_failed = True
+            if self.__closing.is_set() or not self.reconnect:
                 break
-            logging.warning("No Services of type:{} found.. waiting..".format(
-                service_type
+            self.state = DISCONNECTED
+
+            delay = self.backoff.next()
+            logging.warning("websocket lost, reconnecting in {:.1f}s".format(
+                delay
                 ))
-        zeroconf.close()
-        services = listener.get_services()
-        service_info = services[list(services.keys())[0]]
-        return "%s:%s"%(service_info.server, service_info.port)
+            if self.__closing.wait(delay):
+                break
+        self.state = CLOSED
 
     def __config(self):
         """discover endpoints from server
         """
 
-        import requests
-
         # Set from arg or discover via zeroconf, server address and port
         if self.server == None:
-            self.server = self.__zeroconf_server()
+            self.server = zeroconf_server()
         logging.info("Attempting Connection to {}...".format(self.server))
 
         # Discover API and Stream endpoints
-        data = requests.get("http://%s/signalk"%(self.server)).json()
-        endpoints = data['endpoints']['v1']
-        logging.info("Connected to SignalK Server({})".format(
-            endpoints['version']
-            ))
+        endpoints = parse_endpoints(
+            self.decoder(
+                self.session.get("http://%s/signalk"%(self.server)).content
+                )
+            )
 
         self.api_endpoint = endpoints['signalk-http']
         self.stream_endpoint = endpoints['signalk-ws']
+        self.tcp_endpoint = endpoints.get('signalk-tcp')
+
+        logging.info("Got endpoints: api_endpoint={} stream_endpoint={} "\
+            "tcp_endpoint={}".format(
+                self.api_endpoint,
+                self.stream_endpoint,
+                self.tcp_endpoint,
+                ))
 
-        logging.info("Got endpoints: api_endpoint={} stream_endpoint={}".format(
-            self.api_endpoint,
-            self.stream_endpoint,
+    def __load_cache(self):
+        """load data from the cache file, if it suits this server"""
+        state = load_cache(self.cache)
+        if state is None:
+            return
+        if self.server is not None and state.get('server') != self.server:
+            logging.info("ignoring cache of {}".format(state.get('server')))
+            return
+        self.data.restore(state['data'])
+        self.cache_saved = state['saved']
+        self.__loaded = True
+        logging.info("loaded cache {} saved at {}".format(
+            self.cache, state['saved']
             ))
 
+    def save_cache(self):
+        """save data to the cache file now"""
+        if self.cache is None or not self.__loaded:
+            # never overwrite a cache with an empty tree
+            return
+        try:
+            self.data.save(self.cache, server=self.server)
+        except (OSError, RuntimeError, TypeError, ValueError) as error:
+            logging.error("saving cache failed: {}".format(error))
+            return
+        self.cache_saved = time.time()
+
+    def __save_periodically(self):
+        """cache thread, saves every cache_interval seconds"""
+        while not self.__closing.wait(self.cache_interval):
+            self.save_cache()
+
+    def __housekeeping(self):
+        """housekeeping thread, expires values and stores the rate limited
+        values that are due, so a quiet stream is not left behind"""
+        while not self.__closing.wait(HOUSEKEEPING_INTERVAL):
+            self.data.expire()
+            self.data.flush_rate_limits(due_only=True)
+
+    def fetch(self, path, compress=True):
+        """GET a subtree of the REST API and merge it into data
+
+        Keyword arguments:
+        path -- dotted signalk path (eg. "vessels.self.navigation")
+        compress -- ask for a gzip encoded response (default True)
+
+        returns the subtree, or None if the server answered 304 Not Modified
+        to the ETag of the previous fetch of the same path.
+        """
+        url = subtree_url(self.api_endpoint, path)
+        headers = {'Accept-Encoding': 'gzip' if compress else 'identity'}
+        etag = self.__etags.get(url)
+        if etag is not None:
+            headers['If-None-Match'] = etag
+
+        response = self.session.get(url, headers=headers)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        if 'ETag' in response.headers:
+            self.__etags[url] = response.headers['ETag']
+
+        subtree = self.decoder(response.content)
+        self.data.merge(path, subtree)
+        return subtree
+
+    def fetch_many(self, paths, compress=True):
+        """fetch several subtrees concurrently over the session's pool
+
+        returns a dict of path to subtree (or None when not modified).
+        """
+        paths = list(paths)
+        if not paths:
+            return {}
+        workers = min(len(paths), HTTP_POOL_SIZE)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            subtrees = executor.map(
+                lambda path: self.fetch(path, compress), paths
+                )
+            return dict(zip(paths, subtrees))
+
     def __ws_on_message(self, w_sock, message):
         """websocket message handler"""
-        self.data.process_delta(json.loads(message))
+        if self.recorder is not None:
+            self.recorder.record(message)
+        if self.decode_pool is not None:
+            self.decode_pool.put(message)
+        elif self.receive_queue is not None:
+            self.receive_queue.put(self.decoder(message))
+        else:
+            self.data.process_delta(self.decoder(message))
 
     def __ws_on_error(self, w_sock, error):
         """websocket error handler"""
@@ -146,15 +647,146 @@ class Client(object):
 
     def __ws_on_close(self, w_sock, *args):
         """websocket connection close handler"""
-        # TODO: handle connection close by reconnecting?
         logging.warning("websocket closed")
+        if not self.__closing.is_set():
+            self.disconnects += 1
 
     def __ws_on_open(self, w_sock):
         """websocket connection open handler"""
-        pass
+        if self.__closing.is_set() or w_sock is self.__aborted:
+            # close() or __abort() raced with the handshake
+            w_sock.close()
+            return
+        self.state = CONNECTED
+        self.backoff.reset()
+        if self.__opened:
+            self.reconnects += 1
+        self.__opened = True
+        self.__open_transport = w_sock
+        if self.subscriptions is not None:
+            if w_sock.name == TCP:
+                # the tcp stream may start subscribed to everything, which
+                # subscribing to paths alone never narrows
+                w_sock.send(json.dumps(unsubscribe_message('*', ['*'])))
+            for message in self.subscriptions.messages():
+                w_sock.send(json.dumps(message))
+        else:
+            if w_sock.name == TCP:
+                # the tcp stream has no subscribe=all url parameter
+                w_sock.send(json.dumps(subscribe_message(
+                    '*', [Subscription('*', context='*')]
+                    )))
+            for message in self.__unsubscribed:
+                w_sock.send(json.dumps(message))
+
+    def __send(self, message):
+        """send a message if the websocket is open"""
+        w_sock = self.w_sock
+        if w_sock is None or self.state != CONNECTED:
+            return
+        try:
+            w_sock.send(json.dumps(message))
+        except (TransportError, OSError) as error:
+            # the subscription is replayed when the stream reopens
+            logging.warning("send failed: {}".format(error))
+
+    def stream_stats(self):
+        """return a dict of stream byte counters
+
+        wire_bytes are the compressed message bytes received and
+        payload_bytes the same messages inflated, over all connections;
+        inflate_time is the seconds spent inflating them. All are None
+        unless compression was negotiated.
+        """
+        deflate = self.compression
+        if not deflate or not deflate.enabled:
+            return {
+                'compressed': False, 'wire_bytes': None,
+                'payload_bytes': None, 'ratio': None, 'inflate_time': None,
+                }
+        return {
+            'compressed': True,
+            'wire_bytes': deflate.wire_bytes,
+            'payload_bytes': deflate.payload_bytes,
+            'ratio': deflate.ratio(),
+            'inflate_time': deflate.inflate_time,
+            }
+
+    def subscribe(self, paths, context='vessels.self', period=None,
+            min_period=None, policy=None):
+        """subscribe to one or more paths
+
+        Keyword arguments:
+        paths -- a path, Subscription, or a list of them; may contain `*`
+        context -- context of the paths (default "vessels.self")
+        period -- update period in milliseconds (default None)
+        min_period -- minimum milliseconds between updates (default None)
+        policy -- "instant", "ideal" or "fixed" (default None)
+
+        If the client was started without subscriptions, the server's
+        default "all" subscription is dropped first.
+        """
+        if self.subscriptions is None:
+            self.subscriptions = Subscriptions()
+            self.__unsubscribed = []
+            self.__send(unsubscribe_message('*', ['*']))
+        for message in self.subscriptions.add(make_subscriptions(
+                paths, context, period, min_period, policy)):
+            self.__send(message)
+
+    def unsubscribe(self, paths=None, context='vessels.self'):
+        """unsubscribe from paths in context (default: all of context)
+
+        A client started without subscriptions keeps streaming everything
+        else, and the unsubscribe is sent again whenever the stream reopens.
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        if self.subscriptions is None:
+            message = unsubscribe_message(context,
+                ['*'] if paths is None else paths)
+            self.__unsubscribed.append(message)
+            self.__send(message)
+            return
+        for message in self.subscriptions.remove(paths, context):
+            self.__send(message)
 
     def close(self):
         """close the signalk client connection
+
+        the client's threads are stopped, so `connect()` can open it again.
         """
         logging.warning("Closing websocket...")
-        self.w_sock.close()
+        self.__closing.set()
+        if self.w_sock is not None:
+            self.__abort(self.w_sock)
+        stopped = self.__join(self.websocket_t)
+        if self.receive_queue is not None:
+            self.receive_queue.stop()
+        if self.decode_pool is not None:
+            self.decode_pool.stop()
+        self.data.flush_rate_limits()
+        self.__join(self.__cache_t)
+        self.__join(self.__housekeeping_t)
+        self.save_cache()
+        if stopped:
+            self.websocket_t = None
+            self.__cache_t = None
+            self.__housekeeping_t = None
+            self.w_sock = None
+        self.state = CLOSED
+
+    def __join(self, thread):
+        """wait for one of the client's threads to end, False if it is the
+        calling thread (close() from a callback), which ends afterwards"""
+        if thread is None:
+            return True
+        if thread is threading.current_thread():
+            return False
+        thread.join()
+        return True
+
+    def __abort(self, w_sock):
+        """stop a transport's run_forever from another thread"""
+        self.__aborted = w_sock
+        w_sock.close()
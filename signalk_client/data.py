@@ -21,27 +21,125 @@
 import copy
 import json
 import logging
+import os
 import pkg_resources
+import threading
+import time
+from signalk_client.aggregates import SLIDING, Aggregates
+from signalk_client.changes import ChangeDispatcher, ChangeListener
+from signalk_client.decoder import loads
+from signalk_client.expiry import EVICT, Expiry
+from signalk_client.history import HISTORY_CAPACITY, History
+from signalk_client.paths import compile_path
+from signalk_client.rwlock import NoLock, RWLock
+from signalk_client.store import TREE, make_store
 from signalk_client.vessel import Vessel
-from functools import reduce
+
+def timestamp_key(timestamp):
+    """return a key that sorts signalk (RFC 3339, UTC) timestamps in time
+    order, whatever their number of fractional digits"""
+    if timestamp is None:
+        return ''
+    base, _, fraction = timestamp.rstrip('Z').partition('.')
+    return base + '.' + fraction.ljust(9, '0')
+
+# version of the cache files written by Data.save
+CACHE_FORMAT = 2
+
+# attempts at encoding or copying a tree that another thread is updating
+SAVE_ATTEMPTS = 5
+
+def load_cache(path):
+    """return the state dict saved by `Data.save()`, or None
+
+    a missing, unreadable or outdated cache is logged and ignored. cache
+    files are json, decoded with the fastest installed decoder.
+    """
+    try:
+        with open(path, 'rb') as cache:
+            state = loads(cache.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as error:
+        logging.warning("ignoring unreadable cache {}: {}".format(path, error))
+        return None
+    if not isinstance(state, dict) or state.get('format') != CACHE_FORMAT:
+        logging.warning("ignoring cache {} of another format".format(path))
+        return None
+    return state
+
+def update_properties(timestamp, source):
+    """return the stored properties of a flattened value's update"""
+    properties = {}
+    if source[1] is not None:
+        properties['source'] = source[1]
+    if source[0] is not None:
+        properties['$source'] = source[0]
+    if timestamp is not None:
+        properties['timestamp'] = timestamp
+    return properties
+
+def values_delta(value):
+    """return the delta message of a flattened value tuple"""
+    context, path, value, timestamp, source = value
+    update = {'values': [{'path': path, 'value': value}]}
+    if timestamp is not None:
+        update['timestamp'] = timestamp
+    if source[0] is not None:
+        update['$source'] = source[0]
+    if source[1] is not None:
+        update['source'] = source[1]
+    delta = {'updates': [update]}
+    if context is not None:
+        delta['context'] = context
+    return delta
 
 class Data(object):
     """signalk data object
+
+    Keyword arguments:
+    seed -- initial data tree (default None, an empty tree)
+    store -- where values are kept: "tree" in the nested tree, or "flat"
+        in a dict keyed by (context, path) that builds the nested `data`
+        tree only when it is read (default "tree")
+    locking -- guard the store with a reader/writer lock (default False)
+
+    Deltas are applied on the stream thread while other threads read. With
+    `locking`, each delta (or batch of decoded values) is applied as a
+    whole while readers wait, the read methods wait for it, and readers
+    that need several values from the same moment hold `reading()`:
+
+        with data.reading():
+            sog = data.get_by_path('navigation.speedOverGround', context)
+            cog = data.get_by_path('navigation.courseOverGroundTrue', context)
+
+    `snapshot()` returns a point-in-time copy that later deltas do not
+    change, for readers that take their time.
     """
 
-    def __init__(self, seed=None):
+    def __init__(self, seed=None, store=TREE, locking=False):
 
         self.initialized = False
-        self.meta = json.load(pkg_resources.resource_stream(
+        self.rate_limiter = None
+        self.source_selector = None
+        self.expiry = None
+        self.__changes = None
+        self.__histories = []
+        self.__aggregates = []
+        self.__hello = threading.Event()
+        self.__buffer = None
+        self.__buffer_lock = threading.Lock()
+        self.__lock = RWLock() if locking else NoLock()
+        self.meta = loads(pkg_resources.resource_string(
             'signalk_client', 'include/meta.json'
             ))
 
         if seed == None:
             # bare minimum valid schema
-            self.data = {'version': "0.1.0", 'vessels': []}
+            self.store = make_store(store, {'version': "0.1.0", 'vessels': []})
 
         else:
-            self.data = seed
+            self.store = make_store(store, seed)
 
             logging.debug(
                 "loaded initial data:\n{}".format(
@@ -50,65 +148,569 @@ class Data(object):
                 )
 
 
+    @property
+    def data(self):
+        """the nested data tree, changed in place by later deltas"""
+        with self.__lock.reading():
+            return self.store.tree
+
+    @data.setter
+    def data(self, tree):
+        with self.__lock.writing():
+            self.store.load(tree)
+
+    def reading(self):
+        """return a context manager holding back deltas (with `locking`)
+        while several values are read"""
+        return self.__lock.reading()
+
+    def snapshot(self):
+        """return a Data holding a point-in-time copy of the store
+
+        the copy shares nothing later deltas change; with the tree store it
+        costs a walk of the tree, with the flat store a dict copy.
+        """
+        with self.__lock.reading():
+            for attempt in range(SAVE_ATTEMPTS):
+                try:
+                    store = self.store.copy()
+                    break
+                except RuntimeError:
+                    # the stream thread changed a dict while it was copied
+                    if attempt == SAVE_ATTEMPTS - 1:
+                        raise
+        snapshot = copy.copy(self)
+        snapshot.store = store
+        # nothing that changes with the live data is shared
+        snapshot.rate_limiter = None
+        snapshot.source_selector = None
+        snapshot.expiry = None
+        snapshot.__changes = None
+        snapshot.__histories = []
+        snapshot.__aggregates = []
+        snapshot.__buffer = None
+        snapshot.__buffer_lock = threading.Lock()
+        snapshot.__lock = NoLock()
+        snapshot.__hello = threading.Event()
+        if self.initialized:
+            snapshot.__hello.set()
+        return snapshot
+
+    def on_change(self, pattern, callback, executor=None):
+        """call callback(context, path, value, properties) whenever a value
+        matching pattern is stored, returns a
+        `signalk_client.changes.ChangeListener`
+
+        Keyword arguments:
+        pattern -- dotted key of the values, context included, whose keys
+            may be globs; it also matches everything below it (eg.
+            "vessels.self.navigation", "vessels.*.navigation.position")
+        callback -- function called with the dotted context and path, the
+            stored value and the dict of the update's timestamp and source
+        executor -- a `concurrent.futures.Executor` to submit the calls to
+            (default None, call on the thread storing the value, which
+            must then not be held up)
+
+        snapshots (`resync()`, `restore()`, `merge()`) replace the tree
+        without notifications.
+        """
+        if self.__changes is None:
+            self.__changes = ChangeDispatcher(
+                lambda: self.store.get_root('self')
+                )
+        listener = ChangeListener(pattern, callback, executor)
+        self.__changes.add(listener)
+        return listener
+
+    def remove_on_change(self, listener):
+        """stop calling a listener returned by `on_change()`"""
+        if self.__changes is None:
+            return False
+        return self.__changes.remove(listener)
+
+    def keep_history(self, pattern, capacity=HISTORY_CAPACITY):
+        """keep the newest numeric values stored at matching paths, returns
+        the `signalk_client.history.History`
+
+        Keyword arguments:
+        pattern -- dotted key of the values, context included, as for
+            `on_change()` (eg. "vessels.self.environment.wind")
+        capacity -- samples kept per path (default 1024)
+
+        needs numpy. memory is bounded by capacity for each path kept;
+        the buffers of evicted contexts are dropped.
+        """
+        history = History(pattern, capacity)
+        history.listener = self.on_change(pattern, history)
+        self.__histories.append(history)
+        return history
+
+    def get_history(self, path, context=None):
+        """return the `signalk_client.history.RingBuffer` of the values
+        stored at a dotted path in a dotted context, or None"""
+        for history in self.__histories:
+            buffer = history.get(context, path)
+            if buffer is not None:
+                return buffer
+        return None
+
+    def aggregate(self, pattern, window=60.0, kind=SLIDING):
+        """keep windowed statistics of the numbers stored at matching paths,
+        returns the `signalk_client.aggregates.Aggregates`
+
+        Keyword arguments:
+        pattern -- dotted key of the values, context included, as for
+            `on_change()` (eg. "vessels.self.environment.wind")
+        window -- window length in seconds (default 60.0)
+        kind -- "sliding" or "tumbling" windows (default "sliding")
+
+        statistics are updated as each value is stored, paths in "rad"
+        get circular ones; read them with `get_aggregate()`.
+        """
+        aggregates = Aggregates(pattern, window, kind, self.get_prop_units)
+        aggregates.listener = self.on_change(pattern, aggregates)
+        self.__aggregates.append(aggregates)
+        return aggregates
+
+    def get_aggregate(self, path, context=None):
+        """return the `signalk_client.aggregates.Aggregate` of the values
+        stored at a dotted path in a dotted context, or None"""
+        for aggregates in self.__aggregates:
+            aggregate = aggregates.get(context, path)
+            if aggregate is not None:
+                return aggregate
+        return None
+
+    def get_sources(self, path, context=None):
+        """return {source: record} of the last value of every source of a
+        dotted path in a dotted context, for paths with a
+        `signalk_client.sources.SourcePriority` (otherwise {})"""
+        if self.source_selector is None:
+            return {}
+        return self.source_selector.sources(context, path)
+
+    def add_ttl(self, ttl):
+        """expire values or contexts that are not updated, see
+        `signalk_client.expiry.TTL`"""
+        if self.expiry is None:
+            self.expiry = Expiry(
+                self_context=lambda: self.store.get_root('self')
+                )
+        self.expiry.add(ttl)
+        self.__touch_all()
+
+    def on_expire(self, callback):
+        """call callback(context, path, action) when a value (path None for
+        a whole context) expires, action being "evict" or "stale"
+
+        callbacks run on the thread applying deltas, or calling `expire()`.
+        """
+        if self.expiry is None:
+            self.expiry = Expiry(
+                self_context=lambda: self.store.get_root('self')
+                )
+        self.expiry.on_expire(callback)
+
+    def expire(self):
+        """expire what is due now
+
+        this also happens as deltas are applied, and the clients call it
+        every second while the stream is quiet. like any write it waits for
+        readers, so never call it while holding `reading()`.
+        """
+        if self.expiry is None:
+            return
+        now = time.monotonic()
+        if not self.expiry.due(now):
+            return
+        with self.__lock.writing():
+            self.__expire(now)
+
+    def __expire(self, now):
+        """evict or mark what expired by now, and notify"""
+        for context, path, ttl in self.expiry.expire(now):
+            if ttl.action == EVICT:
+                try:
+                    if path is None:
+                        self.store.delete_context(compile_path(context))
+                    else:
+                        self.store.delete(
+                            compile_path(context) if context else None,
+                            compile_path(path)
+                            )
+                except KeyError:
+                    # already gone with its context or a new snapshot
+                    continue
+                if path is None:
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.forget(context)
+                    if self.source_selector is not None:
+                        self.source_selector.forget(context)
+                    for history in self.__histories:
+                        history.forget(context)
+                    for aggregates in self.__aggregates:
+                        aggregates.forget(context)
+            self.expiry.notify(context, path, ttl.action)
+
+    def __touch_all(self):
+        """start the clock of every stored value, eg. of a snapshot"""
+        if self.expiry is None:
+            return
+        now = time.monotonic()
+        for context, path, record in self.store.records():
+            self.expiry.touch(context, path, now)
+
+    def is_stale(self, path=None, context=None):
+        """is the value at a dotted path (or with path None, a whole
+        context) marked stale by a "stale" TTL"""
+        if self.expiry is None:
+            return False
+        return self.expiry.is_stale(context, path)
+
+    def records(self):
+        """return an iterator of (context, path, record) for every stored
+        leaf, the record being the dict holding its value, timestamp and
+        source"""
+        with self.__lock.reading():
+            return iter(list(self.store.records()))
+
+    def save(self, path, **info):
+        """write the data tree (and self context) to a cache file
+
+        the file is the json of a dict holding the tree under "data", the
+        save time under "saved" and any info keyword arguments. it is
+        replaced atomically, so a crash never leaves a torn cache.
+        """
+        with self.__lock.reading():
+            state = dict(info, format=CACHE_FORMAT, saved=time.time(),
+                data=self.data)
+            for attempt in range(SAVE_ATTEMPTS):
+                try:
+                    payload = json.dumps(state,
+                        separators=(',', ':')).encode('utf-8')
+                    break
+                except RuntimeError:
+                    # the stream thread changed a dict while it was encoded
+                    if attempt == SAVE_ATTEMPTS - 1:
+                        raise
+        tmp_path = "{}.tmp".format(path)
+        with open(tmp_path, 'wb') as cache:
+            cache.write(payload)
+        os.replace(tmp_path, path)
+
+    def restore(self, tree):
+        """replace the data tree with a cached one
+
+        a tree that knows the self context counts as initialized, so
+        readers do not wait for the hello message.
+        """
+        with self.__buffer_lock:
+            self.data = tree
+            self.__touch_all()
+        if self.__changes is not None:
+            self.__changes.reset()
+        if 'self' in tree:
+            self.initialized = True
+            self.__hello.set()
+
+    def wait_initialized(self, timeout=None):
+        """block until the hello message has been processed
+
+        returns False if timeout (seconds) expired first.
+        """
+        return self.__hello.wait(timeout)
+
+    def begin_buffering(self):
+        """hold deltas back until the next `resync()` or `end_buffering()`
+
+        used while a snapshot is downloaded alongside the stream, so deltas
+        that arrive first are neither lost nor overwritten by the snapshot.
+        """
+        with self.__buffer_lock:
+            if self.__buffer is None:
+                self.__buffer = []
+
+    def end_buffering(self, replay=True):
+        """stop buffering, replaying held deltas unless replay is False"""
+        with self.__buffer_lock, self.__lock.writing():
+            buffered, self.__buffer = self.__buffer, None
+            if replay and buffered:
+                self.__replay(buffered)
+
+    def resync(self, seed):
+        """replace the data tree with a fresh snapshot
+
+        the self context is kept if the snapshot does not have one. deltas
+        buffered since `begin_buffering()` are then replayed in timestamp
+        order, skipping values the snapshot already has newer data for.
+        """
+        with self.__buffer_lock, self.__lock.writing():
+            if 'self' not in seed and self.store.get_root('self'):
+                seed['self'] = self.store.get_root('self')
+            self.data = seed
+            self.__touch_all()
+            if self.__changes is not None:
+                self.__changes.reset()
+            buffered, self.__buffer = self.__buffer, None
+            if buffered:
+                self.__replay(buffered)
+
+    def __replay(self, buffered):
+        """apply buffered deltas one update at a time, oldest first"""
+        pending = []
+        last_key = ''
+        for data in buffered:
+            if 'updates' not in data:
+                last_key = timestamp_key(data.get('timestamp')) or last_key
+                pending.append((last_key, len(pending), data))
+                continue
+            for update in data['updates']:
+                last_key = timestamp_key(update.get('timestamp')) or last_key
+                single = dict(data)
+                single['updates'] = [update]
+                pending.append((last_key, len(pending), single))
+        pending.sort(key=lambda item: item[:2])
+        logging.debug("replaying {} buffered updates".format(len(pending)))
+
+        for key, order, data in pending:
+            if 'updates' in data and key:
+                context = compile_path(data['context']) \
+                    if 'context' in data else None
+                update = data['updates'][0]
+                values = [
+                    value for value in update['values']
+                    if not self.__is_newer(context, value['path'], key)
+                    ]
+                if not values:
+                    continue
+                update = dict(update)
+                update['values'] = values
+                data['updates'] = [update]
+            self.__apply_delta(data)
+
+    def __is_newer(self, context, path, key):
+        """is the stored value at path newer than timestamp key"""
+        try:
+            stored = self.store.get(context, compile_path(path))
+        except (KeyError, TypeError, IndexError):
+            return False
+        if not isinstance(stored, dict) or 'timestamp' not in stored:
+            return False
+        return timestamp_key(stored['timestamp']) > key
+
     def process_delta(self, data):
         """Parse SignalK Delta message and update data store
         """
+        if self.__buffer is not None:
+            with self.__buffer_lock:
+                if self.__buffer is not None:
+                    self.__buffer.append(data)
+                    return
+        lock = self.__lock
+        lock.acquire_write()
+        try:
+            self.__apply_delta(data)
+        finally:
+            lock.release_write()
+
+    def process_values(self, values):
+        """update the data store from flattened deltas
+
+        values is a list of (context, path, value, timestamp, source)
+        tuples, source being a ($source, source) pair, as made by
+        `signalk_client.decode_pool.normalize`; any dicts in the list are
+        processed as whole messages.
+        """
+        if self.__buffer is not None:
+            with self.__buffer_lock:
+                if self.__buffer is not None:
+                    self.__buffer.extend(
+                        value if isinstance(value, dict)
+                        else values_delta(value)
+                        for value in values
+                        )
+                    return
+        with self.__lock.writing():
+            self.__apply_values(values)
+
+    def __apply_values(self, values):
+        """update the data store from a list of flattened values"""
+        last_update = None
+        changes = self.__changes
+        expiry = self.expiry
+        if expiry is not None:
+            now = time.monotonic()
+        for value in values:
+            if isinstance(value, dict):
+                self.__apply_delta(value)
+                continue
+            context, path, value, timestamp, source = value
+            # values of one update share their timestamp and source
+            if last_update is None or timestamp is not last_update[0] \
+                    or source is not last_update[1]:
+                last_update = (timestamp, source,
+                    update_properties(timestamp, source))
+            properties = last_update[2]
+            if self.source_selector is not None \
+                    and not self.source_selector.select(
+                        context, path, value, properties):
+                continue
+            if self.rate_limiter is not None:
+                admitted, value = self.rate_limiter.admit(
+                    context, path, value, properties
+                    )
+                if not admitted:
+                    continue
+            path = compile_path(path)
+            self.store.set(compile_path(context) if context else None,
+                path, value, properties)
+            if expiry is not None:
+                expiry.touch(context, path.dotted, now)
+            if changes is not None:
+                changes.dispatch(context, path, value, properties)
+        if expiry is not None and expiry.due(now):
+            self.__expire(now)
+
+    def __apply_delta(self, data):
+        """update data store from a SignalK Delta message"""
 
         if 'self' in data and 'version' in data and 'timestamp' in data:
             # hello message
             logging.debug(
                 "hello message in delta stream: {!r}".format(data)
                 )
-            context_list = []
-            update_properties = {}
             if 'self' in data:
                 logging.info("setting self = {!r}".format(data['self']))
-                self.__set_by_map_list(['self'], data['self'])
+                self.store.set_root('self', data['self'])
+                if self.__changes is not None:
+                    self.__changes.reset()
             self.initialized = True
+            self.__hello.set()
         elif 'updates' in data:
             # delta message
-            if 'context' in data:
-                context_list = data['context'].split(".")
-            else:
-                context_list = []
+            context = data.get('context')
+            context_path = compile_path(context) \
+                if context is not None else None
+            limiter = self.rate_limiter
+            selector = self.source_selector
+            store = self.store.set
+            changes = self.__changes
+            expiry = self.expiry
+            if expiry is not None:
+                now = time.monotonic()
             for update in data['updates']:
-                update_properties = {}
+                # shared by the stored items of this update, never modified
+                properties = {}
                 if 'source' in update:
-                    update_properties['source'] = update['source']
+                    properties['source'] = update['source']
                 if '$source' in update:
-                    update_properties['$source'] = update['$source']
+                    properties['$source'] = update['$source']
                 if 'timestamp' in update:
-                    update_properties['timestamp'] = update['timestamp']
+                    properties['timestamp'] = update['timestamp']
                 for value in update['values']:
-                    item_in = copy.deepcopy(update_properties)
-                    map_list = copy.deepcopy(context_list)
-                    map_list += value['path'].split(".")
-                    if isinstance(value['value'], dict):
-                        for key in list(value['value'].keys()):
-                            item_in[key] = value['value'][key]
-                    else:
-                        item_in['value'] = value['value']
-                    self.__set_by_map_list(map_list, item_in)
-            logging.debug("updated context: {}\n{}".format(
-                ".".join(context_list),
-                json.dumps(
-                    self.get_by_map_list(context_list),
-                    indent=4, sort_keys=True
-                    )
-                ))
+                    new_value = value['value']
+                    if selector is not None and not selector.select(
+                            context, value['path'], new_value, properties):
+                        continue
+                    if limiter is not None:
+                        admitted, new_value = limiter.admit(
+                            context, value['path'], new_value, properties
+                            )
+                        if not admitted:
+                            continue
+                    path = compile_path(value['path'])
+                    store(context_path, path, new_value, properties)
+                    if expiry is not None:
+                        expiry.touch(context, path.dotted, now)
+                    if changes is not None:
+                        changes.dispatch(context, path, new_value, properties)
+            if expiry is not None and expiry.due(now):
+                self.__expire(now)
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug("updated context: {}\n{}".format(
+                    context,
+                    json.dumps(
+                        self.get_by_map_list(
+                            context_path if context_path is not None else ()
+                            ),
+                        indent=4, sort_keys=True
+                        )
+                    ))
         else:
             logging.warning(
                 "ignoring unrecognized delta message: {!r}".format(data)
                 )
 
+    def flush_rate_limits(self, due_only=False):
+        """store the newest values the rate limiter held back
+
+        with due_only, only those whose interval has passed; the clients
+        do this every second, and flush everything on close.
+        """
+        if self.rate_limiter is None:
+            return
+        changes = self.__changes
+        with self.__lock.writing():
+            for context, path, value, properties in \
+                    self.rate_limiter.flush(due_only):
+                path = compile_path(path)
+                self.store.set(compile_path(context) if context else None,
+                    path, value, properties)
+                if changes is not None:
+                    changes.dispatch(context, path, value, properties)
+
     def get_by_map_list(self, map_list):
-        """return a data object from a hierarchical list of keys"""
-        value = reduce(lambda d, k: d[k], map_list, self.data)
-        return value
+        """return a data object from a hierarchical list of keys (or a
+        compiled `signalk_client.paths.Path`)"""
+        with self.__lock.reading():
+            return self.store.lookup(map_list)
+
+    def get_by_path(self, path, context=None):
+        """return the data object at a dotted path, relative to a dotted
+        context if given"""
+        with self.__lock.reading():
+            return self.store.get(compile_path(context) if context else None,
+                compile_path(path))
+
+    def merge(self, path, subtree):
+        """merge a REST subtree into the data store at a dotted path
 
-    def __set_by_map_list(self, map_list, value):
-        """set a data object at location based on a hierarchical list of keys"""
-        self.get_by_map_list(map_list[:-1])[map_list[-1]] = value
+        a leading "vessels.self" is resolved to the self vessel. objects
+        are merged key by key, anything else replaces the stored value.
+        with the flat store the tree is rebuilt and loaded back.
+        """
+        with self.__lock.writing():
+            self.__merge(path, subtree)
+
+    def __merge(self, path, subtree):
+        """merge with the store locked for writing"""
+        map_list = path.split(".") if path else []
+        self_context = self.store.get_root('self')
+        if map_list[:2] == ['vessels', 'self'] and self_context:
+            map_list = self_context.split(".") + map_list[2:]
+
+        tree = self.data
+        if not map_list:
+            self.__merge_into(tree, subtree)
+            self.data = tree
+            return
+        node = tree
+        for key in map_list[:-1]:
+            node = node.setdefault(key, {})
+        key = map_list[-1]
+        if isinstance(subtree, dict) and isinstance(node.get(key), dict):
+            self.__merge_into(node[key], subtree)
+        else:
+            node[key] = subtree
+        self.data = tree
+
+    def __merge_into(self, target, subtree):
+        """recursively merge dict subtree into dict target"""
+        for key, value in subtree.items():
+            if isinstance(value, dict) and isinstance(target.get(key), dict):
+                self.__merge_into(target[key], value)
+            else:
+                target[key] = value
 
     def get_prop_meta(self, path):
         """get meta-data object from a property path
@@ -118,15 +720,30 @@ class Data(object):
         else:
             return {}
 
+    def get_prop_units(self, path, key=None):
+        """return the units of a vessel property path (or of one key of an
+        object valued property), None if unknown
+        """
+        meta = self.get_prop_meta('/vessels/*/' + path.replace('.', '/'))
+        if key is not None:
+            meta = meta.get('properties', {}).get(key, {})
+        return meta.get('units')
+
     def get_vessels(self):
         """returns a list of vessels (as Vessel objects) signalk knows of
         """
         vessels = []
-        for vessel_key in list(self.data['vessels'].keys()):
-            vessels.append(Vessel(self, 'vessels.'+vessel_key))
+        with self.__lock.reading():
+            for vessel_key in self.store.contexts('vessels'):
+                if self.is_stale(None, 'vessels.'+vessel_key):
+                    continue
+                vessels.append(Vessel(self, 'vessels.'+vessel_key))
         return vessels
 
     def get_self(self):
         """returns "self" vessel (as Vessel object)
         """
-        return Vessel(self, self.data['self'])
+        self_context = self.store.get_root('self')
+        if self_context is None:
+            raise KeyError('self')
+        return Vessel(self, self_context)
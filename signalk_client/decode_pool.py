@@ -0,0 +1,212 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""decoding delta frames on worker processes
+
+Frames are batched and sent to a pool of processes, which decode them and
+flatten every delta into (context, path, value, timestamp, source) tuples,
+where source is a ($source, source) pair and either may be None. A single
+writer thread applies the batches, in the order the frames arrived, with
+`Data.process_values`. Messages that are not deltas (such as the hello)
+come back as decoded dicts.
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from signalk_client.decoder import get_decoder
+
+# decoder of this worker process, set up by _init_worker
+_decoder = None
+
+def _init_worker(decoder):
+    global _decoder
+    _decoder = get_decoder(decoder)
+
+def normalize(delta):
+    """return the value tuples of a delta, or [delta] if it has no updates
+    """
+    if 'updates' not in delta:
+        return [delta]
+    context = delta.get('context')
+    values = []
+    for update in delta['updates']:
+        timestamp = update.get('timestamp')
+        source = (update.get('$source'), update.get('source'))
+        for value in update['values']:
+            values.append(
+                (context, value['path'], value['value'], timestamp, source)
+                )
+    return values
+
+def decode_batch(frames):
+    """decode and normalize a batch of frames (runs on a worker)"""
+    values = []
+    for frame in frames:
+        try:
+            values.extend(normalize(_decoder(frame)))
+        except (ValueError, KeyError, TypeError) as error:
+            logging.warning("dropping undecodable frame: {}".format(error))
+    return values
+
+class DecodePool(object):
+    """decode frames on worker processes, apply them on one thread
+
+    Keyword arguments:
+    apply -- function called with each decoded batch (a list of value
+        tuples and dicts) on the writer thread, normally
+        `Data.process_values`
+    workers -- number of worker processes (default None, one per cpu)
+    decoder -- json decoder name (default None, the fastest installed)
+    batch_size -- most frames sent to a worker at once (default 200)
+    max_batches -- batches in flight before `put()` blocks (default None,
+        two per worker)
+    start_method -- multiprocessing start method of the workers (default
+        None, "forkserver" where the platform has it, else "spawn"; not
+        "fork", as the client already runs threads). Workers import the
+        main module again, so scripts need the usual
+        `if __name__ == '__main__':` guard
+
+    While the writer is idle a frame is sent on its own; under load frames
+    collect into batches while the writer waits for earlier ones, so the
+    batch size follows the load.
+    """
+
+    def __init__(self, apply, workers=None, decoder=None, batch_size=200,
+            max_batches=None, start_method=None):
+        if decoder is not None and not isinstance(decoder, str):
+            raise ValueError("decode workers need a decoder name")
+        self.apply = apply
+        self.workers = workers or multiprocessing.cpu_count()
+        self.decoder = decoder
+        self.batch_size = batch_size
+        self.max_batches = max_batches or 2 * self.workers
+        self.start_method = start_method
+
+        self.frames = 0
+        self.batches = 0
+        self.values = 0
+        self.apply_time = 0.0
+
+        self.__executor = None
+        self.__pending = []
+        self.__futures = deque()
+        self.__lock = threading.Lock()
+        self.__ready = threading.Condition(self.__lock)
+        self.__running = False
+        self.__writer = None
+
+    def start(self):
+        """start the worker processes and the writer thread"""
+        with self.__lock:
+            if self.__running:
+                return
+            self.__running = True
+        start_method = self.start_method
+        if start_method is None:
+            # not fork: the client already runs threads
+            start_method = 'forkserver' \
+                if 'forkserver' in multiprocessing.get_all_start_methods() \
+                else 'spawn'
+        self.__executor = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker, initargs=(self.decoder,),
+            )
+        # start every worker now rather than on the first frames
+        for future in [self.__executor.submit(time.sleep, 0.01)
+                for i in range(self.workers)]:
+            future.result()
+        self.__writer = threading.Thread(target=self.__run)
+        self.__writer.daemon = True
+        self.__writer.start()
+
+    def stop(self, timeout=None):
+        """apply the frames already received, then stop the workers"""
+        with self.__lock:
+            if not self.__running:
+                return
+            self.__running = False
+            self.__ready.notify_all()
+        self.__writer.join(timeout)
+        self.__executor.shutdown()
+
+    def put(self, frame):
+        """queue a raw frame for decoding"""
+        with self.__lock:
+            while len(self.__futures) >= self.max_batches \
+                    and self.__running:
+                self.__ready.wait()
+            if not self.__running:
+                return
+            self.frames += 1
+            self.__pending.append(frame)
+            if len(self.__pending) >= self.batch_size:
+                self.__submit()
+            elif len(self.__pending) == 1:
+                self.__ready.notify_all()
+
+    def __submit(self):
+        """send the pending frames to a worker, holding the lock"""
+        self.__futures.append(
+            self.__executor.submit(decode_batch, self.__pending)
+            )
+        self.__pending = []
+        self.batches += 1
+
+    def __run(self):
+        """writer thread, applies decoded batches in order"""
+        while True:
+            with self.__lock:
+                while not self.__futures:
+                    if self.__pending:
+                        self.__submit()
+                    elif not self.__running:
+                        return
+                    else:
+                        self.__ready.wait()
+                future = self.__futures[0]
+            try:
+                values = future.result()
+            except Exception:
+                logging.exception("decode worker failed")
+                values = []
+            with self.__lock:
+                self.__futures.popleft()
+                self.__ready.notify_all()
+            start = time.perf_counter()
+            try:
+                self.apply(values)
+            except Exception:
+                logging.exception("failed to apply decoded batch")
+            self.apply_time += time.perf_counter() - start
+            self.values += len(values)
+
+    def stats(self):
+        """return a dict of pool metrics"""
+        return {
+            'workers': self.workers,
+            'frames': self.frames,
+            'batches': self.batches,
+            'values': self.values,
+            'in_flight': len(self.__futures),
+            'apply_time': self.apply_time,
+            }
@@ -0,0 +1,50 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""json decoders"""
+
+# decoders in order of preference, the first one installed is the default
+DECODERS = ('orjson', 'ujson', 'json')
+
+def available_decoders():
+    """returns the names of the installed decoders"""
+    names = []
+    for name in DECODERS:
+        try:
+            __import__(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+def get_decoder(decoder=None):
+    """return a json decoding function
+
+    Keyword arguments:
+    decoder -- a decoder name from DECODERS, a callable taking str or bytes,
+        or None for the fastest installed decoder (default None)
+    """
+    if callable(decoder):
+        return decoder
+    if decoder is None:
+        decoder = available_decoders()[0]
+    if decoder not in DECODERS:
+        raise ValueError("unknown json decoder: {}".format(decoder))
+    return __import__(decoder).loads
+
+loads = get_decoder()
@@ -0,0 +1,238 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""expiry of values and contexts that are no longer updated
+
+Updates only note the time they arrived. Deadlines are kept in a heap
+holding one entry per tracked value or context; when an entry comes due,
+a value that was updated since is simply pushed back with its new
+deadline. Finding what expired so costs O(log n) per expiry and never
+scans the store.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from signalk_client.paths import glob_match
+
+# expiry actions
+EVICT = 'evict'
+STALE = 'stale'
+ACTIONS = (EVICT, STALE)
+
+class TTL(object):
+    """how long matching values, or whole contexts, live without updates
+
+    Keyword arguments:
+    seconds -- time to live since the last update
+    path -- signalk path of the values, may contain `*` globs, or None
+        for a TTL of whole contexts, which expire when none of their
+        values was updated for `seconds` (default None)
+    context -- context the TTL applies to, may contain globs (default
+        "vessels.*"); the self context never expires as a whole
+    action -- "evict" removes expired values or contexts from the store,
+        "stale" keeps them but marks them stale until their next update
+        (default "evict")
+    """
+
+    def __init__(self, seconds, path=None, context='vessels.*',
+            action=EVICT):
+        if action not in ACTIONS:
+            raise ValueError("unknown expiry action: {}".format(action))
+        self.seconds = seconds
+        self.path = path
+        self.context = context
+        self.action = action
+
+    def __repr__(self):
+        return "TTL({!r}, path={!r}, context={!r}, action={!r})".format(
+            self.seconds, self.path, self.context, self.action
+            )
+
+    def matches(self, context, path):
+        """does this TTL apply to path (None for the context itself) in
+        context"""
+        if (path is None) != (self.path is None):
+            return False
+        # a context TTL matches on its context alone
+        return glob_match(self.context, self.path or '', context, path or '')
+
+class Expiry(object):
+    """tracks the age of stored values and finds the expired ones
+
+    Keyword arguments:
+    ttls -- TTL objects, the first one matching a value (or a context)
+        applies (default ())
+    self_context -- function returning the self context, which is not
+        expired as a whole (default None)
+
+    Data calls `touch()` for every stored value and `expire()` once the
+    earliest deadline has passed. callbacks added with `on_expire()` are
+    called as callback(context, path, action), path being None for a
+    context.
+    """
+
+    def __init__(self, ttls=(), self_context=None):
+        self.ttls = list(ttls)
+        self.self_context = self_context
+        self.callbacks = []
+        self.expired = 0
+        self.__rules = {}
+        self.__seen = {}
+        self.__paths = {}
+        self.__heap = []
+        self.__order = 0
+        self.__stale = {}
+        self.__lock = threading.Lock()
+
+    def add(self, ttl):
+        """add a TTL, applied after the existing ones"""
+        with self.__lock:
+            self.ttls.append(ttl)
+            self.__rules = {}
+
+    def on_expire(self, callback):
+        """call callback(context, path, action) for every expiry"""
+        self.callbacks.append(callback)
+
+    def __rule(self, context, path):
+        """return the TTL of path (None for the context) in context
+
+        rules are cached per context, and dropped with an evicted context.
+        """
+        rules = self.__rules.get(context)
+        if rules is None:
+            rules = self.__rules[context] = {}
+        try:
+            return rules[path]
+        except KeyError:
+            pass
+        rule = None
+        for ttl in self.ttls:
+            if ttl.matches(context, path):
+                rule = ttl
+                break
+        rules[path] = rule
+        return rule
+
+    def __track(self, key, rule, now):
+        if key not in self.__seen:
+            heapq.heappush(self.__heap,
+                (now + rule.seconds, self.__order, key, rule))
+            self.__order += 1
+            if key[1] is not None:
+                self.__paths.setdefault(key[0], set()).add(key[1])
+        self.__seen[key] = now
+        stale = self.__stale.get(key[0])
+        if stale is not None and key[1] in stale:
+            stale.discard(key[1])
+            if not stale:
+                del self.__stale[key[0]]
+
+    def touch(self, context, path, now):
+        """note that a value was stored at (monotonic) time now"""
+        if not self.ttls:
+            return
+        with self.__lock:
+            rule = self.__rule(context, path)
+            if rule is not None:
+                self.__track((context, path), rule, now)
+            if context is not None:
+                rule = self.__rule(context, None)
+                if rule is not None:
+                    self.__track((context, None), rule, now)
+
+    def due(self, now):
+        """has the earliest deadline passed"""
+        heap = self.__heap
+        return bool(heap) and heap[0][0] <= now
+
+    def expire(self, now=None):
+        """return [(context, path, TTL)] of what expired by now, path being
+        None for whole contexts"""
+        if now is None:
+            now = time.monotonic()
+        expired = []
+        self_context = self.self_context() \
+            if self.self_context is not None else None
+        with self.__lock:
+            heap = self.__heap
+            while heap and heap[0][0] <= now:
+                deadline, order, key, rule = heapq.heappop(heap)
+                seen = self.__seen.get(key)
+                if seen is None:
+                    continue
+                if seen + rule.seconds > now:
+                    # updated since it was pushed: push back
+                    heapq.heappush(heap,
+                        (seen + rule.seconds, self.__order, key, rule))
+                    self.__order += 1
+                    continue
+                del self.__seen[key]
+                context, path = key
+                if path is None and context == self_context:
+                    # tracked again from its next update
+                    continue
+                if path is not None:
+                    paths = self.__paths.get(context)
+                    if paths is not None:
+                        paths.discard(path)
+                        if not paths:
+                            del self.__paths[context]
+                if rule.action == STALE:
+                    self.__stale.setdefault(context, set()).add(path)
+                elif path is None:
+                    self.__forget(context)
+                expired.append((context, path, rule))
+            self.expired += len(expired)
+        return expired
+
+    def __forget(self, context):
+        """stop tracking the values of an evicted context"""
+        for path in self.__paths.pop(context, ()):
+            self.__seen.pop((context, path), None)
+        self.__stale.pop(context, None)
+        self.__rules.pop(context, None)
+
+    def notify(self, context, path, action):
+        """call the expiry callbacks, logging their errors"""
+        for callback in self.callbacks:
+            try:
+                callback(context, path, action)
+            except Exception as error:
+                logging.error("error from expiry callback {}: {}".format(
+                    callback, error
+                    ))
+
+    def is_stale(self, context, path=None):
+        """is a value (or with path None, a whole context) marked stale;
+        values of a stale context are stale too"""
+        stale = self.__stale.get(context)
+        if stale is None:
+            return False
+        return None in stale or path in stale
+
+    def stats(self):
+        """return a dict of tracked and expired counts"""
+        return {
+            'tracked': len(self.__seen),
+            'contexts': len(self.__rules),
+            'expired': self.expired,
+            'stale': sum(len(paths) for paths in self.__stale.values()),
+            }
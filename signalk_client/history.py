@@ -0,0 +1,196 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""value history in numpy ring buffers
+
+History needs numpy (`pip install signalk_client[history]`); the rest of
+the library does not.
+"""
+
+import datetime
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# samples kept per path unless asked otherwise
+HISTORY_CAPACITY = 1024
+
+def parse_timestamp(timestamp):
+    """return the unix time of a signalk (RFC 3339, UTC) timestamp"""
+    base, _, fraction = timestamp.rstrip('Z').partition('.')
+    seconds = datetime.datetime.fromisoformat(base).replace(
+        tzinfo=datetime.timezone.utc
+        ).timestamp()
+    if fraction:
+        seconds += float('0.' + fraction)
+    return seconds
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class UpdateTimes(object):
+    """returns the unix time of an update's properties
+
+    values of one update share their properties, so each timestamp is only
+    parsed once. updates without a timestamp get the time they arrived.
+    """
+
+    def __init__(self):
+        self.__last = (None, None)
+
+    def __call__(self, properties):
+        timestamp = properties.get('timestamp')
+        if timestamp is None:
+            return time.time()
+        if timestamp is not self.__last[0]:
+            self.__last = (timestamp, parse_timestamp(timestamp))
+        return self.__last[1]
+
+class RingBuffer(object):
+    """the newest `capacity` (timestamp, value) samples of one path
+
+    Keyword arguments:
+    capacity -- most samples kept
+    fields -- the keys of object values (eg. ("latitude", "longitude")),
+        stored as rows of one column per key (default None, numbers)
+
+    Samples live in preallocated float64 arrays. Each one is written twice,
+    at its ring position and `capacity` positions further, so the newest
+    samples are always one contiguous slice: `times()` and `values()`
+    return read-only views of it without copying. The views keep seeing
+    the buffer, whose oldest samples are overwritten as new ones arrive;
+    copy them to keep them.
+    """
+
+    def __init__(self, capacity, fields=None):
+        if numpy is None:
+            raise ImportError("value history needs numpy")
+        self.capacity = capacity
+        self.fields = fields
+        self.appended = 0
+        self.__head = 0
+        self.__times = numpy.empty(2 * capacity)
+        if fields is None:
+            self.__values = numpy.empty(2 * capacity)
+        else:
+            self.__values = numpy.empty((2 * capacity, len(fields)))
+
+    def __len__(self):
+        return min(self.appended, self.capacity)
+
+    def append(self, timestamp, value):
+        """add a sample, overwriting the oldest one when full
+
+        value is a number, or a dict holding `fields` (missing keys are
+        stored as nan).
+        """
+        head = self.__head
+        mirror = head + self.capacity
+        if self.fields is not None:
+            value = [value.get(key, numpy.nan) for key in self.fields]
+        self.__values[head] = value
+        self.__values[mirror] = value
+        self.__times[head] = timestamp
+        self.__times[mirror] = timestamp
+        self.__head = (head + 1) % self.capacity
+        self.appended += 1
+
+    def __window(self, count):
+        """return the slice of the newest count (default all) samples"""
+        size = len(self)
+        if count is None or count > size:
+            count = size
+        end = self.__head + self.capacity
+        return slice(end - count, end)
+
+    def __view(self, array, count):
+        view = array[self.__window(count)]
+        view.flags.writeable = False
+        return view
+
+    def times(self, count=None):
+        """return a view of the newest count (default all) sample times,
+        oldest first, in unix seconds"""
+        return self.__view(self.__times, count)
+
+    def values(self, count=None):
+        """return a view of the newest count (default all) values, oldest
+        first; one row per sample for object values"""
+        return self.__view(self.__values, count)
+
+    def series(self, count=None):
+        """return (times, values) views of the same newest count samples"""
+        window = self.__window(count)
+        times = self.__times[window]
+        values = self.__values[window]
+        times.flags.writeable = False
+        values.flags.writeable = False
+        return times, values
+
+class History(object):
+    """ring buffers of the numeric values stored at matching paths
+
+    a `signalk_client.data.Data.on_change()` callback, registered by
+    `Data.keep_history()`. paths get their own RingBuffer on their first
+    numeric (or object of numbers) value; other values are not kept.
+    samples are timed by the update's timestamp, or the time they arrived
+    if the update has none.
+    """
+
+    def __init__(self, pattern, capacity=HISTORY_CAPACITY):
+        if numpy is None:
+            raise ImportError("value history needs numpy")
+        self.pattern = pattern
+        self.capacity = capacity
+        self.buffers = {}
+        self.__paths = {}
+        self.__times = UpdateTimes()
+
+    def __call__(self, context, path, value, properties):
+        key = (context, path)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            if key in self.buffers:
+                return
+            if is_number(value):
+                buffer = RingBuffer(self.capacity)
+            elif isinstance(value, dict) and value \
+                    and all(is_number(item) for item in value.values()):
+                buffer = RingBuffer(self.capacity, tuple(sorted(value)))
+            # paths holding anything else are remembered as None
+            self.buffers[key] = buffer
+            self.__paths.setdefault(context, []).append(path)
+            if buffer is None:
+                return
+        elif buffer.fields is None and not is_number(value):
+            return
+        elif buffer.fields is not None and not isinstance(value, dict):
+            return
+        buffer.append(self.__times(properties), value)
+
+    def get(self, context, path):
+        """return the RingBuffer of path in context, or None"""
+        return self.buffers.get((context, path))
+
+    def forget(self, context):
+        """drop the buffers of an evicted context"""
+        for path in self.__paths.pop(context, ()):
+            del self.buffers[(context, path)]
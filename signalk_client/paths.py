@@ -0,0 +1,87 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""compiled signalk paths
+
+The same few hundred contexts and paths repeat in every delta, so dotted
+strings are split once and kept in a bounded LRU cache. Their keys are
+interned, which also lets the data tree share the key strings.
+"""
+
+import fnmatch
+import sys
+from functools import lru_cache
+
+# most dotted strings kept compiled
+PATH_CACHE_SIZE = 4096
+
+class Path(object):
+    """a dotted signalk path split into its keys
+
+    `keys` holds every key, `parent` all but the last one and `last` the
+    last one. compile paths with `compile_path()` rather than directly.
+    """
+
+    __slots__ = ('dotted', 'keys', 'parent', 'last')
+
+    def __init__(self, dotted):
+        self.dotted = dotted
+        self.keys = tuple(sys.intern(key) for key in dotted.split('.'))
+        self.parent = self.keys[:-1]
+        self.last = self.keys[-1]
+
+    def __repr__(self):
+        return "Path({!r})".format(self.dotted)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+def glob_match(context_pattern, path_pattern, context, path):
+    """does path in context match a pair of `*` glob patterns; a context
+    of None matches as the empty string"""
+    return fnmatch.fnmatchcase(path, path_pattern) \
+        and fnmatch.fnmatchcase(context or '', context_pattern)
+
+def _make_cache(maxsize):
+    return lru_cache(maxsize=maxsize)(Path)
+
+_compile = _make_cache(PATH_CACHE_SIZE)
+
+def compile_path(dotted):
+    """return the compiled Path of a dotted string, cached"""
+    return _compile(dotted)
+
+def set_path_cache_size(maxsize):
+    """resize (and empty) the path cache"""
+    global _compile
+    _compile = _make_cache(maxsize)
+
+def path_cache_stats():
+    """return a dict of path cache hits, misses, size and hit rate"""
+    info = _compile.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+        'hit_rate': info.hits / float(lookups) if lookups else None,
+        }
@@ -0,0 +1,226 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""many signalk server connections on a few event loops"""
+
+import asyncio
+import logging
+import threading
+import time
+import aiohttp
+from signalk_client.async_client import AsyncClient
+from signalk_client.backoff import Backoff
+from signalk_client.client import CONNECTED
+
+class Reactor(object):
+    """an asyncio event loop running on its own thread
+
+    all connections on a reactor share one aiohttp session, and so its
+    connection pool. every open stream holds one of its `limit` http
+    connections (0, the default, for no limit); once they are all taken,
+    further streams and fetches wait for one to close.
+    """
+
+    def __init__(self, name, limit=0):
+        self.loop = asyncio.new_event_loop()
+        self.limit = limit
+        self.session = None
+        self.connections = 0
+        self.thread = threading.Thread(target=self.__run, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+        self.call(self.__open_session())
+
+    def __run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def __open_session(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.limit)
+            )
+
+    def call(self, coroutine, timeout=None):
+        """run a coroutine on the reactor and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(
+            coroutine, self.loop
+            ).result(timeout)
+
+    def submit(self, coroutine):
+        """run a coroutine on the reactor, returns a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def stop(self):
+        """close the shared session and stop the loop thread"""
+        self.call(self.session.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+class Connection(object):
+    """a server connection in a ClientPool"""
+
+    def __init__(self, server, client, reactor):
+        self.server = server
+        self.client = client
+        self.reactor = reactor
+        self.ready = threading.Event()
+        self.future = None
+        self.connect_failures = 0
+        self.started = time.time()
+
+    def stats(self):
+        """return a dict of connection metrics"""
+        client = self.client
+        last = client.last_received
+        return {
+            'state': client.state,
+            'received': client.received,
+            'reconnects': client.reconnects,
+            'disconnects': client.disconnects,
+            'connect_failures': self.connect_failures,
+            'last_delta_age': None if last is None else time.time() - last,
+            'uptime': time.time() - self.started,
+            }
+
+class ClientPool(object):
+    """watch many signalk servers from a fixed number of threads
+
+    Keyword arguments:
+    servers -- server hosts (`hostname:port`) to connect to (default ())
+    reactors -- number of event loop threads (default 1)
+    connection_limit -- http connections per event loop, each open stream
+        holding one (default 0, no limit)
+
+    any other keyword arguments are passed to each `AsyncClient`.
+
+    Every server gets its own `AsyncClient` and so its own `Data` store,
+    but they all run on the pool's event loops instead of a websocket
+    thread each. Each new server goes to the least loaded loop:
+
+        pool = ClientPool(['boat1:3000', 'boat2:3000'])
+        pool.wait_ready(10)
+        print(pool.data('boat1:3000').get_self())
+        print(pool.stats())
+        pool.close()
+
+    Servers have to be named; zeroconf discovery is not used.
+    """
+
+    def __init__(self, servers=(), reactors=1, connection_limit=0,
+            **client_args):
+        self.client_args = client_args
+        self.connections = {}
+        self.__reactors = [
+            Reactor("signalk-reactor-{}".format(i), connection_limit)
+            for i in range(reactors)
+            ]
+        self.__lock = threading.Lock()
+        for server in servers:
+            self.add(server)
+
+    def add(self, server):
+        """start watching a server, returns its AsyncClient"""
+        with self.__lock:
+            if server in self.connections:
+                return self.connections[server].client
+            reactor = min(self.__reactors, key=lambda r: r.connections)
+            reactor.connections += 1
+            client = AsyncClient(
+                server, session=reactor.session, **self.client_args
+                )
+            connection = Connection(server, client, reactor)
+            self.connections[server] = connection
+        connection.future = reactor.submit(self.__serve(connection))
+        return client
+
+    async def __serve(self, connection):
+        """connect, retrying with backoff, then stream until closed"""
+        client = connection.client
+        backoff = Backoff()
+        while True:
+            try:
+                await client.connect()
+                break
+            except (aiohttp.ClientError, OSError, ValueError, KeyError,
+                    asyncio.TimeoutError) as error:
+                connection.connect_failures += 1
+                delay = backoff.next()
+                logging.warning("{}: connect failed ({}), retry in {:.1f}s"\
+                    .format(connection.server, error, delay))
+                await asyncio.sleep(delay)
+        connection.ready.set()
+        await client.run()
+
+    def remove(self, server):
+        """stop watching a server"""
+        with self.__lock:
+            connection = self.connections.pop(server)
+            connection.reactor.connections -= 1
+        connection.future.cancel()
+        connection.reactor.call(connection.client.close())
+
+    def get(self, server):
+        """return the AsyncClient of a server"""
+        return self.connections[server].client
+
+    def data(self, server):
+        """return the Data store of a server (None until connected)"""
+        return self.connections[server].client.data
+
+    def wait_ready(self, timeout=None):
+        """wait until every server has connected once
+
+        returns False if timeout (seconds) expired first.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        for connection in list(self.connections.values()):
+            remaining = None
+            if deadline is not None:
+                remaining = max(0, deadline - time.time())
+            if not connection.ready.wait(remaining):
+                return False
+        return True
+
+    def stats(self):
+        """return metrics per server, plus totals under "total"
+
+        the totals also count the threads the pool uses.
+        """
+        out = {}
+        total = {
+            'connections': 0, 'connected': 0, 'received': 0,
+            'reconnects': 0, 'disconnects': 0,
+            'reactors': len(self.__reactors),
+            }
+        for server, connection in list(self.connections.items()):
+            stats = connection.stats()
+            out[server] = stats
+            total['connections'] += 1
+            total['connected'] += stats['state'] == CONNECTED
+            for key in ('received', 'reconnects', 'disconnects'):
+                total[key] += stats[key]
+        out['total'] = total
+        return out
+
+    def close(self):
+        """close every connection and stop the event loops"""
+        for server in list(self.connections.keys()):
+            self.remove(server)
+        for reactor in self.__reactors:
+            reactor.stop()
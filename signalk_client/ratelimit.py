@@ -0,0 +1,244 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""client side decimation of fast signalk paths"""
+
+import math
+import threading
+import time
+from signalk_client.paths import glob_match
+
+# rate limit policies
+LATEST = 'latest'
+AVERAGE = 'average'
+POLICIES = (LATEST, AVERAGE)
+
+class RateLimit(object):
+    """at most one update per interval for matching paths
+
+    Keyword arguments:
+    path -- signalk path, may contain `*` globs (eg. "environment.wind.*")
+    context -- context the limit applies to, may contain globs (default
+        "*", every context; "vessels.self" is not resolved, use the full
+        self context or a glob)
+    interval -- seconds between stored updates (default 1.0)
+    policy -- "latest" stores the newest value, "average" the mean of the
+        values received during the interval (default "latest")
+    """
+
+    def __init__(self, path, context='*', interval=1.0, policy=LATEST):
+        if policy not in POLICIES:
+            raise ValueError("unknown rate limit policy: {}".format(policy))
+        self.path = path
+        self.context = context
+        self.interval = interval
+        self.policy = policy
+
+    def __repr__(self):
+        return "RateLimit({!r}, context={!r}, interval={!r}, policy={!r})"\
+            .format(self.path, self.context, self.interval, self.policy)
+
+    def matches(self, context, path):
+        """does this limit apply to path in context"""
+        return glob_match(self.context, self.path, context, path)
+
+class Mean(object):
+    """running mean of numbers, or of angles in radians"""
+
+    def __init__(self, angular):
+        self.angular = angular
+        self.count = 0
+        self.total = 0.0
+        self.sin = 0.0
+        self.cos = 0.0
+
+    def add(self, value):
+        self.count += 1
+        if self.angular:
+            self.sin += math.sin(value)
+            self.cos += math.cos(value)
+        else:
+            self.total += value
+
+    def value(self):
+        if self.angular:
+            return math.atan2(self.sin, self.cos)
+        return self.total / self.count
+
+class PathState(object):
+    """rate limit state of one (context, path)"""
+
+    __slots__ = ('limit', 'last', 'held', 'means')
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.last = None
+        self.held = None
+        self.means = None
+
+class RateLimiter(object):
+    """decides which updates reach the data store
+
+    Keyword arguments:
+    limits -- RateLimit objects, the first one matching a path applies
+        (default ())
+    units -- function returning the units of a path (and optional object
+        key), so averages of angles ("rad") are circular means (default
+        None, plain means)
+
+    Data runs every value through `admit()` before storing it. `flush()`
+    returns the newest values still held back, `stats()` counts admitted
+    and dropped updates. state is kept per context, and `forget()` drops
+    a context's state once it is evicted.
+    """
+
+    def __init__(self, limits=(), units=None):
+        self.limits = list(limits)
+        self.units = units
+        self.admitted = 0
+        self.dropped = 0
+        self.__states = {}
+        self.__held = set()
+        self.__lock = threading.Lock()
+
+    def add(self, limit):
+        """add a RateLimit, applied after the existing ones"""
+        with self.__lock:
+            self.limits.append(limit)
+            self.__states = {}
+            self.__held = set()
+
+    def __state(self, context, path):
+        """return the PathState of path in context, None if unlimited"""
+        states = self.__states.get(context)
+        if states is None:
+            states = self.__states[context] = {}
+        try:
+            return states[path]
+        except KeyError:
+            pass
+        state = None
+        for limit in self.limits:
+            if limit.matches(context, path):
+                state = PathState(limit)
+                break
+        states[path] = state
+        return state
+
+    def forget(self, context):
+        """drop the state (and held values) of an evicted context"""
+        with self.__lock:
+            states = self.__states.pop(context, None)
+            if states:
+                for path in states:
+                    self.__held.discard((context, path))
+
+    def __angular(self, path, key=None):
+        return self.units is not None and self.units(path, key) == 'rad'
+
+    def __accumulate(self, state, path, value):
+        """add a value to the running means of state"""
+        if isinstance(value, dict):
+            if state.means is None:
+                state.means = {}
+            for key, item in value.items():
+                if isinstance(item, (int, float)) \
+                        and not isinstance(item, bool):
+                    if key not in state.means:
+                        state.means[key] = Mean(self.__angular(path, key))
+                    state.means[key].add(item)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            if state.means is None:
+                state.means = Mean(self.__angular(path))
+            state.means.add(value)
+
+    def __average(self, state, value):
+        """return value with its numbers replaced by the running means"""
+        means, state.means = state.means, None
+        if means is None:
+            return value
+        if isinstance(means, Mean):
+            return means.value()
+        value = dict(value)
+        for key, mean in means.items():
+            value[key] = mean.value()
+        return value
+
+    def admit(self, context, path, value, extra=None, now=None):
+        """return (True, value to store) or (False, None) for an update
+
+        extra (eg. the update's timestamp and source) is kept with a held
+        back value and returned by `flush()`.
+        """
+        with self.__lock:
+            state = self.__state(context, path)
+            if state is None:
+                return True, value
+            if now is None:
+                now = time.monotonic()
+            if state.limit.policy == AVERAGE:
+                self.__accumulate(state, path, value)
+            if state.last is not None \
+                    and now - state.last < state.limit.interval:
+                state.held = (value, extra)
+                self.__held.add((context, path))
+                self.dropped += 1
+                return False, None
+            state.last = now
+            if state.held is not None:
+                state.held = None
+                self.__held.discard((context, path))
+            self.admitted += 1
+            if state.limit.policy == AVERAGE:
+                value = self.__average(state, value)
+            return True, value
+
+    def flush(self, due_only=False, now=None):
+        """return [(context, path, value, extra)] of the updates held back
+
+        used to store the final values once a fast stream goes quiet. with
+        due_only, values are only returned once their interval has passed
+        since the last admitted one, as if they had been admitted late.
+        """
+        if now is None:
+            now = time.monotonic()
+        out = []
+        with self.__lock:
+            for key in list(self.__held):
+                context, path = key
+                state = self.__states[context][path]
+                if due_only and now - state.last < state.limit.interval:
+                    continue
+                self.__held.discard(key)
+                (value, extra), state.held = state.held, None
+                state.last = now
+                self.admitted += 1
+                if state.limit.policy == AVERAGE:
+                    value = self.__average(state, value)
+                out.append((context, path, value, extra))
+        return out
+
+    def stats(self):
+        """return a dict of admitted and dropped update counts"""
+        return {
+            'admitted': self.admitted,
+            'dropped': self.dropped,
+            'paths': sum(1 for states in self.__states.values()
+                for state in states.values() if state is not None),
+            'held': len(self.__held),
+            }
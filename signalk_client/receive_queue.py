@@ -0,0 +1,173 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""bounded receive queue between the stream reader and the data store"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+# overflow policies
+BLOCK = 'block'
+DROP_OLDEST = 'drop-oldest'
+CONFLATE = 'conflate'
+POLICIES = (BLOCK, DROP_OLDEST, CONFLATE)
+
+def delta_key(delta):
+    """return the conflation key of a delta: its context and paths"""
+    if 'updates' not in delta:
+        return None
+    paths = []
+    for update in delta['updates']:
+        for value in update.get('values', ()):
+            paths.append(value['path'])
+    return (delta.get('context'), tuple(sorted(paths)))
+
+class ReceiveQueue(object):
+    """bounded queue of deltas drained by an apply worker thread
+
+    Keyword arguments:
+    apply -- function called with each delta on the worker thread
+    maxsize -- most deltas held before the overflow policy applies
+        (default 1000)
+    policy -- what `put()` does when the queue is full (default "block"):
+        "block" waits for the worker, "drop-oldest" discards the oldest
+        delta and "conflate" replaces a queued delta for the same context
+        and paths (dropping the oldest when there is none)
+
+    `stats()` reports depth, lag and the number of dropped and conflated
+    deltas.
+    """
+
+    def __init__(self, apply, maxsize=1000, policy=BLOCK):
+        if policy not in POLICIES:
+            raise ValueError("unknown overflow policy: {}".format(policy))
+        self.apply = apply
+        self.maxsize = maxsize
+        self.policy = policy
+
+        self.received = 0
+        self.applied = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.max_depth = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+        # entries are [enqueue time, delta, key]; a conflated entry has its
+        # delta replaced in place so it keeps its place in the queue
+        self.__entries = deque()
+        self.__latest = {}
+        self.__lock = threading.Lock()
+        self.__not_empty = threading.Condition(self.__lock)
+        self.__not_full = threading.Condition(self.__lock)
+        self.__running = False
+        self.__worker = None
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def start(self):
+        """start the apply worker thread"""
+        with self.__lock:
+            if self.__running:
+                return
+            self.__running = True
+        self.__worker = threading.Thread(target=self.__run)
+        self.__worker.daemon = True
+        self.__worker.start()
+
+    def stop(self, timeout=None):
+        """stop the worker after it has applied the queued deltas"""
+        with self.__lock:
+            self.__running = False
+            self.__not_empty.notify()
+            self.__not_full.notify_all()
+        if self.__worker is not None:
+            self.__worker.join(timeout)
+
+    def put(self, delta):
+        """queue a delta, applying the overflow policy when full"""
+        now = time.monotonic()
+        key = delta_key(delta) if self.policy == CONFLATE else None
+        with self.__lock:
+            self.received += 1
+            if len(self.__entries) >= self.maxsize:
+                if self.policy == BLOCK:
+                    while len(self.__entries) >= self.maxsize \
+                            and self.__running:
+                        self.__not_full.wait()
+                elif key is not None and key in self.__latest:
+                    self.__latest[key][1] = delta
+                    self.conflated += 1
+                    return
+                else:
+                    self.__drop_oldest()
+            entry = [now, delta, key]
+            self.__entries.append(entry)
+            if key is not None:
+                self.__latest[key] = entry
+            if len(self.__entries) > self.max_depth:
+                self.max_depth = len(self.__entries)
+            self.__not_empty.notify()
+
+    def __drop_oldest(self):
+        """discard the oldest queued delta"""
+        entry = self.__entries.popleft()
+        if entry[2] is not None and self.__latest.get(entry[2]) is entry:
+            del self.__latest[entry[2]]
+        self.dropped += 1
+
+    def __run(self):
+        """worker thread, applies queued deltas in order"""
+        while True:
+            with self.__lock:
+                while not self.__entries and self.__running:
+                    self.__not_empty.wait()
+                if not self.__entries:
+                    return
+                entry = self.__entries.popleft()
+                if entry[2] is not None \
+                        and self.__latest.get(entry[2]) is entry:
+                    del self.__latest[entry[2]]
+                self.__not_full.notify()
+            self.lag = time.monotonic() - entry[0]
+            if self.lag > self.max_lag:
+                self.max_lag = self.lag
+            try:
+                self.apply(entry[1])
+            except Exception:
+                logging.exception("failed to apply delta")
+            self.applied += 1
+
+    def stats(self):
+        """return a dict of queue metrics
+
+        lag is the seconds the last applied delta spent queued.
+        """
+        return {
+            'depth': len(self.__entries),
+            'max_depth': self.max_depth,
+            'received': self.received,
+            'applied': self.applied,
+            'dropped': self.dropped,
+            'conflated': self.conflated,
+            'lag': self.lag,
+            'max_lag': self.max_lag,
+            }
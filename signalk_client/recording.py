@@ -0,0 +1,183 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""recording and replaying raw delta streams
+
+A recording is one or more segment files. Each holds a short header and
+then one record per frame: the receive time (a little endian double of
+seconds since the epoch), the frame length (unsigned 32 bit) and the raw
+frame bytes. Segments may be gzip compressed; they are named
+`<path>.<n>` (with `.gz` appended when compressed).
+"""
+
+import glob
+import gzip
+import logging
+import struct
+import threading
+import time
+from signalk_client.decoder import get_decoder
+
+MAGIC = b'SKREC\x01'
+RECORD = struct.Struct('<dI')
+
+def segment_paths(path):
+    """return the segment files of a recording, in order"""
+    paths = glob.glob("{}.*".format(glob.escape(path)))
+
+    def index(segment):
+        suffix = segment[len(path)+1:]
+        if suffix.endswith('.gz'):
+            suffix = suffix[:-3]
+        return int(suffix) if suffix.isdigit() else -1
+
+    return sorted(
+        (segment for segment in paths if index(segment) >= 0), key=index
+        )
+
+class Recorder(object):
+    """append raw stream frames with their receive time to a recording
+
+    Keyword arguments:
+    path -- recording path, segments are written to `<path>.<n>[.gz]`
+    compress -- gzip the segments (default False)
+    segment_size -- start a new segment after this many bytes of frames
+        (default None, a single segment)
+
+    `record()` is safe to call from the websocket thread; pass a Recorder
+    as `Client(recorder=...)` to capture everything a client receives.
+    """
+
+    def __init__(self, path, compress=False, segment_size=None):
+        self.path = path
+        self.compress = compress
+        self.segment_size = segment_size
+        self.frames = 0
+        self.bytes = 0
+
+        self.__lock = threading.Lock()
+        self.__segment = len(segment_paths(path))
+        self.__file = None
+        self.__segment_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __open_segment(self):
+        """start the next segment file"""
+        name = "{}.{}".format(self.path, self.__segment)
+        if self.compress:
+            self.__file = gzip.open(name + '.gz', 'wb', compresslevel=6)
+        else:
+            self.__file = open(name, 'wb')
+        self.__file.write(MAGIC)
+        self.__segment += 1
+        self.__segment_bytes = 0
+        logging.info("recording to {}".format(self.__file.name))
+
+    def record(self, frame, received=None):
+        """append a frame (str or bytes) received at time received"""
+        if received is None:
+            received = time.time()
+        if not isinstance(frame, bytes):
+            frame = frame.encode('utf-8')
+        with self.__lock:
+            if self.__file is None or (self.segment_size is not None
+                    and self.__segment_bytes >= self.segment_size):
+                if self.__file is not None:
+                    self.__file.close()
+                self.__open_segment()
+            self.__file.write(RECORD.pack(received, len(frame)))
+            self.__file.write(frame)
+            self.__segment_bytes += len(frame)
+            self.frames += 1
+            self.bytes += len(frame)
+
+    def flush(self):
+        """flush the current segment to disk"""
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.flush()
+
+    def close(self):
+        """close the current segment"""
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+
+def read_recording(path):
+    """generate (receive time, frame bytes) from every segment of a
+    recording"""
+    for segment in segment_paths(path):
+        opener = gzip.open if segment.endswith('.gz') else open
+        with opener(segment, 'rb') as frames:
+            if frames.read(len(MAGIC)) != MAGIC:
+                raise ValueError("not a recording segment: {}".format(segment))
+            while True:
+                header = frames.read(RECORD.size)
+                if len(header) < RECORD.size:
+                    break
+                received, length = RECORD.unpack(header)
+                frame = frames.read(length)
+                if len(frame) < length:
+                    logging.warning("truncated frame in {}".format(segment))
+                    break
+                yield received, frame
+
+class Replayer(object):
+    """feed a recording into a Data store
+
+    Keyword arguments:
+    path -- recording path, as given to Recorder
+    decoder -- json decoder name or function (default None, the fastest)
+
+    `replay(data, speed)` replays in real time (speed 1.0), N times faster
+    (speed N) or as fast as possible (speed None).
+    """
+
+    def __init__(self, path, decoder=None):
+        self.path = path
+        self.decoder = get_decoder(decoder)
+
+    def frames(self):
+        """generate (receive time, frame bytes) from the recording"""
+        return read_recording(self.path)
+
+    def replay(self, data, speed=None):
+        """apply every recorded frame to data with data.process_delta
+
+        returns (frames applied, seconds taken).
+        """
+        count = 0
+        start = time.monotonic()
+        first = None
+        for received, frame in self.frames():
+            if speed is not None:
+                if first is None:
+                    first = received
+                due = start + (received - first) / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            data.process_delta(self.decoder(frame))
+            count += 1
+        return count, time.monotonic() - start
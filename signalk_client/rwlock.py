@@ -0,0 +1,127 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""a reader/writer lock"""
+
+import threading
+
+class RWLock(object):
+    """any number of readers, or one writer
+
+    A waiting writer holds back new readers, so a steady stream of readers
+    can not starve the delta stream. Both sides are re-entrant, and the
+    writing thread may also read (eg. from a change callback); a reader
+    may not start writing.
+    """
+
+    def __init__(self):
+        self.__cond = threading.Condition(threading.Lock())
+        self.__readers = 0
+        self.__writer = None
+        self.__writes = 0
+        self.__waiting = 0
+        self.__local = threading.local()
+
+    def acquire_read(self):
+        if self.__writer == threading.get_ident():
+            return
+        local = self.__local
+        depth = getattr(local, 'depth', 0)
+        if not depth:
+            with self.__cond:
+                while self.__writer is not None or self.__waiting:
+                    self.__cond.wait()
+                self.__readers += 1
+        local.depth = depth + 1
+
+    def release_read(self):
+        if self.__writer == threading.get_ident():
+            return
+        local = self.__local
+        local.depth -= 1
+        if not local.depth:
+            with self.__cond:
+                self.__readers -= 1
+                if not self.__readers:
+                    self.__cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__writer == me:
+                self.__writes += 1
+                return
+            self.__waiting += 1
+            while self.__writer is not None or self.__readers:
+                self.__cond.wait()
+            self.__waiting -= 1
+            self.__writer = me
+            self.__writes = 1
+
+    def release_write(self):
+        with self.__cond:
+            self.__writes -= 1
+            if not self.__writes:
+                self.__writer = None
+                self.__cond.notify_all()
+
+    def reading(self):
+        """return a context manager holding the lock for reading"""
+        return _Held(self.acquire_read, self.release_read)
+
+    def writing(self):
+        """return a context manager holding the lock for writing"""
+        return _Held(self.acquire_write, self.release_write)
+
+class _Held(object):
+
+    __slots__ = ('acquire', 'release')
+
+    def __init__(self, acquire, release):
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class NoLock(object):
+    """the interface of RWLock without any locking"""
+
+    def acquire_read(self):
+        pass
+
+    def release_read(self):
+        pass
+
+    def acquire_write(self):
+        pass
+
+    def release_write(self):
+        pass
+
+    def reading(self):
+        return _NOT_HELD
+
+    def writing(self):
+        return _NOT_HELD
+
+_NOT_HELD = _Held(lambda: None, lambda: None)
@@ -0,0 +1,181 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""choosing between several sources of the same signalk path"""
+
+import threading
+import time
+from signalk_client.paths import glob_match
+
+def source_id(properties):
+    """return the source reference of an update ("$source", or one made
+    from its source object like the server does), None if it has none"""
+    if '$source' in properties:
+        return properties['$source']
+    source = properties.get('source')
+    if not isinstance(source, dict) or 'label' not in source:
+        return None
+    for key in ('src', 'talker'):
+        if key in source:
+            return "{}.{}".format(source['label'], source[key])
+    return source['label']
+
+class SourcePriority(object):
+    """which source of matching paths is stored
+
+    Keyword arguments:
+    path -- signalk path, may contain `*` globs (eg. "navigation.position")
+    sources -- source references (eg. "nmea0183.GP", "n2k.115"), most
+        preferred first; sources not listed come last, the newest of them
+        winning
+    context -- context the priority applies to, may contain globs
+        (default "*", every context)
+    timeout -- seconds without updates after which a source is stale and
+        the next fresh one is stored instead (default 10.0)
+    """
+
+    def __init__(self, path, sources, context='*', timeout=10.0):
+        self.path = path
+        self.sources = list(sources)
+        self.context = context
+        self.timeout = timeout
+        self.ranks = {source: rank for rank, source in enumerate(sources)}
+
+    def __repr__(self):
+        return "SourcePriority({!r}, {!r}, context={!r}, timeout={!r})"\
+            .format(self.path, self.sources, self.context, self.timeout)
+
+    def matches(self, context, path):
+        """does this priority apply to path in context"""
+        return glob_match(self.context, self.path, context, path)
+
+    def rank(self, source):
+        """return the rank of a source, lower is preferred"""
+        return self.ranks.get(source, len(self.sources))
+
+class SourceSlot(object):
+    """the last update of one source of a path"""
+
+    __slots__ = ('value', 'properties', 'received')
+
+    def __init__(self, value, properties, received):
+        self.value = value
+        self.properties = properties
+        self.received = received
+
+class SourceSelector(object):
+    """decides which source of a path reaches the data store
+
+    Keyword arguments:
+    priorities -- SourcePriority objects, the first one matching a path
+        applies (default ())
+
+    Data runs every value through `select()` before storing it. Paths
+    with a priority keep the last update of each of their sources, and
+    the value is only stored when its source is the preferred one of the
+    sources that are not stale. So the stored value always comes from the
+    winning source and reads need no further work; `sources()` returns the
+    values of all of them. `forget()` drops the sources of an evicted
+    context.
+    """
+
+    def __init__(self, priorities=()):
+        self.priorities = list(priorities)
+        self.selected = 0
+        self.rejected = 0
+        self.__paths = {}
+        self.__lock = threading.Lock()
+
+    def add(self, priority):
+        """add a SourcePriority, applied after the existing ones"""
+        with self.__lock:
+            self.priorities.append(priority)
+            self.__paths = {}
+
+    def __path(self, context, path):
+        """return (priority, slots) of path in context, None if any
+        source is stored"""
+        paths = self.__paths.get(context)
+        if paths is None:
+            paths = self.__paths[context] = {}
+        try:
+            return paths[path]
+        except KeyError:
+            pass
+        state = None
+        for priority in self.priorities:
+            if priority.matches(context, path):
+                state = (priority, {})
+                break
+        paths[path] = state
+        return state
+
+    def forget(self, context):
+        """drop the paths (and their sources) of an evicted context"""
+        with self.__lock:
+            self.__paths.pop(context, None)
+
+    def select(self, context, path, value, properties, now=None):
+        """keep an update's value, return True if it should be stored"""
+        with self.__lock:
+            state = self.__path(context, path)
+            if state is None:
+                return True
+            priority, slots = state
+            if now is None:
+                now = time.monotonic()
+            source = source_id(properties)
+            slots[source] = SourceSlot(value, properties, now)
+            rank = priority.rank(source)
+            for other, slot in slots.items():
+                if other != source and priority.rank(other) < rank \
+                        and now - slot.received <= priority.timeout:
+                    self.rejected += 1
+                    return False
+            self.selected += 1
+            return True
+
+    def sources(self, context, path, now=None):
+        """return {source: record} of the last update of every source of
+        path in context, each record holding the value, timestamp, age in
+        seconds and whether it is stale"""
+        if now is None:
+            now = time.monotonic()
+        with self.__lock:
+            state = self.__paths.get(context, {}).get(path)
+            if state is None:
+                return {}
+            priority, slots = state
+            return {
+                source: {
+                    'value': slot.value,
+                    'timestamp': slot.properties.get('timestamp'),
+                    'age': now - slot.received,
+                    'stale': now - slot.received > priority.timeout,
+                    }
+                for source, slot in slots.items()
+                }
+
+    def stats(self):
+        """return a dict of selected and rejected update counts"""
+        return {
+            'selected': self.selected,
+            'rejected': self.rejected,
+            'paths': sum(1 for paths in self.__paths.values()
+                for state in paths.values() if state is not None),
+            }
@@ -0,0 +1,658 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""a local stand-in signalk server for tests and benchmarks
+
+StandInServer serves `/signalk` discovery, the `/signalk/v1/api` REST tree
+and the `/signalk/v1/stream` websocket (and optionally a newline delimited
+`signalk-tcp` stream) from threads in the current process, using only the
+standard library. A load generator publishes synthetic deltas for a number
+of self sensors and AIS vessels at a fixed rate:
+
+    server = StandInServer(rate=500, sensors=10, vessels=50)
+    server.start()
+    client = Client(server.address)
+    ...
+    client.close()
+    server.stop()
+"""
+
+import base64
+import fnmatch
+import gzip
+import hashlib
+import http.server
+import json
+import logging
+import math
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+import zlib
+from urllib.parse import parse_qs, urlparse
+
+SELF = 'vessels.urn:mrn:imo:mmsi:366000000'
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xa
+
+# paths for the first self sensors, any further sensors get generic paths
+SENSOR_PATHS = [
+    'navigation.speedOverGround',
+    'navigation.courseOverGroundTrue',
+    'navigation.headingMagnetic',
+    'navigation.attitude.roll',
+    'environment.wind.speedApparent',
+    'environment.wind.angleApparent',
+    'environment.depth.belowTransducer',
+    'environment.water.temperature',
+    'electrical.batteries.house.voltage',
+    'propulsion.main.revolutions',
+    ]
+
+def timestamp(when=None):
+    """return a signalk timestamp, with microseconds, for a unix time"""
+    if when is None:
+        when = time.time()
+    return "{}.{:06d}Z".format(
+        time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(when)),
+        int(when % 1 * 1000000)
+        )
+
+def sensor_path(index):
+    """return the path of self sensor number index"""
+    if index < len(SENSOR_PATHS):
+        return SENSOR_PATHS[index]
+    return 'environment.inside.sensor{}.temperature'.format(index)
+
+def vessel_context(index):
+    """return the context of AIS vessel number index"""
+    return 'vessels.urn:mrn:imo:mmsi:{}'.format(200000000 + index)
+
+def encode_frame(payload, opcode=OPCODE_TEXT, compressed=False):
+    """return an unmasked (server to client) websocket frame"""
+    first = 0x80 | opcode
+    if compressed:
+        first |= 0x40
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', first, length)
+    elif length < 2**16:
+        header = struct.pack('!BBH', first, 126, length)
+    else:
+        header = struct.pack('!BBQ', first, 127, length)
+    return header + payload
+
+def read_frame(rfile):
+    """read a websocket frame, returns (opcode, payload, compressed) or
+    None at EOF"""
+    header = rfile.read(2)
+    if len(header) < 2:
+        return None
+    compressed = bool(header[0] & 0x40)
+    opcode = header[0] & 0x0f
+    masked = header[1] & 0x80
+    length = header[1] & 0x7f
+    if length == 126:
+        length = struct.unpack('!H', rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', rfile.read(8))[0]
+    mask = rfile.read(4) if masked else None
+    payload = rfile.read(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload, compressed
+
+def negotiate_deflate(offer):
+    """answer a permessage-deflate offer
+
+    returns (response header, window bits, context takeover), or None
+    when the client did not offer permessage-deflate.
+    """
+    for extension in (offer or '').split(','):
+        params = [p.strip() for p in extension.split(';')]
+        if params[0] != 'permessage-deflate':
+            continue
+        window_bits = 15
+        context_takeover = True
+        response = ['permessage-deflate']
+        for param in params[1:]:
+            name, _, value = param.partition('=')
+            if name == 'server_max_window_bits' and value:
+                # zlib cannot compress with an 8 bit window
+                window_bits = max(9, int(value.strip('"')))
+                response.append('server_max_window_bits={}'.format(
+                    window_bits
+                    ))
+            elif name == 'server_no_context_takeover':
+                context_takeover = False
+                response.append('server_no_context_takeover')
+        return '; '.join(response), window_bits, context_takeover
+    return None
+
+class StreamConnection(object):
+    """a websocket stream client of the stand-in server
+
+    with deflate ((window bits, context takeover) from negotiate_deflate),
+    text frames are sent compressed.
+    """
+
+    def __init__(self, wfile, subscribe_all, deflate=None):
+        self.wfile = wfile
+        self.subscribe_all = subscribe_all
+        self.subscriptions = []
+        self.lock = threading.Lock()
+        self.open = True
+        self.deflate = deflate
+        self.__compressor = None
+        self.__decompressor = None
+
+    def __compress(self, payload):
+        """deflate a message, ending it on a sync flush"""
+        window_bits, context_takeover = self.deflate
+        if self.__compressor is None or not context_takeover:
+            self.__compressor = zlib.compressobj(
+                6, zlib.DEFLATED, -window_bits
+                )
+        data = self.__compressor.compress(payload) \
+            + self.__compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data[:-4]
+
+    def decompress(self, payload):
+        """inflate a compressed message from the client"""
+        if self.__decompressor is None:
+            self.__decompressor = zlib.decompressobj(-15)
+        return self.__decompressor.decompress(payload + b'\x00\x00\xff\xff')
+
+    def encode(self, payload, opcode):
+        """return the bytes to send for a message"""
+        if self.deflate is not None and opcode == OPCODE_TEXT:
+            return encode_frame(self.__compress(payload), opcode, True)
+        return encode_frame(payload, opcode)
+
+    def close(self):
+        """close the stream from the server side"""
+        self.send(struct.pack('!H', 1001), OPCODE_CLOSE)
+        self.open = False
+
+    def send(self, payload, opcode=OPCODE_TEXT):
+        """send a frame, marking the connection closed on failure"""
+        with self.lock:
+            if not self.open:
+                return 0
+            frame = self.encode(payload, opcode)
+            try:
+                self.wfile.write(frame)
+                self.wfile.flush()
+            except (OSError, ValueError):
+                self.open = False
+                return 0
+        return len(frame)
+
+    def wants(self, context, path):
+        """does this connection subscribe to path in context"""
+        if self.subscribe_all:
+            return True
+        for context_pattern, path_pattern in self.subscriptions:
+            if fnmatch.fnmatchcase(context, context_pattern) \
+                    and fnmatch.fnmatchcase(path, path_pattern):
+                return True
+        return False
+
+    def handle_message(self, message):
+        """apply a subscribe or unsubscribe message"""
+        context = message.get('context', 'vessels.self')
+        if context == 'vessels.self':
+            context = SELF
+        for sub in message.get('subscribe', []):
+            self.subscriptions.append((context, sub['path']))
+        for sub in message.get('unsubscribe', []):
+            if context == '*' and sub['path'] == '*':
+                self.subscriptions = []
+                self.subscribe_all = False
+                continue
+            self.subscriptions = [
+                (c, p) for (c, p) in self.subscriptions
+                if not (c == context and p == sub['path'])
+                ]
+
+class TCPStreamConnection(StreamConnection):
+    """a signalk-tcp stream client of the stand-in server"""
+
+    def __init__(self, wfile, sock):
+        super(TCPStreamConnection, self).__init__(wfile, False)
+        self.sock = sock
+
+    def encode(self, payload, opcode):
+        return payload + b'\n'
+
+    def close(self):
+        self.open = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+class TrackedHandler(socketserver.StreamRequestHandler):
+    """registers its connection with the stand-in server, so `stop()` can
+    close keep-alive connections that would otherwise go on serving"""
+
+    def setup(self):
+        super(TrackedHandler, self).setup()
+        self.server.standin.add_socket(self.connection)
+
+    def finish(self):
+        self.server.standin.remove_socket(self.connection)
+        try:
+            super(TrackedHandler, self).finish()
+        except OSError:
+            # closed by stop()
+            pass
+
+class TCPStreamHandler(TrackedHandler):
+    """signalk-tcp stream handler of the stand-in server"""
+
+    def handle(self):
+        standin = self.server.standin
+        connection = TCPStreamConnection(self.wfile, self.request)
+        connection.send(json.dumps(standin.hello()).encode('utf-8'))
+        standin.add_connection(connection)
+        try:
+            for line in self.rfile:
+                if not connection.open:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    connection.handle_message(json.loads(line))
+                except (ValueError, KeyError, AttributeError):
+                    logging.warning("standin: bad message {!r}".format(line))
+        except OSError:
+            pass
+        finally:
+            connection.open = False
+            standin.remove_connection(connection)
+
+class StandInHandler(TrackedHandler, http.server.BaseHTTPRequestHandler):
+    """http and websocket request handler of the stand-in server"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug("standin: " + format, *args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip('/')
+        if path == '/signalk':
+            self.__send_json(self.server.standin.discovery(
+                self.headers.get('Host')
+                ))
+        elif path == '/signalk/v1/stream':
+            self.__stream(parse_qs(url.query))
+        elif path == '/signalk/v1/api' or path.startswith('/signalk/v1/api/'):
+            keys = [key for key in path[len('/signalk/v1/api'):].split('/')
+                if key]
+            try:
+                self.__send_json(self.server.standin.subtree(keys))
+            except (KeyError, TypeError):
+                self.send_error(404)
+        else:
+            self.send_error(404)
+
+    def __send_json(self, value):
+        body = json.dumps(value).encode('utf-8')
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def __stream(self, query):
+        key = self.headers.get('Sec-WebSocket-Key')
+        if key is None or 'websocket' not in \
+                self.headers.get('Upgrade', '').lower():
+            self.send_error(400)
+            return
+        accept = base64.b64encode(
+            hashlib.sha1((key + WS_GUID).encode('ascii')).digest()
+            ).decode('ascii')
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        deflate = None
+        if self.server.standin.compression:
+            deflate = negotiate_deflate(
+                self.headers.get('Sec-WebSocket-Extensions')
+                )
+        if deflate is not None:
+            self.send_header('Sec-WebSocket-Extensions', deflate[0])
+            deflate = deflate[1:]
+        self.end_headers()
+        self.wfile.flush()
+
+        subscribe = query.get('subscribe', ['self'])[0]
+        connection = StreamConnection(
+            self.wfile, subscribe != 'none', deflate
+            )
+        standin = self.server.standin
+        connection.send(json.dumps(standin.hello()).encode('utf-8'))
+        standin.add_connection(connection)
+        try:
+            while connection.open:
+                frame = read_frame(self.rfile)
+                if frame is None:
+                    break
+                opcode, payload, compressed = frame
+                if compressed:
+                    payload = connection.decompress(payload)
+                if opcode == OPCODE_CLOSE:
+                    connection.send(payload[:2], OPCODE_CLOSE)
+                    break
+                elif opcode == OPCODE_PING:
+                    connection.send(payload, OPCODE_PONG)
+                elif opcode == OPCODE_TEXT:
+                    try:
+                        connection.handle_message(json.loads(payload))
+                    except (ValueError, KeyError, AttributeError):
+                        logging.warning("standin: bad message {!r}".format(
+                            payload
+                            ))
+        except (OSError, struct.error):
+            pass
+        finally:
+            connection.open = False
+            standin.remove_connection(connection)
+            self.close_connection = True
+
+class StandInServer(object):
+    """a local signalk server with a synthetic load generator
+
+    Keyword arguments:
+    host -- address to listen on (default "127.0.0.1")
+    port -- port to listen on (default 0, any free port)
+    rate -- deltas per second the load generator publishes (default 0)
+    sensors -- number of self sensors to generate data for (default 10)
+    vessels -- number of AIS vessels to generate data for (default 0)
+    seed -- random seed of the generator (default 0)
+    compression -- accept permessage-deflate offers (default True)
+    tcp -- also serve a signalk-tcp stream on another free port and
+        advertise it (default False)
+
+    `publish()` sends a delta of your own to every stream client. `sent`
+    counts published deltas and `bytes_sent` the stream bytes written.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, rate=0, sensors=10,
+            vessels=0, seed=0, compression=True, tcp=False):
+        self.rate = rate
+        self.compression = compression
+        self.sensors = sensors
+        self.vessels = vessels
+        self.sent = 0
+        self.bytes_sent = 0
+
+        self.__random = random.Random(seed)
+        self.__values = {}
+        self.__connections = []
+        self.__sockets = set()
+        self.__lock = threading.Lock()
+        self.__running = threading.Event()
+
+        self.httpd = http.server.ThreadingHTTPServer(
+            (host, port), StandInHandler
+            )
+        self.httpd.daemon_threads = True
+        self.httpd.standin = self
+        self.host, self.port = self.httpd.server_address[:2]
+        self.address = "{}:{}".format(self.host, self.port)
+        self.tcpd = None
+        self.tcp_port = None
+        if tcp:
+            self.tcpd = socketserver.ThreadingTCPServer(
+                (host, 0), TCPStreamHandler
+                )
+            self.tcpd.daemon_threads = True
+            self.tcpd.standin = self
+            self.tcp_port = self.tcpd.server_address[1]
+
+        self.__threads = []
+
+        # start with a value for everything, so the snapshot is complete
+        now = time.time()
+        for index in range(sensors):
+            self.__store(SELF, self.__sensor_update(index, now))
+        for index in range(vessels):
+            self.__store(vessel_context(index), self.__vessel_update(index, now))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """start serving, and generating if rate is set"""
+        self.__running.set()
+        for server in (self.httpd, self.tcpd):
+            if server is None:
+                continue
+            serve_t = threading.Thread(target=server.serve_forever)
+            serve_t.daemon = True
+            serve_t.start()
+            self.__threads.append(serve_t)
+        if self.rate:
+            generate_t = threading.Thread(target=self.__generate)
+            generate_t.daemon = True
+            generate_t.start()
+            self.__threads.append(generate_t)
+
+    def stop(self):
+        """stop generating and serving, closing every stream and keep-alive
+        connection"""
+        self.__running.clear()
+        self.httpd.shutdown()
+        if self.tcpd is not None:
+            self.tcpd.shutdown()
+        with self.__lock:
+            connections = list(self.__connections)
+        for connection in connections:
+            connection.close()
+        with self.__lock:
+            sockets = list(self.__sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.httpd.server_close()
+        if self.tcpd is not None:
+            self.tcpd.server_close()
+        for thread in self.__threads:
+            thread.join()
+
+    def discovery(self, host):
+        """return the /signalk discovery document"""
+        if host is None:
+            host = self.address
+        endpoints = {
+            'version': '1.0.0',
+            'signalk-http': 'http://{}/signalk/v1/api/'.format(host),
+            'signalk-ws': 'ws://{}/signalk/v1/stream'.format(host),
+            }
+        if self.tcpd is not None:
+            endpoints['signalk-tcp'] = 'tcp://{}:{}'.format(
+                host.rsplit(':', 1)[0], self.tcp_port
+                )
+        return {'endpoints': {'v1': endpoints},
+            'server': {'id': 'signalk-standin', 'version': '1.0.0'}}
+
+    def hello(self):
+        """return the stream hello message"""
+        return {
+            'name': 'signalk-standin', 'version': '1.0.0', 'self': SELF,
+            'roles': ['master', 'main'], 'timestamp': timestamp(),
+            }
+
+    def tree(self):
+        """return the full REST data tree"""
+        vessels = {}
+        with self.__lock:
+            values = list(self.__values.items())
+        for (context, path), leaf in values:
+            node = vessels.setdefault(context.split('.', 1)[1], {})
+            keys = path.split('.')
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+            node[keys[-1]] = dict(leaf)
+        for context, vessel in vessels.items():
+            if context.startswith('urn:mrn:imo:mmsi:'):
+                vessel['mmsi'] = context.rsplit(':', 1)[1]
+        return {'version': '1.0.0', 'self': SELF, 'vessels': vessels}
+
+    def subtree(self, keys):
+        """return the REST subtree at a list of keys"""
+        if keys[:2] == ['vessels', 'self']:
+            keys = SELF.split('.') + keys[2:]
+        node = self.tree()
+        for key in keys:
+            node = node[key]
+        return node
+
+    def add_connection(self, connection):
+        with self.__lock:
+            self.__connections.append(connection)
+
+    def remove_connection(self, connection):
+        with self.__lock:
+            if connection in self.__connections:
+                self.__connections.remove(connection)
+
+    def add_socket(self, sock):
+        with self.__lock:
+            self.__sockets.add(sock)
+
+    def remove_socket(self, sock):
+        with self.__lock:
+            self.__sockets.discard(sock)
+
+    def connection_count(self):
+        """return the number of open stream connections"""
+        with self.__lock:
+            return len(self.__connections)
+
+    def __store(self, context, update):
+        """remember the values of an update for the REST tree"""
+        with self.__lock:
+            for value in update['values']:
+                self.__values[(context, value['path'])] = {
+                    'value': value['value'],
+                    'timestamp': update['timestamp'],
+                    '$source': update['$source'],
+                    }
+
+    def publish(self, delta):
+        """send a delta to every stream client subscribed to it"""
+        context = delta.get('context', SELF)
+        for update in delta.get('updates', []):
+            update.setdefault('$source', 'standin.0')
+            update.setdefault('timestamp', timestamp())
+            self.__store(context, update)
+        payload = json.dumps(delta).encode('utf-8')
+        paths = [
+            value['path']
+            for update in delta.get('updates', [])
+            for value in update['values']
+            ]
+        with self.__lock:
+            connections = list(self.__connections)
+        for connection in connections:
+            if any(connection.wants(context, path) for path in paths):
+                self.bytes_sent += connection.send(payload)
+        self.sent += 1
+
+    def __sensor_update(self, index, now):
+        return {
+            '$source': 'standin.{}'.format(index % 4),
+            'timestamp': timestamp(now),
+            'values': [{
+                'path': sensor_path(index),
+                'value': round(self.__random.uniform(0, 10), 3),
+                }],
+            }
+
+    def __vessel_update(self, index, now):
+        return {
+            '$source': 'standin.ais',
+            'timestamp': timestamp(now),
+            'values': [
+                {'path': 'navigation.position', 'value': {
+                    'latitude': round(self.__random.uniform(-60, 60), 6),
+                    'longitude': round(self.__random.uniform(-180, 180), 6),
+                    }},
+                {'path': 'navigation.speedOverGround',
+                    'value': round(self.__random.uniform(0, 12), 2)},
+                {'path': 'navigation.courseOverGroundTrue',
+                    'value': round(self.__random.uniform(0, 2*math.pi), 4)},
+                ],
+            }
+
+    def next_delta(self, now=None):
+        """return the next generated delta, round robin over all sources"""
+        if now is None:
+            now = time.time()
+        sources = self.sensors + self.vessels
+        index = self.sent % sources
+        if index < self.sensors:
+            return {'context': SELF,
+                'updates': [self.__sensor_update(index, now)]}
+        index -= self.sensors
+        return {'context': vessel_context(index),
+            'updates': [self.__vessel_update(index, now)]}
+
+    def __generate(self):
+        """load generator thread, publishes rate deltas per second"""
+        if self.sensors + self.vessels == 0:
+            return
+        start = time.monotonic()
+        published = 0
+        while self.__running.is_set():
+            due = int((time.monotonic() - start) * self.rate)
+            while published < due and self.__running.is_set():
+                self.publish(self.next_delta())
+                published += 1
+            time.sleep(0.002)
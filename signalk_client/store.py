@@ -0,0 +1,466 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""storage backends of the Data object
+
+A store keeps the leaf records of the signalk tree: the objects holding a
+value with its timestamp and source, addressed by a context (eg.
+"vessels.urn:mrn:imo:mmsi:230099999") and a path (eg.
+"navigation.speedOverGround"), both compiled `signalk_client.paths.Path`
+objects. Anything outside a context (the self reference, version,
+sources) is kept as is.
+
+TreeStore keeps the nested tree itself and is the default. FlatStore keeps
+every leaf in one dict keyed by (context, path), so point reads do not
+depend on the path depth and a full scan is a single loop; the nested tree
+is only built when asked for, and rebuilt after the next write; reads
+within a context never need it.
+"""
+
+from signalk_client.paths import compile_path
+
+# store names
+TREE = 'tree'
+FLAT = 'flat'
+STORES = (TREE, FLAT)
+
+# signalk top level groups, their children are contexts
+CONTEXT_GROUPS = ('vessels', 'aircraft', 'aton', 'sar')
+
+# update properties stored next to a value
+PROPERTIES = ('timestamp', 'source', '$source')
+
+def is_record(node):
+    """is node a leaf record (or a plain value) rather than a branch"""
+    if not isinstance(node, dict):
+        return True
+    return 'value' in node or 'timestamp' in node or '$source' in node
+
+def make_item(value, properties):
+    """return the record stored for a value and its update properties
+
+    object values are stored key by key next to the properties.
+    """
+    item = properties.copy()
+    if isinstance(value, dict):
+        item.update(value)
+    else:
+        item['value'] = value
+    return item
+
+def copy_tree(node):
+    """return a copy of every dict of a tree, sharing anything else"""
+    return {
+        key: copy_tree(child) if isinstance(child, dict) else child
+        for key, child in node.items()
+        }
+
+def walk_records(node, keys=()):
+    """generate (keys, record) for every leaf record under node"""
+    for key, child in node.items():
+        if is_record(child):
+            yield keys + (key,), child
+        else:
+            yield from walk_records(child, keys + (key,))
+
+def walk_contexts(tree):
+    """generate (context, node) for every context of a tree"""
+    for group in CONTEXT_GROUPS:
+        members = tree.get(group)
+        if not isinstance(members, dict):
+            continue
+        for key, node in members.items():
+            if isinstance(node, dict):
+                yield "{}.{}".format(group, key), node
+
+class TreeStore(object):
+    """leaf records kept in the nested signalk tree"""
+
+    name = TREE
+
+    def __init__(self, tree):
+        self.tree = tree
+
+    def load(self, tree):
+        """replace everything with a tree"""
+        self.tree = tree
+
+    def copy(self):
+        """return a TreeStore of a copy of the tree"""
+        return TreeStore(copy_tree(self.tree))
+
+    def node(self, keys):
+        """return the object at keys, creating missing objects"""
+        node = self.tree
+        for key in keys:
+            child = node.get(key)
+            if child is None:
+                child = node[key] = {}
+            node = child
+        return node
+
+    def set(self, context, path, value, properties):
+        """store a value at path in context (None for the tree root)"""
+        node = self.tree
+        for key in context.keys + path.parent if context is not None \
+                else path.parent:
+            child = node.get(key)
+            if child is None:
+                child = node[key] = {}
+            node = child
+        item = properties.copy()
+        if isinstance(value, dict):
+            item.update(value)
+        else:
+            item['value'] = value
+        node[path.last] = item
+
+    def get(self, context, path):
+        """return the object at path in context, raises KeyError"""
+        node = self.tree
+        if context is not None:
+            for key in context.keys:
+                node = node[key]
+        for key in path.keys:
+            node = node[key]
+        return node
+
+    def lookup(self, keys):
+        """return the object at a list of keys, raises KeyError"""
+        node = self.tree
+        for key in keys:
+            node = node[key]
+        return node
+
+    def delete(self, context, path):
+        """remove the object at path in context, and any objects left
+        empty above it in the context; raises KeyError"""
+        node = self.tree
+        if context is not None:
+            for key in context.keys:
+                node = node[key]
+        nodes = []
+        for key in path.parent:
+            nodes.append((node, key))
+            node = node[key]
+        del node[path.last]
+        for parent, key in reversed(nodes):
+            if parent[key]:
+                break
+            del parent[key]
+
+    def delete_context(self, context):
+        """remove a whole context, raises KeyError"""
+        del self.lookup(context.parent)[context.last]
+
+    def set_root(self, key, value):
+        self.tree[key] = value
+
+    def get_root(self, key, default=None):
+        return self.tree.get(key, default)
+
+    def contexts(self, group):
+        """return the context keys of a group (eg. the vessel ids)"""
+        return list(self.tree[group].keys())
+
+    def records(self):
+        """generate (context, path, record) for every leaf of every
+        context"""
+        for context, node in walk_contexts(self.tree):
+            for keys, record in walk_records(node):
+                yield context, ".".join(keys), record
+
+class Leaf(object):
+    """a leaf record of a FlatStore
+
+    value is the stored value; for records holding an object (such as a
+    position) it is the dict of the object's keys and spread is True.
+    extra holds any other keys of a record loaded from a snapshot. A plain
+    value without a record (such as a vessel's name) is kept with raw set.
+    """
+
+    __slots__ = ('value', 'timestamp', 'source', 'dollar_source', 'spread',
+        'raw', 'extra')
+
+    def __init__(self, value, timestamp=None, source=None,
+            dollar_source=None, spread=False, raw=False, extra=None):
+        self.value = value
+        self.timestamp = timestamp
+        self.source = source
+        self.dollar_source = dollar_source
+        self.spread = spread
+        self.raw = raw
+        self.extra = extra
+
+    @classmethod
+    def from_record(cls, record):
+        """return the Leaf of a record from a tree"""
+        if not isinstance(record, dict):
+            return cls(record, raw=True)
+        rest = {
+            key: item for key, item in record.items()
+            if key not in PROPERTIES
+            }
+        if 'value' in rest:
+            value = rest.pop('value')
+            spread = False
+        else:
+            value, rest = rest, None
+            spread = True
+        return cls(value, record.get('timestamp'), record.get('source'),
+            record.get('$source'), spread, False, rest or None)
+
+    def record(self):
+        """return the record as stored in a tree"""
+        if self.raw:
+            return self.value
+        item = {}
+        if self.source is not None:
+            item['source'] = self.source
+        if self.dollar_source is not None:
+            item['$source'] = self.dollar_source
+        if self.timestamp is not None:
+            item['timestamp'] = self.timestamp
+        if self.spread:
+            item.update(self.value)
+        else:
+            item['value'] = self.value
+        if self.extra:
+            item.update(self.extra)
+        return item
+
+class FlatStore(object):
+    """leaf records in a flat dict keyed by (context, path)
+
+    contexts and paths are the dotted strings (the context is None for
+    values outside any context). `tree` builds the nested view on demand.
+    the paths of each context are indexed, so removing a context does not
+    scan every leaf.
+    """
+
+    name = FLAT
+
+    def __init__(self, tree):
+        self.leaves = {}
+        self.root = {}
+        self.__contexts = {}
+        self.__tree = None
+        self.load(tree)
+
+    def load(self, tree):
+        """replace everything with a tree"""
+        leaves = {}
+        contexts = {}
+        root = dict(tree)
+        for context, node in walk_contexts(tree):
+            group, key = context.split('.', 1)
+            paths = contexts.setdefault(group, {})[key] = set()
+            for keys, record in walk_records(node):
+                path = ".".join(keys)
+                paths.add(path)
+                leaves[(context, path)] = Leaf.from_record(record)
+        for group in contexts:
+            del root[group]
+        self.leaves = leaves
+        self.root = root
+        self.__contexts = contexts
+        self.__tree = None
+
+    def copy(self):
+        """return a FlatStore of the same leaves
+
+        leaves are replaced rather than changed, so they are shared.
+        """
+        store = FlatStore.__new__(FlatStore)
+        store.leaves = self.leaves.copy()
+        store.root = copy_tree(self.root)
+        store.__contexts = {
+            group: {member: set(paths) for member, paths in members.items()}
+            for group, members in self.__contexts.items()
+            }
+        store.__tree = None
+        return store
+
+    def set(self, context, path, value, properties):
+        """store a value at path in context (None for the tree root)"""
+        if context is None:
+            key = (None, path.dotted)
+        else:
+            key = (context.dotted, path.dotted)
+            if key not in self.leaves and len(context.keys) > 1:
+                group, member = context.dotted.split('.', 1)
+                self.__contexts.setdefault(group, {}).setdefault(
+                    member, set()
+                    ).add(path.dotted)
+        self.leaves[key] = Leaf(value, properties.get('timestamp'),
+            properties.get('source'), properties.get('$source'),
+            isinstance(value, dict))
+        self.__tree = None
+
+    def get(self, context, path):
+        """return the object at path in context, raises KeyError
+
+        objects in a context are read from its leaves (see `__find()`),
+        anything else from the tree.
+        """
+        if context is not None and len(context.keys) == 2 \
+                and context.keys[0] in self.__contexts:
+            return self.__find(context.keys[0], context.keys[1], path.keys)
+        leaf = self.leaves.get(
+            (context.dotted if context is not None else None, path.dotted)
+            )
+        if leaf is not None:
+            return leaf.record()
+        node = self.tree
+        if context is not None:
+            for key in context.keys:
+                node = node[key]
+        for key in path.keys:
+            node = node[key]
+        return node
+
+    def lookup(self, keys):
+        """return the object at a list of keys, raises KeyError"""
+        keys = list(keys)
+        if len(keys) > 1 and keys[0] in self.__contexts:
+            return self.__find(keys[0], keys[1], keys[2:])
+        node = self.tree
+        for key in keys:
+            node = node[key]
+        return node
+
+    def __find(self, group, member, keys):
+        """return the object at keys in a context, raises KeyError
+
+        only the context's own leaves are read: a leaf record directly, a
+        key inside a record (eg. the latitude of a position) from that
+        record, and a branch is built from the indexed paths under it, so
+        neither a miss nor a branch needs the whole tree.
+        """
+        context = "{}.{}".format(group, member)
+        paths = self.__contexts[group][member]
+        dotted = ".".join(keys)
+        leaf = self.leaves.get((context, dotted))
+        if leaf is not None:
+            return leaf.record()
+        for end in range(len(keys) - 1, 0, -1):
+            leaf = self.leaves.get((context, ".".join(keys[:end])))
+            if leaf is not None:
+                node = leaf.record()
+                for key in keys[end:]:
+                    node = node[key]
+                return node
+        prefix = dotted + '.' if keys else ''
+        branch = {}
+        for path in paths:
+            if not path.startswith(prefix):
+                continue
+            node = branch
+            rest = path[len(prefix):].split('.')
+            for key in rest[:-1]:
+                child = node.get(key)
+                if child is None:
+                    child = node[key] = {}
+                node = child
+            node[rest[-1]] = self.leaves[(context, path)].record()
+        if keys and not branch:
+            raise KeyError(dotted)
+        return branch
+
+    def delete(self, context, path):
+        """remove the leaf at path in context, raises KeyError"""
+        if context is None:
+            del self.leaves[(None, path.dotted)]
+        else:
+            del self.leaves[(context.dotted, path.dotted)]
+            if len(context.keys) > 1:
+                group, member = context.dotted.split('.', 1)
+                self.__contexts[group][member].discard(path.dotted)
+        self.__tree = None
+
+    def delete_context(self, context):
+        """remove a whole context, raises KeyError"""
+        group, member = context.dotted.split('.', 1)
+        for path in self.__contexts[group].pop(member):
+            del self.leaves[(context.dotted, path)]
+        self.__tree = None
+
+    def set_root(self, key, value):
+        self.root[key] = value
+        self.__tree = None
+
+    def get_root(self, key, default=None):
+        return self.root.get(key, default)
+
+    def contexts(self, group):
+        """return the context keys of a group (eg. the vessel ids)"""
+        if group not in self.__contexts:
+            return list(self.root[group].keys())
+        return list(self.__contexts[group].keys())
+
+    def records(self):
+        """generate (context, path, record) for every leaf of every
+        context"""
+        for (context, path), leaf in list(self.leaves.items()):
+            if context is not None:
+                yield context, path, leaf.record()
+
+    @property
+    def tree(self):
+        """the nested tree, built from the leaves when first asked for
+        after a write"""
+        tree = self.__tree
+        if tree is None:
+            tree = self.__build()
+            self.__tree = tree
+        return tree
+
+    def __build(self):
+        """return a new nested tree of the root and every leaf"""
+        tree = dict(self.root)
+        for group, members in self.__contexts.items():
+            if not isinstance(tree.get(group), dict):
+                tree[group] = {}
+            else:
+                tree[group] = dict(tree[group])
+            for member in members:
+                tree[group].setdefault(member, {})
+        for (context, path), leaf in list(self.leaves.items()):
+            node = tree
+            if context is not None:
+                for key in compile_path(context).keys:
+                    child = node.get(key)
+                    if child is None:
+                        child = node[key] = {}
+                    node = child
+            path = compile_path(path)
+            for key in path.parent:
+                child = node.get(key)
+                if child is None:
+                    child = node[key] = {}
+                node = child
+            node[path.last] = leaf.record()
+        return tree
+
+def make_store(store, tree):
+    """return a store by name ("tree" or "flat") holding tree"""
+    if store == TREE:
+        return TreeStore(tree)
+    if store == FLAT:
+        return FlatStore(tree)
+    raise ValueError("unknown store: {}".format(store))
@@ -0,0 +1,145 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""signalk stream subscriptions"""
+
+from collections import OrderedDict
+
+POLICIES = ('instant', 'ideal', 'fixed')
+
+class Subscription(object):
+    """a single subscription to a signalk path
+
+    Keyword arguments:
+    path -- a signalk path, may contain `*` globs (eg. "navigation.*")
+    context -- context the path is relative to (default "vessels.self")
+    period -- update period in milliseconds (default None, server default)
+    min_period -- minimum period between updates in ms (default None)
+    policy -- one of "instant", "ideal" or "fixed" (default None)
+    format -- "delta" or "full" (default None, server default)
+    """
+
+    def __init__(self, path, context='vessels.self', period=None,
+            min_period=None, policy=None, format=None):
+        if policy is not None and policy not in POLICIES:
+            raise ValueError("unknown subscription policy: {}".format(policy))
+        self.path = path
+        self.context = context
+        self.period = period
+        self.min_period = min_period
+        self.policy = policy
+        self.format = format
+
+    def __repr__(self):
+        return "Subscription({!r}, context={!r})".format(
+            self.path, self.context
+            )
+
+    def key(self):
+        """return the (context, path) tuple identifying this subscription"""
+        return (self.context, self.path)
+
+    def as_dict(self):
+        """return the subscription as a signalk subscribe list entry"""
+        out = {'path': self.path}
+        if self.period is not None:
+            out['period'] = self.period
+        if self.min_period is not None:
+            out['minPeriod'] = self.min_period
+        if self.policy is not None:
+            out['policy'] = self.policy
+        if self.format is not None:
+            out['format'] = self.format
+        return out
+
+def subscribe_message(context, subscriptions):
+    """build a signalk subscribe message for subscriptions in context"""
+    return {
+        'context': context,
+        'subscribe': [sub.as_dict() for sub in subscriptions],
+        }
+
+def unsubscribe_message(context, paths):
+    """build a signalk unsubscribe message for paths in context"""
+    return {
+        'context': context,
+        'unsubscribe': [{'path': path} for path in paths],
+        }
+
+class Subscriptions(object):
+    """the set of active subscriptions for a connection
+
+    Keeps the subscriptions in the order they were made so they can be
+    replayed to the server whenever the stream is (re)opened.
+    """
+
+    def __init__(self, subscriptions=None):
+        self.subscriptions = OrderedDict()
+        if subscriptions is not None:
+            self.add(subscriptions)
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def __iter__(self):
+        return iter(list(self.subscriptions.values()))
+
+    def add(self, subscriptions):
+        """add subscriptions, returns the messages to send to the server
+
+        subscriptions is a list of Subscription objects or path strings
+        (which subscribe with default options in the self context).
+        """
+        by_context = OrderedDict()
+        for sub in subscriptions:
+            if not isinstance(sub, Subscription):
+                sub = Subscription(sub)
+            self.subscriptions[sub.key()] = sub
+            by_context.setdefault(sub.context, []).append(sub)
+        return [
+            subscribe_message(context, subs)
+            for context, subs in by_context.items()
+            ]
+
+    def remove(self, paths=None, context='vessels.self'):
+        """remove subscriptions, returns the messages to send to the server
+
+        with paths=None, every subscription in context is removed. a
+        context of "*" with paths=None removes everything.
+        """
+        if paths is None:
+            paths = ['*']
+            removed = [
+                key for key in self.subscriptions
+                if context == '*' or key[0] == context
+                ]
+        else:
+            removed = [(context, path) for path in paths]
+        for key in removed:
+            self.subscriptions.pop(key, None)
+        return [unsubscribe_message(context, paths)]
+
+    def messages(self):
+        """return messages that re-create every active subscription"""
+        by_context = OrderedDict()
+        for sub in self.subscriptions.values():
+            by_context.setdefault(sub.context, []).append(sub)
+        return [
+            subscribe_message(context, subs)
+            for context, subs in by_context.items()
+            ]
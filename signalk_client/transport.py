@@ -0,0 +1,256 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""delta stream transports
+
+A transport carries the delta stream of one connection. `Client` runs
+`run_forever()` on its stream thread and gets every message through the
+same callbacks whichever transport is used:
+
+    on_open(transport)
+    on_message(transport, message)  -- one json message, str or bytes
+    on_error(transport, error)
+    on_close(transport, status, reason)
+
+`close()` may be called from any other thread and makes `run_forever()`
+return.
+"""
+
+import logging
+import socket
+from urllib.parse import urlparse
+import websocket
+
+# transport names
+WEBSOCKET = 'websocket'
+TCP = 'tcp'
+TRANSPORTS = (WEBSOCKET, TCP)
+
+# tcp keepalive probes left unanswered before the peer counts as gone
+KEEPALIVE_PROBES = 3
+
+class TransportError(Exception):
+    """a stream transport failed"""
+
+def set_keepalive(sock, idle, timeout=None):
+    """turn on tcp keepalive so a silent, half-open peer is dropped
+
+    probes start after idle seconds without traffic and the connection
+    fails once KEEPALIVE_PROBES of them go unanswered for about timeout
+    (default idle) seconds. without idle, or where the options are not
+    available, the platform's defaults (usually 2 hours) apply.
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if not idle:
+        return
+    interval = max(1, int((timeout or idle) / KEEPALIVE_PROBES))
+    options = (
+        # TCP_KEEPALIVE is the idle time on macOS
+        (getattr(socket, 'TCP_KEEPIDLE', getattr(socket, 'TCP_KEEPALIVE',
+            None)), max(1, int(idle))),
+        (getattr(socket, 'TCP_KEEPINTVL', None), interval),
+        (getattr(socket, 'TCP_KEEPCNT', None), KEEPALIVE_PROBES),
+        )
+    for option, value in options:
+        if option is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, option, value)
+
+class Transport(object):
+    """base class of the stream transports
+
+    Keyword arguments:
+    url -- stream url
+    on_open, on_message, on_error, on_close -- callbacks (default None)
+
+    `bytes_received` counts bytes read from the socket and `messages` the
+    messages delivered.
+    """
+
+    name = None
+
+    def __init__(self, url, on_open=None, on_message=None, on_error=None,
+            on_close=None):
+        self.url = url
+        self.on_open = on_open
+        self.on_message = on_message
+        self.on_error = on_error
+        self.on_close = on_close
+        self.bytes_received = 0
+        self.messages = 0
+
+    def _callback(self, callback, *args):
+        """run a callback, reporting its exceptions to on_error"""
+        if callback is None:
+            return
+        try:
+            callback(self, *args)
+        except Exception as error:
+            logging.error("error from callback {}: {}".format(
+                callback, error
+                ))
+            if callback is not self.on_error and self.on_error is not None:
+                self.on_error(self, error)
+
+    def run_forever(self, ping_interval=0, ping_timeout=None):
+        """connect and dispatch messages until the stream closes"""
+        raise NotImplementedError
+
+    def send(self, data):
+        """send a text message, raises TransportError when not open"""
+        raise NotImplementedError
+
+    def close(self):
+        """close the stream, safe to call from any thread"""
+        raise NotImplementedError
+
+class WebSocketTransport(Transport):
+    """websocket stream (signalk-ws) using websocket-client"""
+
+    name = WEBSOCKET
+
+    def __init__(self, url, on_open=None, on_message=None, on_error=None,
+            on_close=None):
+        super(WebSocketTransport, self).__init__(
+            url, on_open, on_message, on_error, on_close
+            )
+        self.app = websocket.WebSocketApp(
+            url,
+            on_open=lambda app: self._callback(self.on_open),
+            on_message=self.__on_message,
+            on_error=lambda app, error: self._callback(self.on_error, error),
+            on_close=lambda app, *args: self._callback(self.on_close, *args),
+            )
+
+    def __on_message(self, app, message):
+        self.bytes_received += len(message)
+        self.messages += 1
+        self._callback(self.on_message, message)
+
+    def run_forever(self, ping_interval=0, ping_timeout=None):
+        self.app.run_forever(
+            ping_interval=ping_interval, ping_timeout=ping_timeout
+            )
+
+    def send(self, data):
+        try:
+            self.app.send(data)
+        except websocket.WebSocketException as error:
+            raise TransportError(str(error))
+
+    def close(self):
+        self.app.keep_running = False
+        sock = self.app.sock
+        if sock is not None and sock.connected:
+            # send the close frame and shut the socket down, but leave the
+            # closing handshake to the stream thread, which is woken up by
+            # the shutdown (closing the socket under it is not noticed)
+            try:
+                sock.send_close()
+            except websocket.WebSocketException:
+                pass
+            sock.abort()
+
+class TCPTransport(Transport):
+    """newline delimited json over a plain tcp socket (signalk-tcp)
+
+    there is no framing or masking to undo, each line is one message.
+    Depending on the server the stream starts without subscriptions or
+    subscribed to everything.
+    """
+
+    name = TCP
+
+    def __init__(self, url, on_open=None, on_message=None, on_error=None,
+            on_close=None):
+        super(TCPTransport, self).__init__(
+            url, on_open, on_message, on_error, on_close
+            )
+        self.sock = None
+        self.keep_running = False
+
+    def run_forever(self, ping_interval=0, ping_timeout=None):
+        """connect and dispatch lines until the stream closes
+
+        the tcp stream has no pings; an idle connection is checked with tcp
+        keepalive instead, probing after ping_interval seconds of silence
+        and giving up after about ping_timeout more.
+        """
+        self.keep_running = True
+        url = urlparse(self.url)
+        try:
+            sock = socket.create_connection(
+                (url.hostname, url.port), ping_timeout or None
+                )
+            set_keepalive(sock, ping_interval, ping_timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as error:
+            self.keep_running = False
+            self._callback(self.on_error, error)
+            self._callback(self.on_close, None, None)
+            return
+        self.sock = sock
+        if not self.keep_running:
+            # closed during connect
+            sock.close()
+            self.sock = None
+            self._callback(self.on_close, None, None)
+            return
+        self._callback(self.on_open)
+
+        sock.settimeout(ping_interval or None)
+        pending = b''
+        try:
+            while self.keep_running:
+                try:
+                    chunk = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    break
+                self.bytes_received += len(chunk)
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                for line in lines:
+                    if line.strip():
+                        self.messages += 1
+                        self._callback(self.on_message, line)
+        except OSError as error:
+            if self.keep_running:
+                self._callback(self.on_error, error)
+        finally:
+            self.keep_running = False
+            self.sock = None
+            sock.close()
+            self._callback(self.on_close, None, None)
+
+    def send(self, data):
+        sock = self.sock
+        if sock is None:
+            raise TransportError("not connected")
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        sock.sendall(data + b'\n')
+
+    def close(self):
+        self.keep_running = False
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
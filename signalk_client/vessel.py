@@ -127,9 +127,23 @@ class Vessel(object):
         this returns a raw object (or whatever data exists) for the provided
         signalk property path.
         """
-        return self.data.get_by_map_list(
-            self.key.split('.') + path.split('.')
-            )
+        return self.data.get_by_path(path, self.key)
+
+    def get_history(self, path):
+        """get the kept history of vessel's property
+
+        returns a `signalk_client.history.RingBuffer`, or None unless
+        `Data.keep_history()` covers the path.
+        """
+        return self.data.get_history(path, self.key)
+
+    def get_aggregate(self, path):
+        """get the windowed statistics of vessel's property
+
+        returns a `signalk_client.aggregates.Aggregate`, or None unless
+        `Data.aggregate()` covers the path.
+        """
+        return self.data.get_aggregate(path, self.key)
 
     def get_datum(self, path):
         """get a Datum object for vessel's property
@@ -0,0 +1,396 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+#
+#   python-signalk-client is a python client library for SignalK
+#   Copyright (C) 2016-2018  Philip J Freeman <elektron@halo.nu>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""websocket stream with permessage-deflate compression
+
+websocket-client does not implement websocket extensions, so compressed
+streams are read with this small RFC 6455 client instead. It has the same
+callback interface as the other `signalk_client.transport` transports.
+"""
+
+import base64
+import hashlib
+import os
+import socket
+import ssl
+import struct
+import threading
+import time
+import zlib
+from urllib.parse import urlparse
+from signalk_client.transport import WEBSOCKET, Transport, TransportError
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xa
+
+# appended to each compressed message before inflating it (RFC 7692 7.2.2)
+DEFLATE_TAIL = b'\x00\x00\xff\xff'
+
+class WebSocketStreamError(TransportError):
+    """websocket protocol or handshake error"""
+
+class PerMessageDeflate(object):
+    """permessage-deflate (RFC 7692) settings and decompression state
+
+    Keyword arguments:
+    window_bits -- largest LZ77 window (8-15) the server may compress
+        with, smaller windows use less memory on both ends at some cost
+        in compression ratio (default None, the server's choice)
+    context_takeover -- let the server compress each message using the
+        ones before it, which compresses repetitive deltas much better but
+        keeps a window in memory for the whole connection (default True)
+
+    `wire_bytes` counts compressed payload bytes received,
+    `payload_bytes` the same messages once inflated and `inflate_time` the
+    seconds spent inflating them.
+    """
+
+    def __init__(self, window_bits=None, context_takeover=True):
+        if window_bits is not None and not 8 <= window_bits <= 15:
+            raise ValueError("window_bits must be 8 to 15")
+        self.window_bits = window_bits
+        self.context_takeover = context_takeover
+        self.wire_bytes = 0
+        self.payload_bytes = 0
+        self.inflate_time = 0.0
+
+        self.enabled = False
+        self.server_window_bits = 15
+        self.server_context_takeover = True
+        self.__decompressor = None
+
+    def offer(self):
+        """return the Sec-WebSocket-Extensions offer"""
+        params = ['permessage-deflate', 'client_max_window_bits']
+        if self.window_bits is not None:
+            params.append('server_max_window_bits={}'.format(
+                self.window_bits
+                ))
+        if not self.context_takeover:
+            params.append('server_no_context_takeover')
+        return '; '.join(params)
+
+    def accept(self, header):
+        """configure from the server's Sec-WebSocket-Extensions response"""
+        self.enabled = False
+        if not header:
+            return
+        for extension in header.split(','):
+            params = [p.strip() for p in extension.split(';')]
+            if params[0] != 'permessage-deflate':
+                continue
+            self.enabled = True
+            self.server_window_bits = 15
+            self.server_context_takeover = True
+            for param in params[1:]:
+                name, _, value = param.partition('=')
+                if name == 'server_max_window_bits':
+                    self.server_window_bits = int(value.strip('"'))
+                elif name == 'server_no_context_takeover':
+                    self.server_context_takeover = False
+            break
+        self.__decompressor = None
+
+    def decompress(self, payload):
+        """inflate a compressed message"""
+        start = time.perf_counter()
+        if self.__decompressor is None or not self.server_context_takeover:
+            self.__decompressor = zlib.decompressobj(
+                -self.server_window_bits
+                )
+        message = self.__decompressor.decompress(payload + DEFLATE_TAIL)
+        self.wire_bytes += len(payload)
+        self.payload_bytes += len(message)
+        self.inflate_time += time.perf_counter() - start
+        return message
+
+    def ratio(self):
+        """return payload bytes per wire byte so far (None before data)"""
+        if not self.wire_bytes:
+            return None
+        return self.payload_bytes / float(self.wire_bytes)
+
+class WebSocketStream(Transport):
+    """websocket transport for a receive-mostly stream
+
+    Keyword arguments:
+    url -- ws:// or wss:// url
+    on_open, on_message, on_error, on_close -- transport callbacks
+    deflate -- a PerMessageDeflate to offer (default None, uncompressed)
+
+    `bytes_received` counts every byte read from the socket and
+    `payload_bytes` the (inflated) message bytes delivered.
+    """
+
+    name = WEBSOCKET
+
+    def __init__(self, url, on_open=None, on_message=None, on_error=None,
+            on_close=None, deflate=None):
+        super(WebSocketStream, self).__init__(
+            url, on_open, on_message, on_error, on_close
+            )
+        self.deflate = deflate
+
+        self.keep_running = False
+        self.sock = None
+        self.connected = False
+        self.payload_bytes = 0
+
+        self.__buffer = bytearray()
+        self.__send_lock = threading.Lock()
+        self.__close_sent = False
+
+    def __connect(self, timeout):
+        """open the socket and do the opening handshake"""
+        url = urlparse(self.url)
+        secure = url.scheme == 'wss'
+        port = url.port or (443 if secure else 80)
+        sock = socket.create_connection((url.hostname, port), timeout)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(
+                sock, server_hostname=url.hostname
+                )
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        resource = url.path or '/'
+        if url.query:
+            resource += '?' + url.query
+        request = [
+            'GET {} HTTP/1.1'.format(resource),
+            'Host: {}'.format(url.netloc),
+            'Upgrade: websocket',
+            'Connection: Upgrade',
+            'Sec-WebSocket-Key: {}'.format(key),
+            'Sec-WebSocket-Version: 13',
+            ]
+        if self.deflate is not None:
+            request.append('Sec-WebSocket-Extensions: {}'.format(
+                self.deflate.offer()
+                ))
+        sock.sendall(('\r\n'.join(request) + '\r\n\r\n').encode('ascii'))
+
+        response = bytearray()
+        while b'\r\n\r\n' not in response:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise WebSocketStreamError("connection closed in handshake")
+            response += chunk
+        head, _, rest = bytes(response).partition(b'\r\n\r\n')
+        lines = head.decode('iso-8859-1').split('\r\n')
+        if len(lines[0].split()) < 2 or lines[0].split()[1] != '101':
+            raise WebSocketStreamError("handshake failed: {}".format(
+                lines[0]
+                ))
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1(
+            (key + WS_GUID).encode('ascii')
+            ).digest()).decode('ascii')
+        if headers.get('sec-websocket-accept') != accept:
+            raise WebSocketStreamError("bad Sec-WebSocket-Accept")
+        if self.deflate is not None:
+            self.deflate.accept(headers.get('sec-websocket-extensions'))
+
+        self.__buffer = bytearray(rest)
+        self.bytes_received += len(response)
+        self.sock = sock
+        self.connected = True
+        self.__close_sent = False
+
+    def __parse_frame(self):
+        """take a complete frame off the buffer, or return None"""
+        buf = self.__buffer
+        if len(buf) < 2:
+            return None
+        fin = buf[0] & 0x80
+        rsv1 = buf[0] & 0x40
+        opcode = buf[0] & 0x0f
+        masked = buf[1] & 0x80
+        length = buf[1] & 0x7f
+        offset = 2
+        if length == 126:
+            if len(buf) < 4:
+                return None
+            length = struct.unpack_from('!H', buf, 2)[0]
+            offset = 4
+        elif length == 127:
+            if len(buf) < 10:
+                return None
+            length = struct.unpack_from('!Q', buf, 2)[0]
+            offset = 10
+        if masked:
+            offset += 4
+        if len(buf) < offset + length:
+            return None
+        payload = bytes(buf[offset:offset+length])
+        if masked:
+            mask = buf[offset-4:offset]
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        del buf[:offset+length]
+        return fin, rsv1, opcode, payload
+
+    def __next_frame(self):
+        """return the next frame, reading from the socket as needed"""
+        while True:
+            frame = self.__parse_frame()
+            if frame is not None:
+                return frame
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise WebSocketStreamError("connection closed")
+            self.bytes_received += len(chunk)
+            self.__buffer += chunk
+
+    def __send_frame(self, opcode, payload):
+        """send a masked frame"""
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, 0x80 | length)
+        elif length < 2**16:
+            header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        with self.__send_lock:
+            if self.sock is None:
+                raise WebSocketStreamError("not connected")
+            self.sock.sendall(header + mask + masked)
+
+    def send(self, data, opcode=OPCODE_TEXT):
+        """send a text message"""
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        self.__send_frame(opcode, data)
+
+    def __deliver(self, fragments, compressed):
+        """pass a complete message to on_message"""
+        data = b''.join(fragments)
+        if compressed:
+            data = self.deflate.decompress(data)
+        self.payload_bytes += len(data)
+        self.messages += 1
+        self._callback(self.on_message, data.decode('utf-8'))
+
+    def run_forever(self, ping_interval=0, ping_timeout=None):
+        """connect and dispatch messages until the stream closes
+
+        a ping is sent after ping_interval seconds without traffic; the
+        stream fails if nothing arrives within ping_timeout after that.
+        """
+        self.keep_running = True
+        status = None
+        reason = None
+        try:
+            self.__connect(ping_timeout or ping_interval or None)
+        except (OSError, WebSocketStreamError) as error:
+            self.keep_running = False
+            self._callback(self.on_error, error)
+            self._callback(self.on_close, None, None)
+            return
+        self._callback(self.on_open)
+
+        self.sock.settimeout(ping_interval or None)
+        ping_sent = None
+        fragments = []
+        compressed = False
+        try:
+            while self.keep_running:
+                try:
+                    fin, rsv1, opcode, payload = self.__next_frame()
+                except socket.timeout:
+                    if ping_sent is not None:
+                        if time.monotonic() - ping_sent >= (ping_timeout or 0):
+                            raise WebSocketStreamError("ping timed out")
+                        continue
+                    self.__send_frame(OPCODE_PING, b'')
+                    ping_sent = time.monotonic()
+                    if ping_timeout:
+                        self.sock.settimeout(ping_timeout)
+                    continue
+                if ping_sent is not None:
+                    ping_sent = None
+                    self.sock.settimeout(ping_interval or None)
+
+                if opcode in (OPCODE_TEXT, OPCODE_BINARY):
+                    fragments = [payload]
+                    compressed = bool(rsv1)
+                    if compressed and (self.deflate is None
+                            or not self.deflate.enabled):
+                        raise WebSocketStreamError(
+                            "compressed frame without permessage-deflate"
+                            )
+                    if fin:
+                        self.__deliver(fragments, compressed)
+                elif opcode == OPCODE_CONTINUATION:
+                    fragments.append(payload)
+                    if fin:
+                        self.__deliver(fragments, compressed)
+                elif opcode == OPCODE_CLOSE:
+                    if len(payload) >= 2:
+                        status = struct.unpack('!H', payload[:2])[0]
+                        reason = payload[2:].decode('utf-8', 'replace')
+                    self.__send_close(payload[:2])
+                    break
+                elif opcode == OPCODE_PING:
+                    self.__send_frame(OPCODE_PONG, payload)
+        except (OSError, WebSocketStreamError, zlib.error) as error:
+            if self.keep_running:
+                self._callback(self.on_error, error)
+        finally:
+            self.keep_running = False
+            self.connected = False
+            sock, self.sock = self.sock, None
+            if sock is not None:
+                sock.close()
+            self._callback(self.on_close, status, reason)
+
+    def __send_close(self, payload=b''):
+        """send a close frame once"""
+        if self.__close_sent:
+            return
+        self.__close_sent = True
+        try:
+            self.__send_frame(OPCODE_CLOSE, payload or struct.pack('!H', 1000))
+        except (OSError, WebSocketStreamError):
+            pass
+
+    def close(self):
+        """close the stream, safe to call from any thread
+
+        the close frame is sent and the socket shut down, which wakes up
+        run_forever.
+        """
+        self.keep_running = False
+        sock = self.sock
+        if sock is None:
+            return
+        self.__send_close()
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
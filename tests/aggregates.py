@@ -0,0 +1,97 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import math
+import random
+import statistics
+import time
+import unittest
+import signalk_client.aggregates as aggregates
+import signalk_client.data as data
+from signalk_client.history import parse_timestamp
+
+class TestAggregate(unittest.TestCase):
+
+    def test_sliding_window_matches_rescan(self):
+        rand = random.Random(1)
+        aggregate = aggregates.Aggregate(10.0)
+        samples = []
+        for second in range(200):
+            value = rand.uniform(-5, 5)
+            samples.append((second * 0.5, value))
+            aggregate.add(second * 0.5, value)
+            window = [v for t, v in samples if t > second * 0.5 - 10.0]
+            stats = aggregate.stats(now=second * 0.5)
+            self.assertEqual(stats['count'], len(window))
+            self.assertEqual(stats['min'], min(window))
+            self.assertEqual(stats['max'], max(window))
+            self.assertAlmostEqual(stats['mean'], statistics.fmean(window))
+            self.assertAlmostEqual(stats['variance'],
+                statistics.pvariance(window))
+
+    def test_tumbling_window(self):
+        aggregate = aggregates.Aggregate(10.0, aggregates.TUMBLING)
+        for second, value in ((1, 1.0), (5, 3.0), (12, 7.0)):
+            aggregate.add(second, value)
+        self.assertEqual(aggregate.previous['count'], 2)
+        self.assertEqual(aggregate.previous['mean'], 2.0)
+        self.assertEqual(aggregate.stats(now=12)['max'], 7.0)
+
+    def test_windows_empty_without_new_samples(self):
+        sliding = aggregates.Aggregate(10.0)
+        tumbling = aggregates.Aggregate(10.0, aggregates.TUMBLING)
+        for aggregate in (sliding, tumbling):
+            aggregate.add(1, 2.0)
+            aggregate.add(5, 4.0)
+        self.assertEqual(sliding.stats(now=8)['count'], 2)
+        self.assertEqual(sliding.stats(now=13)['min'], 4.0)
+        stats = sliding.stats(now=20)
+        self.assertEqual((stats['count'], stats['mean'], stats['max']),
+            (0, None, None))
+
+        self.assertEqual(tumbling.stats(now=15)['count'], 0)
+        self.assertEqual(tumbling.previous['mean'], 3.0)
+        self.assertEqual(tumbling.stats(now=35)['count'], 0)
+        self.assertEqual(tumbling.previous['count'], 0)
+        # a late sample counts in the current window
+        tumbling.add(9, 1.0)
+        self.assertEqual(tumbling.stats(now=35)['count'], 1)
+
+    def test_stats_default_to_the_current_time(self):
+        aggregate = aggregates.Aggregate(60.0)
+        aggregate.add(time.time() - 120, 1.0)
+        aggregate.add(time.time(), 2.0)
+        self.assertEqual(aggregate.stats()['count'], 1)
+
+    def test_circular_mean(self):
+        aggregate = aggregates.Aggregate(60.0, angular=True)
+        for degrees in (350, 10, 20, 340):
+            aggregate.add(0, math.radians(degrees))
+        stats = aggregate.stats(now=0)
+        self.assertAlmostEqual(math.cos(stats['mean']), 1.0)
+        self.assertLess(stats['variance'], 0.1)
+        self.assertIsNone(stats['min'])
+
+    def test_unknown_window_kind(self):
+        with self.assertRaises(ValueError):
+            aggregates.Aggregate(1.0, 'hopping')
+
+class TestDataAggregate(unittest.TestCase):
+
+    def test_data_aggregate(self):
+        store = data.Data({'vessels': {}})
+        store.aggregate('vessels.a.navigation', window=5.0)
+        for second, value in enumerate((6.0, 6.2, 6.3)):
+            store.process_delta({'context': 'vessels.a', 'updates': [{
+                'timestamp': '2018-01-01T00:00:{:02d}Z'.format(second),
+                'values': [
+                    {'path': 'navigation.speedOverGround', 'value': value},
+                    {'path': 'navigation.headingTrue',
+                        'value': math.radians(358 + 2 * second) % (2 * math.pi)},
+                    ]}]})
+        now = parse_timestamp('2018-01-01T00:00:02Z')
+        speed = store.get_aggregate('navigation.speedOverGround', 'vessels.a')
+        self.assertAlmostEqual(speed.stats(now)['mean'], 6.166666666)
+        heading = store.get_aggregate('navigation.headingTrue', 'vessels.a')
+        self.assertTrue(heading.angular)
+        self.assertAlmostEqual(math.cos(heading.stats(now)['mean']), 1.0)
+        self.assertIsNone(store.get_aggregate('navigation.log', 'vessels.a'))
@@ -0,0 +1,159 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import asyncio
+import unittest
+import signalk_client.standin as standin
+try:
+    import aiohttp
+    import signalk_client.async_client as async_client
+except ImportError:
+    aiohttp = None
+
+@unittest.skipUnless(aiohttp, "aiohttp is not installed")
+class TestAsyncClient(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = standin.StandInServer(sensors=3, vessels=2)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def test_async_client_deltas(self):
+        async with async_client.AsyncClient(self.server.address) as c:
+            self.assertEqual(len(c.data.get_vessels()), 3)
+            self.server.publish({'context': standin.SELF, 'updates': [
+                {'values': [
+                    {'path': 'navigation.speedOverGround', 'value': 3.5}
+                    ]}
+                ]})
+            async for delta in c.deltas():
+                break
+            self.assertEqual(c.data.get_self().get_prop(
+                'navigation.speedOverGround')['value'], 3.5)
+            self.assertEqual(c.received, 2)
+
+    async def test_async_client_expires_quiet_vessels(self):
+        from signalk_client.expiry import TTL
+        async with async_client.AsyncClient(self.server.address,
+                ttls=[TTL(0.2)]) as c:
+            self.server.publish({'context': standin.SELF, 'updates': [
+                {'values': [
+                    {'path': 'navigation.speedOverGround', 'value': 1.5}
+                    ]}
+                ]})
+            async for delta in c.deltas():
+                break
+            self.assertEqual(len(c.data.get_vessels()), 3)
+            # nothing arrives: the receive timeout runs the expiry
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(c.deltas().__anext__(), 1.5)
+            self.assertEqual(len(c.data.get_vessels()), 1)
+            self.server.publish({'context': standin.SELF, 'updates': [
+                {'values': [
+                    {'path': 'navigation.speedOverGround', 'value': 2.5}
+                    ]}
+                ]})
+            async for delta in c.deltas():
+                break
+            self.assertEqual(c.data.get_self().get_prop(
+                'navigation.speedOverGround')['value'], 2.5)
+
+    async def test_async_client_stores_held_values_when_quiet(self):
+        from signalk_client.ratelimit import RateLimit
+        async with async_client.AsyncClient(self.server.address,
+                rate_limits=[RateLimit('navigation.speedOverGround',
+                    interval=0.3)]) as c:
+            for value in (1.5, 2.5):
+                self.server.publish({'context': standin.SELF, 'updates': [
+                    {'values': [
+                        {'path': 'navigation.speedOverGround',
+                            'value': value}
+                        ]}
+                    ]})
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.drain(c), 1.5)
+            self.assertEqual(c.data.get_self().get_prop(
+                'navigation.speedOverGround')['value'], 2.5)
+
+    async def drain(self, c):
+        async for delta in c.deltas():
+            pass
+
+    async def test_async_client_snapshot_wins_over_older_deltas(self):
+        import time
+        def speed_delta(value, timestamp):
+            return {'context': standin.SELF, 'updates': [
+                {'timestamp': timestamp, 'values': [
+                    {'path': 'navigation.speedOverGround', 'value': value}
+                    ]}
+                ]}
+        self.server.publish(speed_delta(5.0, '2018-01-01T00:00:02.000Z'))
+        subtree = self.server.subtree
+
+        def slow_subtree(keys):
+            # a delta older than the snapshot arrives while it downloads
+            snapshot = subtree(keys)
+            deadline = time.time() + 5
+            while self.server.connection_count() == 0 \
+                    and time.time() < deadline:
+                time.sleep(0.01)
+            self.server.publish(speed_delta(1.0,
+                '2018-01-01T00:00:01.000Z'))
+            time.sleep(0.2)
+            return snapshot
+        self.server.subtree = slow_subtree
+        async with async_client.AsyncClient(self.server.address) as c:
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.drain(c), 0.5)
+            self.assertEqual(c.data.get_self().get_prop(
+                'navigation.speedOverGround')['value'], 5.0)
+
+    async def test_async_client_failed_connect_closes_stream(self):
+        def missing(keys):
+            raise KeyError(keys)
+        self.server.subtree = missing
+        c = async_client.AsyncClient(self.server.address)
+        with self.assertRaises(aiohttp.ClientResponseError):
+            await c.connect()
+        self.assertEqual(c.state, async_client.CLOSED)
+        self.assertIsNone(c._session)
+        self.assertTrue(c._ws.closed)
+        for attempt in range(100):
+            if self.server.connection_count() == 0:
+                break
+            await asyncio.sleep(0.05)
+        self.assertEqual(self.server.connection_count(), 0)
+
+    async def test_async_client_skips_undecodable_frames(self):
+        import json
+
+        def decoder(message):
+            delta = json.loads(message)
+            if 'bad' in json.dumps(delta.get('updates')):
+                raise ValueError("bad frame")
+            return delta
+        async with async_client.AsyncClient(self.server.address,
+                decoder=decoder) as c:
+            for path, value in (('bad', 1.0),
+                    ('navigation.speedOverGround', 4.25)):
+                self.server.publish({'context': standin.SELF, 'updates': [
+                    {'values': [{'path': path, 'value': value}]}
+                    ]})
+            async for delta in c.deltas():
+                break
+            self.assertEqual(c.data.get_self().get_prop(
+                'navigation.speedOverGround')['value'], 4.25)
+
+    async def test_async_client_compression(self):
+        async with async_client.AsyncClient(self.server.address,
+                compression=True) as c:
+            self.server.publish({'context': standin.SELF, 'updates': [
+                {'values': [
+                    {'path': 'navigation.speedOverGround', 'value': 2.5}
+                    ]}
+                ]})
+            async for delta in c.deltas():
+                break
+            self.assertEqual(c.data.get_self().get_prop(
+                'navigation.speedOverGround')['value'], 2.5)
@@ -0,0 +1,24 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import unittest
+import signalk_client.backoff as backoff
+
+class TestBackoff(unittest.TestCase):
+
+    def test_backoff_grows_to_maximum(self):
+        delays = backoff.Backoff(initial=1.0, maximum=8.0, jitter=0.0)
+        self.assertEqual([delays.next() for i in range(6)],
+            [1.0, 2.0, 4.0, 8.0, 8.0, 8.0])
+
+    def test_backoff_jitter_stays_in_range(self):
+        delays = backoff.Backoff(initial=1.0, jitter=0.5)
+        for i in range(20):
+            delays.reset()
+            self.assertTrue(0.5 <= delays.next() <= 1.0)
+
+    def test_backoff_reset(self):
+        delays = backoff.Backoff(initial=1.0, jitter=0.0)
+        delays.next()
+        delays.next()
+        delays.reset()
+        self.assertEqual(delays.next(), 1.0)
@@ -0,0 +1,92 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import signalk_client.data as data
+import signalk_client.paths as paths
+from signalk_client.changes import ChangeDispatcher, ChangeListener
+
+def delta(context, path, value, timestamp="2018-01-01T00:00:00Z"):
+    return {'context': context, 'updates': [{'timestamp': timestamp,
+        'values': [{'path': path, 'value': value}]}]}
+
+class TestChangeDispatcher(unittest.TestCase):
+
+    def listeners(self, dispatcher, context, path):
+        return sorted(listener.pattern for listener in
+            dispatcher.match(context, paths.compile_path(path)))
+
+    def test_change_dispatcher_prefix_and_globs(self):
+        dispatcher = ChangeDispatcher()
+        for pattern in ('vessels.a.navigation', 'vessels.*.navigation.log',
+                'vessels.a.environment', 'vessels.a.navigation.pos*', ''):
+            dispatcher.add(ChangeListener(pattern, None))
+        self.assertEqual(
+            self.listeners(dispatcher, 'vessels.a', 'navigation.position'),
+            ['', 'vessels.a.navigation', 'vessels.a.navigation.pos*'])
+        self.assertEqual(
+            self.listeners(dispatcher, 'vessels.b', 'navigation.log'),
+            ['', 'vessels.*.navigation.log'])
+        self.assertEqual(
+            self.listeners(dispatcher, None, 'navigation.log'), [''])
+
+    def test_change_dispatcher_remove(self):
+        dispatcher = ChangeDispatcher()
+        listener = ChangeListener('vessels.*.navigation', None)
+        dispatcher.add(listener)
+        self.assertEqual(
+            len(dispatcher.match('vessels.a',
+                paths.compile_path('navigation.log'))), 1)
+        self.assertTrue(dispatcher.remove(listener))
+        self.assertFalse(dispatcher.remove(listener))
+        self.assertEqual(
+            dispatcher.match('vessels.a', paths.compile_path('navigation.log')),
+            ())
+
+class TestDataOnChange(unittest.TestCase):
+
+    def setUp(self):
+        self.data = data.Data({'vessels': {}})
+        self.data.process_delta({'self': 'vessels.a', 'version': "1.0.0",
+            'timestamp': "2018-01-01T00:00:00Z"})
+
+    def test_data_on_change_self(self):
+        changes = []
+        self.data.on_change('vessels.self.navigation',
+            lambda *args: changes.append(args[:3]))
+        self.data.process_delta(delta('vessels.a', 'navigation.log', 10))
+        self.data.process_delta(delta('vessels.b', 'navigation.log', 20))
+        self.data.process_delta(delta('vessels.a', 'environment.depth', 3))
+        self.assertEqual(changes, [('vessels.a', 'navigation.log', 10)])
+
+    def test_data_on_change_process_values(self):
+        changes = []
+        listener = self.data.on_change('vessels.*.navigation.log',
+            lambda *args: changes.append(args))
+        self.data.process_values([('vessels.b', 'navigation.log', 20,
+            "2018-01-01T00:00:00Z", ('gps', None))])
+        self.assertEqual(changes, [('vessels.b', 'navigation.log', 20,
+            {'$source': 'gps', 'timestamp': "2018-01-01T00:00:00Z"})])
+        self.assertTrue(self.data.remove_on_change(listener))
+        self.data.process_delta(delta('vessels.b', 'navigation.log', 21))
+        self.assertEqual(len(changes), 1)
+
+    def test_data_on_change_callback_errors_are_contained(self):
+        def fail(*args):
+            raise ValueError("boom")
+        listener = self.data.on_change('', fail)
+        with self.assertLogs(level='ERROR'):
+            self.data.process_delta(delta('vessels.a', 'navigation.log', 10))
+        self.assertEqual(listener.errors, 1)
+        self.assertEqual(
+            self.data.get_by_path('navigation.log', 'vessels.a')['value'], 10)
+
+    def test_data_on_change_executor(self):
+        changes = []
+        with ThreadPoolExecutor(1) as executor:
+            self.data.on_change('vessels.a', lambda *args: changes.append(
+                args[2]), executor=executor)
+            for value in range(5):
+                self.data.process_delta(
+                    delta('vessels.a', 'navigation.log', value))
+        self.assertEqual(changes, [0, 1, 2, 3, 4])
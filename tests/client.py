@@ -0,0 +1,290 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import socket
+import time
+import unittest
+import signalk_client.client as client
+import signalk_client.standin as standin
+from tests.decode_pool import START_METHOD
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def make_delta(path, value):
+    return {'context': standin.SELF, 'updates': [
+        {'values': [{'path': path, 'value': value}]}
+        ]}
+
+class TestClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = standin.StandInServer(sensors=3, vessels=2)
+        self.server.start()
+        self.clients = []
+
+    def tearDown(self):
+        for c in self.clients:
+            c.close()
+        self.server.stop()
+
+    def connect(self, **kwargs):
+        c = client.Client(self.server.address, timeout=5, **kwargs)
+        self.clients.append(c)
+        return c
+
+    def prop(self, c, path):
+        try:
+            return c.data.get_self().get_prop(path)['value']
+        except KeyError:
+            return None
+
+    def speed(self, c):
+        return self.prop(c, 'navigation.speedOverGround')
+
+    def test_client_connect_loads_snapshot(self):
+        c = self.connect()
+        self.assertEqual(c.state, client.CONNECTED)
+        self.assertEqual(len(c.data.get_vessels()), 3)
+
+    def test_client_applies_deltas(self):
+        c = self.connect()
+        self.server.publish(make_delta('navigation.speedOverGround', 4.5))
+        self.assertTrue(wait_for(lambda: self.speed(c) == 4.5))
+
+    def test_client_subscriptions(self):
+        c = self.connect(subscriptions=['environment.*'])
+
+        def published(value):
+            self.server.publish(make_delta('environment.depth.belowKeel',
+                value))
+            return self.prop(c, 'environment.depth.belowKeel') == value
+
+        # the subscription is sent once the stream is open
+        self.assertTrue(wait_for(lambda: published(1.0)))
+        self.server.publish(make_delta('navigation.speedOverGround', 7.0))
+        self.assertTrue(wait_for(lambda: published(2.0)))
+        self.assertNotEqual(self.speed(c), 7.0)
+
+    def test_client_fetch_revalidates(self):
+        c = self.connect()
+        self.assertIn('speedOverGround', c.fetch('vessels.self.navigation'))
+        self.assertIsNone(c.fetch('vessels.self.navigation'))
+
+    def test_client_connect_timeout(self):
+        # a server that never says hello
+        self.server.hello = lambda: {'name': 'signalk-standin'}
+        c = client.Client(self.server.address, autoconnect=False,
+            subscriptions=[])
+        with self.assertRaises(TimeoutError):
+            c.connect(timeout=0.1)
+        self.assertTrue(wait_for(lambda: c.state == client.CLOSED))
+
+        # the closed client connects again once the server says hello
+        del self.server.hello
+        self.clients.append(c)
+        c.connect(timeout=5)
+        self.assertEqual(c.state, client.CONNECTED)
+        self.assertEqual(len(c.data.get_vessels()), 3)
+
+    def test_client_reconnects_and_resyncs(self):
+        c = self.connect(backoff=client.Backoff(initial=0.05, jitter=0.0))
+        self.assertEqual(len(c.data.get_vessels()), 3)
+        port = self.server.port
+        self.server.stop()
+        self.assertTrue(wait_for(lambda: c.state == client.DISCONNECTED))
+        self.assertEqual(c.disconnects, 1)
+
+        # the restarted server knows more vessels
+        self.server = standin.StandInServer(port=port, sensors=3, vessels=4)
+        self.server.start()
+        self.assertTrue(wait_for(lambda: c.state == client.CONNECTED))
+        self.assertEqual(c.reconnects, 1)
+        self.assertTrue(wait_for(lambda: len(c.data.get_vessels()) == 5))
+        self.server.publish(make_delta('navigation.speedOverGround', 2.75))
+        self.assertTrue(wait_for(lambda: self.speed(c) == 2.75))
+
+    def test_client_unsubscribe_keeps_streaming_all(self):
+        c = self.connect(backoff=client.Backoff(initial=0.05, jitter=0.0))
+        c.unsubscribe('environment.depth.belowKeel')
+        port = self.server.port
+        self.server.stop()
+        self.assertTrue(wait_for(lambda: c.state == client.DISCONNECTED))
+        self.server = standin.StandInServer(port=port, sensors=3, vessels=2)
+        self.server.start()
+        self.assertTrue(wait_for(lambda: c.state == client.CONNECTED))
+        self.server.publish(make_delta('navigation.speedOverGround', 3.25))
+        self.assertTrue(wait_for(lambda: self.speed(c) == 3.25))
+
+    def test_client_receive_queue(self):
+        c = self.connect(queue_size=10)
+        self.server.publish(make_delta('navigation.speedOverGround', 1.5))
+        self.assertTrue(wait_for(lambda: self.speed(c) == 1.5))
+        self.assertTrue(c.receive_queue.stats()['applied'] >= 2)
+
+    def test_client_warm_start(self):
+        import os, tempfile
+        path = os.path.join(tempfile.mkdtemp(), 'cache')
+        c = self.connect(cache=path)
+        self.server.publish(make_delta('navigation.speedOverGround', 9.5))
+        self.assertTrue(wait_for(lambda: self.speed(c) == 9.5))
+        c.close()
+        self.assertTrue(os.path.exists(path))
+
+        warm = client.Client(self.server.address, cache=path,
+            autoconnect=False)
+        self.clients.append(warm)
+        self.assertEqual(self.speed(warm), 9.5)
+        self.server.publish(make_delta('navigation.speedOverGround', 3.0))
+        warm.connect(timeout=5)
+        self.assertTrue(wait_for(lambda: self.speed(warm) == 3.0))
+
+    def test_client_cache_interval(self):
+        import os, tempfile
+        path = os.path.join(tempfile.mkdtemp(), 'cache')
+        c = self.connect(cache=path, cache_interval=0.05)
+        self.assertTrue(wait_for(lambda: os.path.exists(path)))
+
+    def test_client_decode_workers(self):
+        c = self.connect(decode_workers=1, decode_start_method=START_METHOD)
+        self.server.publish(make_delta('navigation.speedOverGround', 8.5))
+        self.assertTrue(wait_for(lambda: self.speed(c) == 8.5))
+        self.assertTrue(c.decode_pool.stats()['frames'] >= 2)
+
+    def test_client_expires_quiet_vessels(self):
+        from signalk_client.expiry import TTL
+        c = self.connect(ttls=[TTL(0.2)], locking=True)
+        # the self vessel stays, the quiet AIS targets go
+        self.assertTrue(wait_for(lambda: len(c.data.get_vessels()) == 1))
+        with c.data.reading():
+            self.assertEqual(c.data.get_vessels()[0].key, standin.SELF)
+
+    def test_client_stores_held_values_when_quiet(self):
+        from signalk_client.ratelimit import RateLimit
+        c = self.connect(rate_limits=[
+            RateLimit('navigation.speedOverGround', interval=0.3)])
+        self.server.publish(make_delta('navigation.speedOverGround', 1.5))
+        self.server.publish(make_delta('navigation.speedOverGround', 2.5))
+        # the second value is held back, housekeeping stores it
+        self.assertTrue(wait_for(lambda: self.speed(c) == 2.5))
+
+    def test_client_failed_connect_stops_decode_workers(self):
+        import multiprocessing, socket
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        address = "127.0.0.1:{}".format(closed.getsockname()[1])
+        closed.close()
+        c = client.Client(address, decode_workers=1, autoconnect=False,
+            decode_start_method=START_METHOD)
+        with self.assertRaises(client.requests.RequestException):
+            c.connect()
+        self.assertEqual(c.state, client.CLOSED)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_client_compression(self):
+        c = self.connect(compression=True, subscriptions=['navigation.*'])
+
+        def published(value):
+            self.server.publish(make_delta('navigation.speedOverGround',
+                value))
+            return self.speed(c) == value
+
+        self.assertTrue(wait_for(lambda: published(3.25)))
+        stats = c.stream_stats()
+        self.assertTrue(stats['compressed'])
+        self.assertTrue(stats['payload_bytes'] > 0)
+        self.assertTrue(stats['wire_bytes'] > 0)
+
+    def test_client_compression_no_context_takeover(self):
+        from signalk_client.websocket_stream import PerMessageDeflate
+        deflate = PerMessageDeflate(window_bits=10, context_takeover=False)
+        c = self.connect(compression=deflate)
+        self.assertEqual(deflate.server_window_bits, 10)
+        self.assertFalse(deflate.server_context_takeover)
+        for value in (1.0, 2.0, 3.0):
+            self.server.publish(make_delta('navigation.speedOverGround',
+                value))
+        self.assertTrue(wait_for(lambda: self.speed(c) == 3.0))
+
+    def test_client_compression_refused(self):
+        self.server.compression = False
+        c = self.connect(compression=True)
+        self.server.publish(make_delta('navigation.speedOverGround', 6.0))
+        self.assertTrue(wait_for(lambda: self.speed(c) == 6.0))
+        self.assertFalse(c.stream_stats()['compressed'])
+
+class TestClientTCP(unittest.TestCase):
+
+    def setUp(self):
+        self.server = standin.StandInServer(sensors=3, tcp=True)
+        self.server.start()
+        self.clients = []
+
+    def tearDown(self):
+        for c in self.clients:
+            c.close()
+        self.server.stop()
+
+    def connect(self, **kwargs):
+        c = client.Client(self.server.address, timeout=5, **kwargs)
+        self.clients.append(c)
+        return c
+
+    def speed(self, c):
+        try:
+            return c.data.get_self().get_prop(
+                'navigation.speedOverGround')['value']
+        except KeyError:
+            return None
+
+    def published(self, c, value):
+        self.server.publish(make_delta('navigation.speedOverGround', value))
+        return self.speed(c) == value
+
+    def test_client_tcp_chosen(self):
+        c = self.connect()
+        self.assertEqual(c.w_sock.name, 'tcp')
+        self.assertTrue(wait_for(lambda: self.published(c, 5.5)))
+        self.assertTrue(c.w_sock.messages >= 2)
+
+    def test_client_tcp_subscriptions(self):
+        c = self.connect(subscriptions=['navigation.*'])
+        self.assertEqual(c.w_sock.name, 'tcp')
+        self.assertTrue(wait_for(lambda: self.published(c, 2.5)))
+
+    @unittest.skipUnless(hasattr(socket, 'TCP_KEEPIDLE'),
+        "no tcp keepalive options")
+    def test_client_tcp_keepalive(self):
+        c = self.connect()
+        self.assertTrue(wait_for(lambda: c.w_sock.sock is not None))
+        sock = c.w_sock.sock
+        self.assertTrue(sock.getsockopt(socket.SOL_SOCKET,
+            socket.SO_KEEPALIVE))
+        self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP,
+            socket.TCP_KEEPIDLE), client.PING_INTERVAL)
+        probes = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT)
+        interval = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL)
+        self.assertTrue(probes * interval <= client.PING_TIMEOUT)
+
+    def test_client_forced_websocket(self):
+        c = self.connect(transport='websocket')
+        self.assertEqual(c.w_sock.name, 'websocket')
+        self.assertTrue(wait_for(lambda: self.published(c, 1.5)))
+
+    def test_client_tcp_unreachable(self):
+        import socket
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        self.server.tcp_port = closed.getsockname()[1]
+        closed.close()
+        c = self.connect(backoff=client.Backoff(initial=0.01))
+        self.assertEqual(c.w_sock.name, 'websocket')
+        self.assertTrue(wait_for(lambda: self.published(c, 4.0)))
+
+    def test_client_unknown_transport(self):
+        with self.assertRaises(ValueError):
+            client.Client(self.server.address, transport='udp')
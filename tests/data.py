@@ -13,3 +13,161 @@ class TestDataInitialization(unittest.TestCase):
         self.assertEqual(type(self.data.data['version']), str);
         self.assertEqual('vessels' in self.data.data, True);
         self.assertEqual(type(self.data.data['vessels']), list);
+
+def make_delta(path, value, timestamp, context='vessels.self'):
+    return {'context': context, 'updates': [{
+        'timestamp': timestamp,
+        'values': [{'path': path, 'value': value}],
+        }]}
+
+class TestDataBuffering(unittest.TestCase):
+
+    def setUp(self):
+        self.data = data.Data()
+        self.data.begin_buffering()
+
+    def test_data_timestamp_key_orders_fractions(self):
+        self.assertLess(data.timestamp_key('2018-01-01T00:00:00Z'),
+            data.timestamp_key('2018-01-01T00:00:00.5Z'))
+
+    def test_data_buffered_deltas_replay_in_timestamp_order(self):
+        self.data.process_delta(
+            make_delta('navigation.speedOverGround', 2.0, '2018-01-01T00:00:02Z'))
+        self.data.process_delta(
+            make_delta('navigation.speedOverGround', 1.0, '2018-01-01T00:00:01Z'))
+        self.data.resync({'vessels': {'self': {}}})
+        self.assertEqual(self.data.get_by_map_list(
+            ['vessels', 'self', 'navigation', 'speedOverGround', 'value']), 2.0)
+
+    def test_data_buffered_deltas_do_not_override_newer_snapshot(self):
+        self.data.process_delta(
+            make_delta('navigation.speedOverGround', 1.0, '2018-01-01T00:00:01Z'))
+        self.data.resync({'vessels': {'self': {'navigation': {
+            'speedOverGround': {
+                'value': 3.0, 'timestamp': '2018-01-01T00:00:03Z'},
+            }}}})
+        self.assertEqual(self.data.get_by_map_list(
+            ['vessels', 'self', 'navigation', 'speedOverGround', 'value']), 3.0)
+
+    def test_data_end_buffering_without_replay(self):
+        self.data.process_delta(
+            make_delta('navigation.speedOverGround', 1.0, '2018-01-01T00:00:01Z'))
+        self.data.end_buffering(replay=False)
+        self.data.resync({'vessels': {'self': {}}})
+        self.assertEqual(self.data.get_by_map_list(['vessels', 'self']), {})
+
+class TestDataMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.data = data.Data({
+            'self': 'vessels.urn:mrn:imo:mmsi:123456789',
+            'vessels': {'urn:mrn:imo:mmsi:123456789': {
+                'mmsi': '123456789',
+                'navigation': {'courseOverGroundTrue': {'value': 1.0}},
+                }},
+            })
+
+    def test_data_merge_resolves_self(self):
+        self.data.merge('vessels.self.navigation',
+            {'speedOverGround': {'value': 2.0}})
+        navigation = self.data.get_self().get_prop('navigation')
+        self.assertEqual(navigation['speedOverGround']['value'], 2.0)
+        self.assertEqual(navigation['courseOverGroundTrue']['value'], 1.0)
+
+    def test_data_merge_replaces_leaf(self):
+        self.data.merge('vessels.self.mmsi', '987654321')
+        self.assertEqual(self.data.get_self().get_prop('mmsi'), '987654321')
+
+class TestDataApply(unittest.TestCase):
+
+    def test_data_update_values_stored_separately(self):
+        store = data.Data({'vessels': {}})
+        store.process_delta({'context': 'vessels.a', 'updates': [{
+            '$source': 'n2k.3',
+            'timestamp': '2018-01-01T00:00:01Z',
+            'values': [
+                {'path': 'navigation.speedOverGround', 'value': 1.0},
+                {'path': 'navigation.position',
+                    'value': {'latitude': 1.0, 'longitude': 2.0}},
+                ],
+            }]})
+        navigation = store.get_by_map_list(['vessels', 'a', 'navigation'])
+        self.assertEqual(navigation['speedOverGround'], {'$source': 'n2k.3',
+            'timestamp': '2018-01-01T00:00:01Z', 'value': 1.0})
+        self.assertEqual(navigation['position'], {'$source': 'n2k.3',
+            'timestamp': '2018-01-01T00:00:01Z',
+            'latitude': 1.0, 'longitude': 2.0})
+
+class TestDataCache(unittest.TestCase):
+
+    def setUp(self):
+        import os, tempfile
+        self.path = os.path.join(tempfile.mkdtemp(), 'cache')
+
+    def test_data_save_restore(self):
+        saved = data.Data({'self': 'vessels.a', 'vessels': {'a': {}}})
+        saved.process_delta(make_delta('navigation.speedOverGround', 2.0,
+            '2018-01-01T00:00:01Z', 'vessels.a'))
+        saved.save(self.path, server='example:3000')
+        state = data.load_cache(self.path)
+        self.assertEqual(state['server'], 'example:3000')
+        restored = data.Data()
+        restored.restore(state['data'])
+        self.assertTrue(restored.wait_initialized(0))
+        self.assertEqual(restored.data, saved.data)
+
+    def test_data_load_cache_ignores_garbage(self):
+        self.assertIsNone(data.load_cache(self.path))
+        with open(self.path, 'wb') as cache:
+            cache.write(b'not json')
+        self.assertIsNone(data.load_cache(self.path))
+
+    def test_data_load_cache_never_unpickles(self):
+        import pickle
+        with open(self.path, 'wb') as cache:
+            pickle.dump({'format': data.CACHE_FORMAT, 'saved': 0,
+                'data': {}}, cache)
+        self.assertIsNone(data.load_cache(self.path))
+
+class TestDataConcurrency(unittest.TestCase):
+
+    def setUp(self):
+        self.data = data.Data({'self': 'vessels.a', 'vessels': {'a': {}}},
+            locking=True)
+        self.data.process_delta(make_delta('navigation.speedOverGround', 2.0,
+            '2018-01-01T00:00:01Z', 'vessels.a'))
+
+    def test_data_snapshot_is_not_changed_by_deltas(self):
+        snapshot = self.data.snapshot()
+        self.data.process_delta(make_delta('navigation.speedOverGround', 3.0,
+            '2018-01-01T00:00:02Z', 'vessels.a'))
+        self.data.merge('vessels.a.navigation.speedOverGround',
+            {'value': 4.0})
+        self.assertEqual(snapshot.get_by_path('navigation.speedOverGround',
+            'vessels.a')['value'], 2.0)
+        self.assertEqual(self.data.get_by_path('navigation.speedOverGround',
+            'vessels.a')['value'], 4.0)
+        self.assertEqual(snapshot.data['self'], 'vessels.a')
+
+    def test_data_reading_holds_back_deltas(self):
+        import threading
+        applied = threading.Event()
+        writer = threading.Thread(target=lambda: (
+            self.data.process_delta(make_delta('navigation.speedOverGround',
+                3.0, '2018-01-01T00:00:02Z', 'vessels.a')),
+            applied.set()))
+        with self.data.reading():
+            writer.start()
+            self.assertFalse(applied.wait(0.1))
+            self.assertEqual(self.data.get_by_path(
+                'navigation.speedOverGround', 'vessels.a')['value'], 2.0)
+        self.assertTrue(applied.wait(5))
+        writer.join()
+
+    def test_data_change_callback_may_read(self):
+        values = []
+        self.data.on_change('vessels.a', lambda context, path, *args:
+            values.append(self.data.get_by_path(path, context)['value']))
+        self.data.process_delta(make_delta('navigation.speedOverGround', 3.0,
+            '2018-01-01T00:00:02Z', 'vessels.a'))
+        self.assertEqual(values, [3.0])
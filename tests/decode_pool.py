@@ -0,0 +1,71 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import json
+import multiprocessing
+import unittest
+import signalk_client.data as data
+import signalk_client.decode_pool as decode_pool
+
+# spawned and forkserver workers import the main module again, which under
+# `setup.py test` is setup.py; forked workers do not
+START_METHOD = 'fork' \
+    if 'fork' in multiprocessing.get_all_start_methods() else None
+
+HELLO = {'self': 'vessels.self', 'version': '1.0.0',
+    'timestamp': '2018-01-01T00:00:00Z'}
+
+def make_delta(path, value, timestamp='2018-01-01T00:00:01Z'):
+    return {'context': 'vessels.self', 'updates': [{
+        '$source': 'n2k.3',
+        'source': {'label': 'n2k'},
+        'timestamp': timestamp,
+        'values': [{'path': path, 'value': value}],
+        }]}
+
+class TestNormalize(unittest.TestCase):
+
+    def test_normalize_delta(self):
+        self.assertEqual(decode_pool.normalize(make_delta('a.b', 1.0)), [
+            ('vessels.self', 'a.b', 1.0, '2018-01-01T00:00:01Z',
+                ('n2k.3', {'label': 'n2k'}))
+            ])
+
+    def test_normalize_passes_other_messages(self):
+        self.assertEqual(decode_pool.normalize(HELLO), [HELLO])
+
+    def test_process_values_matches_process_delta(self):
+        delta = make_delta('navigation.position',
+            {'latitude': 1.0, 'longitude': 2.0})
+        expected = data.Data({'vessels': {}})
+        expected.process_delta(delta)
+        flat = data.Data({'vessels': {}})
+        flat.process_values(decode_pool.normalize(delta))
+        self.assertEqual(flat.data, expected.data)
+
+    def test_process_values_buffers(self):
+        store = data.Data({'vessels': {}})
+        store.begin_buffering()
+        store.process_values(decode_pool.normalize(
+            make_delta('a.b', 2.0, '2018-01-01T00:00:02Z')))
+        store.process_values(decode_pool.normalize(
+            make_delta('a.b', 1.0, '2018-01-01T00:00:01Z')))
+        store.resync({'vessels': {'self': {}}})
+        self.assertEqual(store.get_by_map_list(
+            ['vessels', 'self', 'a', 'b', 'value']), 2.0)
+
+class TestDecodePool(unittest.TestCase):
+
+    def test_decode_pool_applies_in_order(self):
+        store = data.Data({'vessels': {}})
+        pool = decode_pool.DecodePool(store.process_values, workers=2,
+            batch_size=10, start_method=START_METHOD)
+        pool.start()
+        pool.put(json.dumps(HELLO))
+        for i in range(100):
+            pool.put(json.dumps(make_delta('a.b', i)))
+        pool.put('not json')
+        pool.stop()
+        self.assertTrue(store.initialized)
+        self.assertEqual(store.get_by_map_list(
+            ['vessels', 'self', 'a', 'b', 'value']), 99)
+        self.assertEqual(pool.stats()['values'], 101)
@@ -0,0 +1,26 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import json
+import unittest
+import signalk_client.decoder as decoder
+
+class TestDecoder(unittest.TestCase):
+
+    def test_decoder_stdlib_always_available(self):
+        self.assertIn('json', decoder.available_decoders())
+
+    def test_decoder_installed_decoders_agree(self):
+        frame = json.dumps({'context': 'vessels.self', 'updates': [
+            {'values': [{'path': 'navigation.speedOverGround', 'value': 1.5}]}
+            ]})
+        for name in decoder.available_decoders():
+            decode = decoder.get_decoder(name)
+            self.assertEqual(decode(frame), json.loads(frame))
+            self.assertEqual(decode(frame.encode('utf-8')), json.loads(frame))
+
+    def test_decoder_callable_passthrough(self):
+        self.assertIs(decoder.get_decoder(json.loads), json.loads)
+
+    def test_decoder_unknown(self):
+        with self.assertRaises(ValueError):
+            decoder.get_decoder('yaml')
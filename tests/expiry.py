@@ -0,0 +1,135 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import threading
+import time
+import unittest
+import signalk_client.data as data
+import signalk_client.history as history
+from signalk_client.expiry import EVICT, STALE, TTL, Expiry
+from signalk_client.store import FLAT, TREE
+
+def sog_delta(context, value):
+    return {'context': context, 'updates': [{'timestamp': "T1",
+        'values': [{'path': 'navigation.speedOverGround', 'value': value},
+            {'path': 'navigation.log', 'value': 100}]}]}
+
+class TestExpiry(unittest.TestCase):
+
+    def test_updated_values_are_pushed_back(self):
+        expiry = Expiry([TTL(10.0, 'navigation.*')])
+        expiry.touch('vessels.a', 'navigation.log', 0.0)
+        expiry.touch('vessels.b', 'navigation.log', 0.0)
+        expiry.touch('vessels.a', 'navigation.log', 8.0)
+        self.assertTrue(expiry.due(10.0))
+        self.assertEqual([item[:2] for item in expiry.expire(10.0)],
+            [('vessels.b', 'navigation.log')])
+        self.assertFalse(expiry.due(17.0))
+        self.assertEqual(expiry.expire(17.0), [])
+        self.assertEqual(len(expiry.expire(18.0)), 1)
+        self.assertEqual(expiry.stats()['tracked'], 0)
+
+    def test_first_matching_ttl_applies(self):
+        expiry = Expiry([TTL(5.0, 'navigation.log', action=STALE),
+            TTL(10.0, 'navigation.*')])
+        expiry.touch('vessels.a', 'navigation.log', 0.0)
+        expiry.touch('vessels.a', 'navigation.speedOverGround', 0.0)
+        expiry.touch('self', 'navigation.log', 0.0)
+        self.assertEqual([(path, rule.action) for context, path, rule
+            in expiry.expire(5.0)], [('navigation.log', STALE)])
+        self.assertTrue(expiry.is_stale('vessels.a', 'navigation.log'))
+        expiry.touch('vessels.a', 'navigation.log', 6.0)
+        self.assertFalse(expiry.is_stale('vessels.a', 'navigation.log'))
+
+    def test_self_context_is_kept(self):
+        expiry = Expiry([TTL(10.0)], self_context=lambda: 'vessels.a')
+        expiry.touch('vessels.a', 'navigation.log', 0.0)
+        expiry.touch('vessels.b', 'navigation.log', 0.0)
+        self.assertEqual([item[:2] for item in expiry.expire(20.0)],
+            [('vessels.b', None)])
+        self.assertFalse(expiry.due(30.0))
+
+    def test_evicted_contexts_leave_nothing_behind(self):
+        expiry = Expiry([TTL(10.0)])
+        for index in range(100):
+            expiry.touch('vessels.{}'.format(index), 'navigation.log', 0.0)
+        self.assertEqual(expiry.stats()['contexts'], 100)
+        self.assertEqual(len(expiry.expire(10.0)), 100)
+        stats = expiry.stats()
+        self.assertEqual((stats['tracked'], stats['contexts']), (0, 0))
+
+    def test_unknown_action(self):
+        with self.assertRaises(ValueError):
+            TTL(10.0, action='drop')
+
+    def test_data_evicts_silent_vessels(self):
+        for backend in (TREE, FLAT):
+            store = data.Data({'self': 'vessels.a', 'vessels': {}},
+                store=backend)
+            store.add_ttl(TTL(0.0))
+            expired = []
+            store.on_expire(lambda *item: expired.append(item))
+            aggregates = store.aggregate('vessels.*.navigation')
+            kept = None
+            if history.numpy is not None:
+                kept = store.keep_history('vessels.*.navigation')
+            store.process_delta(sog_delta('vessels.a', 1.0))
+            store.process_delta(sog_delta('vessels.b', 2.0))
+            store.expire()
+            self.assertEqual(expired, [('vessels.b', None, EVICT)])
+            self.assertEqual(list(store.store.contexts('vessels')), ['a'])
+            self.assertEqual({context for context, path
+                in aggregates.aggregates}, {'vessels.a'})
+            if kept is not None:
+                self.assertEqual({context for context, path
+                    in kept.buffers}, {'vessels.a'})
+
+    def test_data_evicts_and_marks_paths(self):
+        store = data.Data({'vessels': {}})
+        store.add_ttl(TTL(0.0, 'navigation.log'))
+        store.add_ttl(TTL(0.0, 'navigation.*', action=STALE))
+        store.process_delta(sog_delta('vessels.b', 2.0))
+        store.expire()
+        navigation = store.get_by_path('navigation', 'vessels.b')
+        self.assertEqual(list(navigation), ['speedOverGround'])
+        self.assertTrue(store.is_stale('navigation.speedOverGround',
+            'vessels.b'))
+        self.assertEqual(store.expiry.stats()['stale'], 1)
+
+    def test_data_reading_never_expires(self):
+        store = data.Data({'self': 'vessels.a',
+            'vessels': {'b': {'mmsi': "230000002"}}}, locking=True)
+        store.add_ttl(TTL(0.05))
+        store.process_delta(sog_delta('vessels.b', 2.0))
+        time.sleep(0.1)
+        done = threading.Event()
+
+        def read():
+            with store.reading():
+                store.get_vessels()
+            done.set()
+        reader = threading.Thread(target=read)
+        reader.daemon = True
+        reader.start()
+        self.assertTrue(done.wait(5))
+        store.expire()
+        self.assertEqual(list(store.store.contexts('vessels')), [])
+
+    def test_data_snapshot_does_not_expire_live_data(self):
+        store = data.Data({'vessels': {'b': {'mmsi': "230000002"}}})
+        store.add_ttl(TTL(0.05))
+        store.process_delta(sog_delta('vessels.b', 2.0))
+        time.sleep(0.1)
+        snapshot = store.snapshot()
+        self.assertIsNone(snapshot.expiry)
+        snapshot.expire()
+        self.assertEqual(len(snapshot.get_vessels()), 1)
+        store.expire()
+        self.assertEqual(len(store.get_vessels()), 0)
+        self.assertEqual(len(snapshot.get_vessels()), 1)
+
+    def test_data_without_ttls(self):
+        store = data.Data({'vessels': {}})
+        store.process_delta(sog_delta('vessels.b', 2.0))
+        store.expire()
+        self.assertFalse(store.is_stale('navigation.log', 'vessels.b'))
+        self.assertIsNone(store.expiry)
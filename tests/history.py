@@ -0,0 +1,50 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import unittest
+import signalk_client.data as data
+import signalk_client.history as history
+
+def make_delta(path, value, second, context='vessels.a'):
+    return {'context': context, 'updates': [{
+        'timestamp': '2018-01-01T00:00:{:02d}.5Z'.format(second),
+        'values': [{'path': path, 'value': value}],
+        }]}
+
+@unittest.skipIf(history.numpy is None, "numpy is not installed")
+class TestHistory(unittest.TestCase):
+
+    def test_parse_timestamp(self):
+        self.assertEqual(history.parse_timestamp('1970-01-01T00:01:00.25Z'),
+            60.25)
+
+    def test_ring_buffer_wraps(self):
+        ring = history.RingBuffer(3)
+        for i in range(5):
+            ring.append(float(i), i * 10)
+        self.assertEqual(len(ring), 3)
+        self.assertEqual(list(ring.times()), [2.0, 3.0, 4.0])
+        self.assertEqual(list(ring.values()), [20, 30, 40])
+        self.assertEqual(list(ring.values(2)), [30, 40])
+        self.assertFalse(ring.values().flags.writeable)
+        self.assertFalse(ring.values().flags.owndata)
+
+    def test_data_keep_history(self):
+        store = data.Data({'vessels': {}})
+        store.keep_history('vessels.*.navigation', capacity=2)
+        for second in range(3):
+            store.process_delta(make_delta('navigation.speedOverGround',
+                float(second), second))
+            store.process_delta(make_delta('navigation.position',
+                {'latitude': second, 'longitude': -second}, second))
+            store.process_delta(make_delta('navigation.state', 'moored',
+                second))
+        store.process_delta(make_delta('environment.depth', 3.0, 0))
+        times, values = store.get_history('navigation.speedOverGround',
+            'vessels.a').series()
+        self.assertEqual(list(values), [1.0, 2.0])
+        self.assertEqual(times[-1] - times[0], 1.0)
+        position = store.get_history('navigation.position', 'vessels.a')
+        self.assertEqual(position.fields, ('latitude', 'longitude'))
+        self.assertEqual(position.values().tolist(), [[1, -1], [2, -2]])
+        self.assertIsNone(store.get_history('navigation.state', 'vessels.a'))
+        self.assertIsNone(store.get_history('environment.depth', 'vessels.a'))
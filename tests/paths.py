@@ -0,0 +1,38 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import unittest
+import signalk_client.data as data
+import signalk_client.paths as paths
+
+class TestPaths(unittest.TestCase):
+
+    def tearDown(self):
+        paths.set_path_cache_size(paths.PATH_CACHE_SIZE)
+
+    def test_compile_path(self):
+        path = paths.compile_path('navigation.position.latitude')
+        self.assertEqual(path.keys, ('navigation', 'position', 'latitude'))
+        self.assertEqual(path.parent, ('navigation', 'position'))
+        self.assertEqual(path.last, 'latitude')
+        self.assertIs(paths.compile_path('navigation.position.latitude'),
+            path)
+
+    def test_path_cache_stats(self):
+        paths.set_path_cache_size(2)
+        for dotted in ('a', 'a', 'b', 'c', 'a'):
+            paths.compile_path(dotted)
+        stats = paths.path_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']),
+            (1, 4, 2))
+        self.assertEqual(stats['hit_rate'], 0.2)
+
+    def test_data_get_by_path(self):
+        store = data.Data({'vessels': {'a': {'navigation': {
+            'speedOverGround': {'value': 1.0}}}}})
+        self.assertEqual(store.get_by_path('navigation.speedOverGround',
+            'vessels.a'), {'value': 1.0})
+        self.assertEqual(store.get_by_map_list(
+            paths.compile_path('vessels.a.navigation')),
+            {'speedOverGround': {'value': 1.0}})
+        with self.assertRaises(KeyError):
+            store.get_by_path('navigation.log', 'vessels.a')
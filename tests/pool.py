@@ -0,0 +1,105 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import time
+import unittest
+import signalk_client.standin as standin
+from signalk_client.client import CLOSED
+try:
+    import aiohttp
+    import signalk_client.pool as pool
+except ImportError:
+    aiohttp = None
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def speed(data):
+    try:
+        return data.get_self().get_prop('navigation.speedOverGround')['value']
+    except KeyError:
+        return None
+
+@unittest.skipUnless(aiohttp, "aiohttp is not installed")
+class TestClientPool(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = [
+            standin.StandInServer(sensors=2, vessels=1),
+            standin.StandInServer(sensors=2, vessels=3),
+            ]
+        for server in self.servers:
+            server.start()
+        self.addresses = [server.address for server in self.servers]
+        self.pool = pool.ClientPool(self.addresses, reactors=2)
+
+    def tearDown(self):
+        self.pool.close()
+        for server in self.servers:
+            server.stop()
+
+    def test_pool_keeps_data_per_server(self):
+        self.assertTrue(self.pool.wait_ready(5))
+        first, second = [self.pool.data(a) for a in self.addresses]
+        self.assertIsNot(first, second)
+        self.assertEqual(len(first.get_vessels()), 2)
+        self.assertEqual(len(second.get_vessels()), 4)
+
+        self.servers[1].publish({'context': standin.SELF, 'updates': [
+            {'values': [{'path': 'navigation.speedOverGround',
+                'value': 6.5}]}]})
+        self.assertTrue(wait_for(lambda: speed(second) == 6.5))
+        self.assertNotEqual(speed(first), 6.5)
+
+    def test_pool_stats(self):
+        self.assertTrue(self.pool.wait_ready(5))
+        self.assertTrue(wait_for(lambda:
+            self.pool.stats()['total']['connected'] == 2))
+        stats = self.pool.stats()
+        self.assertEqual(stats['total']['connections'], 2)
+        self.assertEqual(stats['total']['reactors'], 2)
+        for address in self.addresses:
+            self.assertEqual(stats[address]['connect_failures'], 0)
+            self.assertTrue(stats[address]['received'] >= 1)
+
+    def test_pool_remove(self):
+        self.assertTrue(self.pool.wait_ready(5))
+        removed = self.pool.get(self.addresses[0])
+        self.pool.remove(self.addresses[0])
+        self.assertNotIn(self.addresses[0], self.pool.stats())
+        self.assertEqual(removed.state, CLOSED)
+        self.assertTrue(wait_for(lambda:
+            self.servers[0].connection_count() == 0))
+
+        # the other connection keeps streaming
+        self.assertEqual(self.servers[1].connection_count(), 1)
+        self.servers[1].publish({'context': standin.SELF, 'updates': [
+            {'values': [{'path': 'navigation.speedOverGround',
+                'value': 1.25}]}]})
+        self.assertTrue(wait_for(lambda:
+            speed(self.pool.data(self.addresses[1])) == 1.25))
+
+    def test_pool_streams_beyond_connector_default(self):
+        # every stream holds a connection; aiohttp's default allows 100
+        reactor = pool.Reactor("signalk-reactor-test")
+        try:
+            self.assertEqual(reactor.session.connector.limit, 0)
+        finally:
+            reactor.stop()
+        self.pool.close()
+        self.pool = pool.ClientPool(self.addresses, connection_limit=1)
+        self.assertFalse(self.pool.wait_ready(1))
+
+    def test_pool_wait_ready_times_out(self):
+        import socket
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        address = "127.0.0.1:{}".format(closed.getsockname()[1])
+        closed.close()
+        self.pool.add(address)
+        self.assertFalse(self.pool.wait_ready(0.5))
+        self.assertTrue(self.pool.stats()[address]['connect_failures'] >= 1)
@@ -0,0 +1,114 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import math
+import time
+import unittest
+import signalk_client.data as data
+from signalk_client.expiry import TTL
+from signalk_client.ratelimit import AVERAGE, RateLimit, RateLimiter
+
+CONTEXT = 'vessels.urn:mrn:imo:mmsi:123456789'
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_ratelimit_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            RateLimit('navigation.*', policy='median')
+
+    def test_ratelimit_latest(self):
+        limiter = RateLimiter([RateLimit('navigation.attitude')])
+        self.assertEqual(limiter.admit(CONTEXT, 'navigation.attitude', 1,
+            now=0.0), (True, 1))
+        self.assertEqual(limiter.admit(CONTEXT, 'navigation.attitude', 2,
+            now=0.5), (False, None))
+        self.assertEqual(limiter.admit(CONTEXT, 'navigation.attitude', 3,
+            now=1.0), (True, 3))
+        self.assertEqual(limiter.admit(CONTEXT, 'navigation.log', 4,
+            now=1.1), (True, 4))
+        self.assertEqual(limiter.stats()['dropped'], 1)
+
+    def test_ratelimit_context(self):
+        limiter = RateLimiter([RateLimit('*', context='vessels.urn:*:1')])
+        self.assertTrue(limiter.admit('vessels.urn:x:1', 'a', 1, now=0)[0])
+        self.assertFalse(limiter.admit('vessels.urn:x:1', 'a', 1, now=0)[0])
+        self.assertTrue(limiter.admit('vessels.urn:x:2', 'a', 1, now=0)[0])
+
+    def test_ratelimit_average(self):
+        limiter = RateLimiter([RateLimit('environment.wind.*',
+            policy=AVERAGE)])
+        limiter.admit(CONTEXT, 'environment.wind.speedApparent', 1.0, now=0)
+        limiter.admit(CONTEXT, 'environment.wind.speedApparent', 2.0, now=0.3)
+        limiter.admit(CONTEXT, 'environment.wind.speedApparent', 4.0, now=0.6)
+        self.assertEqual(limiter.admit(CONTEXT,
+            'environment.wind.speedApparent', 6.0, now=1.0), (True, 4.0))
+
+    def test_ratelimit_average_angles(self):
+        store = data.Data()
+        limiter = RateLimiter([RateLimit('*', policy=AVERAGE)],
+            store.get_prop_units)
+        limiter.admit(CONTEXT, 'environment.wind.angleApparent', 0.0, now=0)
+        limiter.admit(CONTEXT, 'environment.wind.angleApparent', 3.1, now=0.5)
+        admitted, angle = limiter.admit(CONTEXT,
+            'environment.wind.angleApparent', -3.1, now=1.0)
+        self.assertAlmostEqual(abs(angle), math.pi, places=1)
+        limiter.admit(CONTEXT, 'navigation.attitude',
+            {'roll': 0.1, 'pitch': 3.1}, now=0)
+        limiter.admit(CONTEXT, 'navigation.attitude',
+            {'roll': 0.3, 'pitch': -3.1}, now=0.5)
+        admitted, attitude = limiter.admit(CONTEXT, 'navigation.attitude',
+            {'roll': 0.2, 'pitch': 3.1}, now=1.0)
+        self.assertAlmostEqual(attitude['roll'], 0.25)
+        self.assertTrue(abs(attitude['pitch']) > 3)
+
+    def test_ratelimit_data_flush(self):
+        store = data.Data({'vessels': {}})
+        store.rate_limiter = RateLimiter([RateLimit('*', interval=60)])
+        for value in (1.0, 2.0, 3.0):
+            store.process_delta({'context': CONTEXT, 'updates': [{
+                'timestamp': '2018-01-01T00:00:00Z',
+                'values': [{'path': 'navigation.speedOverGround',
+                    'value': value}],
+                }]})
+        path = CONTEXT.split('.') + ['navigation', 'speedOverGround']
+        self.assertEqual(store.get_by_map_list(path)['value'], 1.0)
+        store.flush_rate_limits()
+        self.assertEqual(store.get_by_map_list(path), {
+            'timestamp': '2018-01-01T00:00:00Z', 'value': 3.0})
+
+    def test_ratelimit_flush_due_only(self):
+        limiter = RateLimiter([RateLimit('navigation.*', interval=10)])
+        limiter.admit(CONTEXT, 'navigation.log', 1, now=0.0)
+        limiter.admit(CONTEXT, 'navigation.log', 2, now=1.0)
+        self.assertEqual(limiter.flush(due_only=True, now=5.0), [])
+        self.assertEqual(limiter.flush(due_only=True, now=10.0),
+            [(CONTEXT, 'navigation.log', 2, None)])
+        self.assertEqual(limiter.flush(now=11.0), [])
+        self.assertEqual(limiter.stats()['held'], 0)
+
+    def test_ratelimit_forget_context(self):
+        limiter = RateLimiter([RateLimit('*')])
+        for index in range(100):
+            context = 'vessels.{}'.format(index)
+            limiter.admit(context, 'navigation.log', 1, now=0.0)
+            limiter.admit(context, 'navigation.log', 2, now=0.5)
+        self.assertEqual(limiter.stats()['held'], 100)
+        for index in range(100):
+            limiter.forget('vessels.{}'.format(index))
+        stats = limiter.stats()
+        self.assertEqual((stats['paths'], stats['held']), (0, 0))
+        self.assertEqual(limiter.flush(), [])
+
+    def test_ratelimit_data_forgets_evicted_contexts(self):
+        store = data.Data({'vessels': {}})
+        store.rate_limiter = RateLimiter([RateLimit('*', interval=60)])
+        store.add_ttl(TTL(0.05))
+        for value in (1.0, 2.0):
+            store.process_delta({'context': CONTEXT, 'updates': [{
+                'values': [{'path': 'navigation.speedOverGround',
+                    'value': value}],
+                }]})
+        time.sleep(0.1)
+        store.expire()
+        self.assertEqual(store.rate_limiter.stats()['paths'], 0)
+        store.flush_rate_limits()
+        self.assertEqual(list(store.store.contexts('vessels')), [])
@@ -0,0 +1,54 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import unittest
+import signalk_client.receive_queue as receive_queue
+
+def make_delta(path, value, context='vessels.self'):
+    return {'context': context, 'updates': [
+        {'values': [{'path': path, 'value': value}]}
+        ]}
+
+class TestReceiveQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.applied = []
+
+    def test_receive_queue_applies_in_order(self):
+        queue = receive_queue.ReceiveQueue(self.applied.append, maxsize=10)
+        queue.start()
+        for i in range(5):
+            queue.put(make_delta('a', i))
+        queue.stop()
+        self.assertEqual([d['updates'][0]['values'][0]['value']
+            for d in self.applied], [0, 1, 2, 3, 4])
+        self.assertEqual(queue.stats()['applied'], 5)
+
+    def test_receive_queue_drop_oldest(self):
+        queue = receive_queue.ReceiveQueue(self.applied.append, maxsize=2,
+            policy=receive_queue.DROP_OLDEST)
+        for i in range(4):
+            queue.put(make_delta('a', i))
+        queue.start()
+        queue.stop()
+        self.assertEqual([d['updates'][0]['values'][0]['value']
+            for d in self.applied], [2, 3])
+        self.assertEqual(queue.stats()['dropped'], 2)
+
+    def test_receive_queue_conflate(self):
+        queue = receive_queue.ReceiveQueue(self.applied.append, maxsize=2,
+            policy=receive_queue.CONFLATE)
+        queue.put(make_delta('a', 0))
+        queue.put(make_delta('b', 0))
+        queue.put(make_delta('a', 1))
+        queue.put(make_delta('c', 0))
+        queue.start()
+        queue.stop()
+        self.assertEqual([(d['updates'][0]['values'][0]['path'],
+            d['updates'][0]['values'][0]['value']) for d in self.applied],
+            [('b', 0), ('c', 0)])
+        stats = queue.stats()
+        self.assertEqual((stats['conflated'], stats['dropped']), (1, 1))
+
+    def test_receive_queue_bad_policy(self):
+        with self.assertRaises(ValueError):
+            receive_queue.ReceiveQueue(self.applied.append, policy='never')
@@ -0,0 +1,53 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import signalk_client.data as data
+import signalk_client.recording as recording
+
+def make_frame(value):
+    return json.dumps({'context': 'vessels.self', 'updates': [{
+        'timestamp': '2018-01-01T00:00:00Z',
+        'values': [{'path': 'navigation.speedOverGround', 'value': value}],
+        }]})
+
+class TestRecording(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'recording')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, count, **kwargs):
+        with recording.Recorder(self.path, **kwargs) as recorder:
+            for i in range(count):
+                recorder.record(make_frame(i), 1000.0 + i)
+
+    def test_recording_round_trip(self):
+        self.record(3)
+        frames = list(recording.read_recording(self.path))
+        self.assertEqual(frames[1], (1001.0, make_frame(1).encode('utf-8')))
+        self.assertEqual(len(frames), 3)
+
+    def test_recording_compressed_segments(self):
+        self.record(10, compress=True, segment_size=100)
+        segments = recording.segment_paths(self.path)
+        self.assertTrue(len(segments) > 1)
+        self.assertTrue(all(s.endswith('.gz') for s in segments))
+        self.assertEqual(
+            [received for received, frame
+                in recording.read_recording(self.path)],
+            [1000.0 + i for i in range(10)])
+
+    def test_recording_replay(self):
+        self.record(5)
+        store = data.Data({'vessels': {'self': {}}})
+        count, elapsed = recording.Replayer(self.path).replay(store)
+        self.assertEqual(count, 5)
+        self.assertEqual(store.get_by_map_list(
+            ['vessels', 'self', 'navigation', 'speedOverGround', 'value']), 4)
@@ -0,0 +1,40 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import threading
+import time
+import unittest
+from signalk_client.rwlock import RWLock
+
+class TestRWLock(unittest.TestCase):
+
+    def test_rwlock_waiting_writer_holds_back_new_readers(self):
+        lock = RWLock()
+        order = []
+        lock.acquire_read()
+        writer = threading.Thread(target=lambda: (
+            lock.acquire_write(), order.append('write'),
+            lock.release_write()))
+        writer.start()
+        # let the writer queue up behind the first reader
+        time.sleep(0.1)
+        reader = threading.Thread(target=lambda: (
+            lock.acquire_read(), order.append('read'), lock.release_read()))
+        reader.start()
+        reader.join(0.1)
+        self.assertEqual(order, [])
+        lock.release_read()
+        writer.join(5)
+        reader.join(5)
+        self.assertEqual(order, ['write', 'read'])
+
+    def test_rwlock_reentrant(self):
+        lock = RWLock()
+        with lock.writing():
+            with lock.writing():
+                with lock.reading():
+                    pass
+        with lock.reading():
+            with lock.reading():
+                pass
+        with lock.writing():
+            pass
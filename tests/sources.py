@@ -0,0 +1,88 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import time
+import unittest
+import signalk_client.data as data
+from signalk_client.expiry import TTL
+from signalk_client.sources import (
+    SourcePriority, SourceSelector, source_id)
+
+def depth_delta(source, value):
+    return {'context': 'vessels.a', 'updates': [{'$source': source,
+        'timestamp': "2018-01-01T00:00:00Z",
+        'values': [{'path': 'environment.depth.belowTransducer',
+            'value': value}]}]}
+
+class TestSources(unittest.TestCase):
+
+    def test_source_id(self):
+        self.assertEqual(source_id({'$source': 'n2k.115'}), 'n2k.115')
+        self.assertEqual(source_id({'source': {'label': 'nmea0183',
+            'talker': 'GP'}}), 'nmea0183.GP')
+        self.assertEqual(source_id({'source': {'label': 'n2k', 'src': '3'}}),
+            'n2k.3')
+        self.assertIsNone(source_id({}))
+
+    def test_selector_prefers_fresh_sources(self):
+        selector = SourceSelector([SourcePriority('environment.depth.*',
+            ['main', 'backup'], timeout=5.0)])
+        select = lambda source, now: selector.select('vessels.a',
+            'environment.depth.belowTransducer', 1.0, {'$source': source},
+            now)
+        self.assertTrue(select('backup', 0.0))
+        self.assertTrue(select('main', 1.0))
+        self.assertFalse(select('backup', 2.0))
+        self.assertFalse(select('other', 3.0))
+        self.assertFalse(select('backup', 6.0))
+        # main last seen at 1.0, stale after 6.0
+        self.assertTrue(select('backup', 6.5))
+        self.assertTrue(select('main', 7.0))
+        self.assertEqual(selector.stats()['rejected'], 3)
+        sources = selector.sources('vessels.a',
+            'environment.depth.belowTransducer', 9.0)
+        self.assertEqual(sorted(sources), ['backup', 'main', 'other'])
+        self.assertTrue(sources['other']['stale'])
+        self.assertFalse(sources['main']['stale'])
+
+    def test_selector_ignores_other_paths(self):
+        selector = SourceSelector([SourcePriority('navigation.position',
+            ['gps'])])
+        self.assertTrue(selector.select('vessels.a', 'navigation.log', 1,
+            {'$source': 'log'}))
+        self.assertEqual(selector.sources('vessels.a', 'navigation.log'), {})
+
+    def test_data_stores_preferred_source(self):
+        store = data.Data({'vessels': {}})
+        store.source_selector = SourceSelector([SourcePriority(
+            'environment.depth.*', ['main', 'backup'])])
+        store.process_delta(depth_delta('backup', 10.0))
+        store.process_delta(depth_delta('main', 12.0))
+        store.process_delta(depth_delta('backup', 11.0))
+        stored = store.get_by_path('environment.depth.belowTransducer',
+            'vessels.a')
+        self.assertEqual((stored['value'], stored['$source']), (12.0, 'main'))
+        self.assertEqual(store.get_sources('environment.depth.belowTransducer',
+            'vessels.a')['backup']['value'], 11.0)
+
+    def test_selector_forget_context(self):
+        selector = SourceSelector([SourcePriority('*', ['main'])])
+        for index in range(100):
+            selector.select('vessels.{}'.format(index), 'navigation.log', 1,
+                {'$source': 'main'})
+        self.assertEqual(selector.stats()['paths'], 100)
+        for index in range(100):
+            selector.forget('vessels.{}'.format(index))
+        self.assertEqual(selector.stats()['paths'], 0)
+        self.assertEqual(selector.sources('vessels.0', 'navigation.log'), {})
+
+    def test_data_forgets_sources_of_evicted_contexts(self):
+        store = data.Data({'vessels': {}})
+        store.source_selector = SourceSelector([SourcePriority(
+            'environment.depth.*', ['main', 'backup'])])
+        store.add_ttl(TTL(0.05))
+        store.process_delta(depth_delta('main', 12.0))
+        time.sleep(0.1)
+        store.expire()
+        self.assertEqual(store.source_selector.stats()['paths'], 0)
+        self.assertEqual(store.get_sources('environment.depth.belowTransducer',
+            'vessels.a'), {})
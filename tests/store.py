@@ -0,0 +1,134 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import copy
+import unittest
+import signalk_client.data as data
+import signalk_client.store as store
+
+SNAPSHOT = {
+    'version': "1.0.0",
+    'self': 'vessels.a',
+    'sources': {'nmea': {'type': 'NMEA0183'}},
+    'vessels': {
+        'a': {
+            'name': "A",
+            'mmsi': "230000001",
+            'navigation': {
+                'speedOverGround': {'value': 3.2, 'timestamp': "T1",
+                    '$source': 'nmea.GP'},
+                'position': {'latitude': 60.1, 'longitude': 24.9,
+                    'timestamp': "T1", '$source': 'nmea.GP'},
+                },
+            },
+        'b': {},
+        },
+    }
+
+DELTAS = [
+    {'context': 'vessels.a', 'updates': [{'timestamp': "T2",
+        '$source': 'nmea.GP', 'values': [
+            {'path': 'navigation.speedOverGround', 'value': 3.4},
+            {'path': 'navigation.position',
+                'value': {'latitude': 60.2, 'longitude': 25.0}},
+            ]}]},
+    {'context': 'vessels.c', 'updates': [{'timestamp': "T3",
+        'source': {'label': 'ais'}, 'values': [
+            {'path': 'navigation.courseOverGroundTrue', 'value': 1.5},
+            ]}]},
+    ]
+
+def make_data(backend):
+    tree = data.Data(copy.deepcopy(SNAPSHOT), store=backend)
+    for delta in DELTAS:
+        tree.process_delta(delta)
+    return tree
+
+class TestFlatStore(unittest.TestCase):
+
+    def test_flat_store_tree_matches_tree_store(self):
+        self.assertEqual(make_data(store.FLAT).data, make_data(store.TREE).data)
+
+    def test_flat_store_point_reads(self):
+        flat = make_data(store.FLAT)
+        self.assertEqual(
+            flat.get_by_path('navigation.position', 'vessels.a'),
+            {'latitude': 60.2, 'longitude': 25.0, 'timestamp': "T2",
+                '$source': 'nmea.GP'})
+        self.assertEqual(
+            flat.get_by_map_list(['vessels', 'c', 'navigation',
+                'courseOverGroundTrue'])['value'], 1.5)
+        self.assertEqual(flat.get_by_path('name', 'vessels.a'), "A")
+        self.assertEqual(
+            sorted(flat.get_by_path('navigation', 'vessels.a')),
+            ['position', 'speedOverGround'])
+        with self.assertRaises(KeyError):
+            flat.get_by_path('navigation.log', 'vessels.a')
+
+    def test_flat_store_context_reads_skip_the_tree(self):
+        flat, tree = make_data(store.FLAT), make_data(store.TREE)
+        flat.process_delta(DELTAS[1])
+        tree.process_delta(DELTAS[1])
+
+        def built():
+            raise AssertionError("tree rebuilt for a context read")
+        flat.store._FlatStore__build = built
+        for path in ('navigation', 'navigation.position.latitude', 'name',
+                'navigation.position'):
+            self.assertEqual(flat.get_by_path(path, 'vessels.a'),
+                tree.get_by_path(path, 'vessels.a'))
+        self.assertEqual(flat.get_by_map_list(['vessels', 'a']),
+            tree.get_by_map_list(['vessels', 'a']))
+        self.assertEqual(flat.get_by_map_list(['vessels', 'b']), {})
+        for path, context in (('uuid', 'vessels.c'), ('navigation.log',
+                'vessels.a'), ('name', 'vessels.d')):
+            with self.assertRaises(KeyError):
+                flat.get_by_path(path, context)
+        self.assertEqual(
+            flat.get_by_map_list(['vessels', 'c', 'navigation']),
+            tree.get_by_map_list(['vessels', 'c', 'navigation']))
+
+    def test_flat_store_records_match_tree_store(self):
+        self.assertEqual(sorted(make_data(store.FLAT).records()),
+            sorted(make_data(store.TREE).records()))
+
+    def test_flat_store_vessels_and_self(self):
+        flat = make_data(store.FLAT)
+        self.assertEqual(sorted(flat.store.contexts('vessels')),
+            ['a', 'b', 'c'])
+        self.assertEqual(flat.get_self().key, 'vessels.a')
+
+    def test_flat_store_tree_built_on_demand(self):
+        flat = make_data(store.FLAT)
+        tree = flat.data
+        self.assertIs(flat.data, tree)
+        flat.process_delta(DELTAS[1])
+        self.assertIsNot(flat.data, tree)
+
+    def test_flat_store_merge(self):
+        flat = make_data(store.FLAT)
+        flat.merge('vessels.self.navigation',
+            {'log': {'value': 100, 'timestamp': "T4"}})
+        self.assertEqual(flat.get_by_path('navigation.log.value',
+            'vessels.a'), 100)
+        self.assertEqual(flat.get_by_path('navigation.speedOverGround',
+            'vessels.a')['value'], 3.4)
+
+    def test_delete_matches_across_stores(self):
+        trees = []
+        for backend in (store.TREE, store.FLAT):
+            stored = make_data(backend)
+            stored.store.delete(data.compile_path('vessels.a'),
+                data.compile_path('navigation.speedOverGround'))
+            stored.store.delete_context(data.compile_path('vessels.c'))
+            with self.assertRaises(KeyError):
+                stored.store.delete_context(data.compile_path('vessels.c'))
+            self.assertEqual(sorted(stored.store.contexts('vessels')),
+                ['a', 'b'])
+            trees.append(stored.data)
+        self.assertEqual(trees[0], trees[1])
+        self.assertNotIn('speedOverGround', trees[0]['vessels']['a']
+            ['navigation'])
+
+    def test_unknown_store(self):
+        with self.assertRaises(ValueError):
+            data.Data(store='btree')
@@ -0,0 +1,43 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import unittest
+import signalk_client.subscription as subscription
+
+class TestSubscriptions(unittest.TestCase):
+
+    def setUp(self):
+        self.subscriptions = subscription.Subscriptions()
+
+    def test_subscription_as_dict(self):
+        sub = subscription.Subscription(
+            'navigation.*', period=1000, min_period=200, policy='ideal'
+            )
+        self.assertEqual(sub.as_dict(), {
+            'path': 'navigation.*', 'period': 1000, 'minPeriod': 200,
+            'policy': 'ideal',
+            })
+
+    def test_subscription_bad_policy(self):
+        with self.assertRaises(ValueError):
+            subscription.Subscription('navigation.*', policy='sometimes')
+
+    def test_subscriptions_add_groups_by_context(self):
+        messages = self.subscriptions.add([
+            'navigation.position',
+            subscription.Subscription('navigation.position', context='*'),
+            ])
+        self.assertEqual([m['context'] for m in messages],
+            ['vessels.self', '*'])
+        self.assertEqual(len(self.subscriptions), 2)
+
+    def test_subscriptions_remove(self):
+        self.subscriptions.add(['navigation.position', 'environment.*'])
+        messages = self.subscriptions.remove(['environment.*'])
+        self.assertEqual(messages, [{
+            'context': 'vessels.self',
+            'unsubscribe': [{'path': 'environment.*'}],
+            }])
+        self.assertEqual(self.subscriptions.messages(), [{
+            'context': 'vessels.self',
+            'subscribe': [{'path': 'navigation.position'}],
+            }])
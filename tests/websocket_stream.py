@@ -0,0 +1,59 @@
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+
+import json
+import unittest
+import zlib
+from signalk_client.websocket_stream import PerMessageDeflate
+
+def compress(messages, window_bits=15, context_takeover=True):
+    compressor = None
+    for message in messages:
+        if compressor is None or not context_takeover:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -window_bits)
+        data = compressor.compress(message)
+        data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield data[:-4]
+
+class TestPerMessageDeflate(unittest.TestCase):
+
+    messages = [json.dumps({'updates': [{'values': [
+        {'path': 'navigation.speedOverGround', 'value': i}
+        ]}]}).encode('utf-8') for i in range(20)]
+
+    def test_offer(self):
+        self.assertEqual(PerMessageDeflate().offer(),
+            'permessage-deflate; client_max_window_bits')
+        self.assertEqual(
+            PerMessageDeflate(window_bits=9, context_takeover=False).offer(),
+            'permessage-deflate; client_max_window_bits; '
+            'server_max_window_bits=9; server_no_context_takeover')
+        with self.assertRaises(ValueError):
+            PerMessageDeflate(window_bits=16)
+
+    def test_accept(self):
+        deflate = PerMessageDeflate()
+        deflate.accept(None)
+        self.assertFalse(deflate.enabled)
+        deflate.accept('x-webkit-deflate-frame, permessage-deflate; '
+            'server_max_window_bits=11; server_no_context_takeover')
+        self.assertTrue(deflate.enabled)
+        self.assertEqual(deflate.server_window_bits, 11)
+        self.assertFalse(deflate.server_context_takeover)
+
+    def test_decompress_context_takeover(self):
+        deflate = PerMessageDeflate()
+        deflate.accept('permessage-deflate')
+        for message, data in zip(self.messages, compress(self.messages)):
+            self.assertEqual(deflate.decompress(data), message)
+        self.assertEqual(deflate.payload_bytes,
+            sum(len(m) for m in self.messages))
+        # later messages are mostly back references to earlier ones
+        self.assertTrue(deflate.ratio() > 2)
+
+    def test_decompress_no_context_takeover(self):
+        deflate = PerMessageDeflate()
+        deflate.accept('permessage-deflate; server_max_window_bits=9; '
+            'server_no_context_takeover')
+        for message, data in zip(self.messages,
+                compress(self.messages, 9, False)):
+            self.assertEqual(deflate.decompress(data), message)